@@ -0,0 +1,146 @@
+import heapq
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+OPEN_STATUSES = ("Open", "In Progress")
+
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat() if ts else None
+
+
+def _month(transaction_date):
+    # Dates are stored as 'YYYY-MM-DD' text, so the month is just the prefix
+    return transaction_date[:7] if transaction_date else None
+
+
+class DashboardAggregates:
+    """In-memory rollups behind /dashboard/stats.
+
+    The rollups are keyed by product, region and month and are updated as rows
+    are recorded, so reading the stats costs the same no matter how many sales
+    there are. ``rebuild`` recomputes everything from the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+        self.version = 0
+        self.built_at = None
+        self.updated_at = None
+
+    def _reset(self):
+        self.total_customers = 0
+        self.total_sales = 0.0
+        self.open_tickets = 0
+        self.product_names = {}
+        self.customer_regions = {}
+        self.sales_by_product = defaultdict(float)
+        self.sales_by_region = defaultdict(float)
+        self.sales_by_month = defaultdict(float)
+
+    def rebuild(self, conn):
+        cursor = conn.cursor()
+        with self._lock:
+            self._reset()
+            self.total_customers = cursor.execute("SELECT COUNT(*) FROM customers").fetchone()[0]
+            self.open_tickets = cursor.execute(
+                "SELECT COUNT(*) FROM tickets WHERE status IN (?, ?)", OPEN_STATUSES).fetchone()[0]
+            self.product_names = dict(cursor.execute("SELECT product_id, product_name FROM products"))
+            self.customer_regions = dict(cursor.execute("SELECT customer_id, region FROM customers"))
+
+            self.total_sales = cursor.execute("SELECT SUM(sale_amount) FROM sales").fetchone()[0] or 0.0
+            self.sales_by_product.update(cursor.execute(
+                "SELECT product_id, SUM(sale_amount) FROM sales GROUP BY product_id"))
+            self.sales_by_month.update(cursor.execute(
+                "SELECT substr(transaction_date, 1, 7), SUM(sale_amount) FROM sales GROUP BY 1"))
+            self.sales_by_region.update(cursor.execute("""
+                SELECT c.region, SUM(s.sale_amount)
+                FROM sales s
+                JOIN customers c ON s.customer_id = c.customer_id
+                GROUP BY c.region
+            """))
+
+            self.built_at = self.updated_at = time.time()
+            self.version += 1
+
+    def state(self):
+        """The rollups as plain containers that can be pickled."""
+        with self._lock:
+            return {
+                "built_at": self.built_at,
+                "total_customers": self.total_customers,
+                "total_sales": self.total_sales,
+                "open_tickets": self.open_tickets,
+                "product_names": dict(self.product_names),
+                "customer_regions": dict(self.customer_regions),
+                "sales_by_product": dict(self.sales_by_product),
+                "sales_by_region": dict(self.sales_by_region),
+                "sales_by_month": dict(self.sales_by_month),
+            }
+
+    def restore(self, state):
+        with self._lock:
+            self._reset()
+            self.total_customers = state["total_customers"]
+            self.total_sales = state["total_sales"]
+            self.open_tickets = state["open_tickets"]
+            self.product_names = state["product_names"]
+            self.customer_regions = state["customer_regions"]
+            self.sales_by_product.update(state["sales_by_product"])
+            self.sales_by_region.update(state["sales_by_region"])
+            self.sales_by_month.update(state["sales_by_month"])
+            self.built_at = state["built_at"]
+            self.updated_at = time.time()
+            self.version += 1
+
+    def record_sales(self, rows):
+        with self._lock:
+            for row in rows:
+                amount = row["sale_amount"] or 0.0
+                self.total_sales += amount
+                self.sales_by_product[row["product_id"]] += amount
+                self.sales_by_month[_month(row["transaction_date"])] += amount
+                if row["customer_id"] in self.customer_regions:
+                    self.sales_by_region[self.customer_regions[row["customer_id"]]] += amount
+            self._touch()
+
+    def record_tickets(self, rows):
+        with self._lock:
+            for row in rows:
+                if row["status"] in OPEN_STATUSES:
+                    self.open_tickets += 1
+            self._touch()
+
+    def _touch(self):
+        self.updated_at = time.time()
+        self.version += 1
+
+    def snapshot(self, top_n=5):
+        with self._lock:
+            top_products = heapq.nlargest(
+                top_n,
+                (item for item in self.sales_by_product.items() if item[0] in self.product_names),
+                key=lambda item: item[1],
+            )
+            trend = sorted(self.sales_by_month.items(), key=lambda item: (item[0] is not None, item[0] or ""))
+            return {
+                "total_customers": self.total_customers,
+                "total_sales": float(self.total_sales),
+                "open_tickets": self.open_tickets,
+                "top_products": [
+                    {"product_id": pid, "product_name": self.product_names[pid], "total_sales": total}
+                    for pid, total in top_products
+                ],
+                "sales_by_region": [
+                    {"region": region, "total_sales": total}
+                    for region, total in sorted(self.sales_by_region.items(), key=lambda item: str(item[0]))
+                ],
+                "sales_trend": [{"month": month, "total_sales": total} for month, total in trend],
+                "version": self.version,
+                "built_at": _iso(self.built_at),
+                # The body is cached, so no age relative to now; clients can compute it from updated_at
+                "updated_at": _iso(self.updated_at),
+            }
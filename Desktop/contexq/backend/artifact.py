@@ -0,0 +1,235 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; startup is then simply not serialized
+    fcntl = None
+
+from partitions import PARTITIONED, partition_tables
+from schema import SCHEMA_VERSION, SEARCH_INDEXES, TABLES, migrate, schema_version
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "manifest.json"
+VIEWS = "views.pickle"
+
+
+def artifact_dir(database_path):
+    # Kept next to the database by default, e.g. business_data.artifacts/
+    return os.getenv("ARTIFACT_DIR", os.path.splitext(database_path)[0] + ".artifacts")
+
+
+@contextmanager
+def build_lock(directory):
+    """Exclusive lock on ``directory``, held across processes.
+
+    Workers starting together take turns, so the first one builds the
+    rollups and the columnar store and the others load what it saved.
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        os.makedirs(directory, exist_ok=True)
+        f = open(os.path.join(directory, ".lock"), "a")
+    except OSError as exc:
+        logger.warning("could not lock %s: %s", directory, exc)
+        yield
+        return
+    with f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def fingerprint(conn):
+    """Schema version plus row count and highest rowid per table; changes with any write.
+
+    Partitioned tables are views without a rowid, so their integer key (the
+    same value) is used instead; splitting a table leaves its fingerprint as is.
+    """
+    return {
+        "schema_version": schema_version(conn),
+        **{name: list(conn.execute(
+            f"SELECT COUNT(*), MAX({PARTITIONED[name][0] if name in PARTITIONED else 'rowid'}) FROM {name}"
+        ).fetchone()) for name in TABLES},
+    }
+
+
+def checksum(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_prebuilt(manifest, conn):
+    """True when ``manifest`` describes the database open on ``conn``, at the schema this code expects.
+
+    A database replaced, emptied or written to since the build no longer
+    matches the manifest's fingerprint.
+    """
+    return (manifest is not None and manifest.get("schema_version") == SCHEMA_VERSION
+            and manifest.get("fingerprint") == fingerprint(conn))
+
+
+def save_views(directory, conn, views):
+    """Pickle the in-memory rollups (``{name: view}``), tagged with the database fingerprint they match."""
+    os.makedirs(directory, exist_ok=True)
+    state = {"fingerprint": fingerprint(conn), **{name: view.state() for name, view in views.items()}}
+    _write_atomic(os.path.join(directory, VIEWS), pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def load_views(directory, conn, views):
+    """Restore the rollups saved by ``save_views``; False if missing, stale or built with other settings.
+
+    The file is only ever written by ``save_views`` next to the database it
+    describes, so it is trusted like the database itself.
+    """
+    try:
+        with open(os.path.join(directory, VIEWS), "rb") as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return False
+    if state.get("fingerprint") != fingerprint(conn) or not all(name in state for name in views):
+        return False
+    # restore() returns False when the saved state does not fit the view's settings
+    return all(view.restore(state[name]) is not False for name, view in views.items())
+
+
+def build(database_path, data_dir, directory=None, columnar=True, partitioned=()):
+    """Create a ready-to-open database plus its derived files and manifest.
+
+    Runs the migrations, loads the CSVs in ``data_dir``, splits the
+    ``partitioned`` tables into monthly partitions, refreshes planner
+    statistics, builds the rollups and (optionally) the columnar store, then
+    checkpoints the WAL so the database is one self-contained file, and
+    records its SHA-256 in ``<directory>/manifest.json``.
+    """
+    from aggregates import DashboardAggregates
+    from ingest import load_directory
+    from recommender import CoPurchaseRecommender
+    from risk import SupplierRisk
+    from sketches import TicketSketches
+
+    directory = directory or artifact_dir(database_path)
+    started = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+    conn = sqlite3.connect(database_path)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        migrate(conn)
+        load_directory(conn, data_dir)
+        partition_tables(conn, partitioned)
+        for table in SEARCH_INDEXES:
+            conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('optimize')")
+        conn.execute("PRAGMA optimize")
+        conn.commit()
+
+        views = {
+            "dashboard": DashboardAggregates(),
+            "recommender": CoPurchaseRecommender.from_env(),
+            "tickets": TicketSketches.from_env(),
+            "supplier_risk": SupplierRisk.from_env(),
+        }
+        for view in views.values():
+            view.rebuild(conn)
+        save_views(directory, conn, views)
+        if columnar:
+            from columnar import ColumnStore
+
+            ColumnStore.from_env(database_path).load_or_build(conn)
+
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        manifest = {
+            "database": os.path.basename(database_path),
+            "schema_version": schema_version(conn),
+            "fingerprint": fingerprint(conn),
+            "size": os.path.getsize(database_path),
+            "sha256": checksum(database_path),
+            "built_at": datetime.now(timezone.utc).isoformat(),
+            "build_seconds": round(time.perf_counter() - started, 3),
+        }
+    finally:
+        conn.close()
+    _write_atomic(os.path.join(directory, MANIFEST), json.dumps(manifest, indent=2).encode())
+    return manifest
+
+
+def verify(database_path, directory=None):
+    """Compare the database file with its manifest; returns a list of problems."""
+    manifest = read_manifest(directory or artifact_dir(database_path))
+    if manifest is None:
+        return ["no manifest"]
+    problems = []
+    size = os.path.getsize(database_path)
+    if size != manifest["size"]:
+        problems.append(f"size is {size}, manifest says {manifest['size']}")
+    digest = checksum(database_path)
+    if digest != manifest["sha256"]:
+        problems.append(f"sha256 is {digest}, manifest says {manifest['sha256']}")
+    if manifest["schema_version"] != SCHEMA_VERSION:
+        problems.append(f"schema version {manifest['schema_version']} but the code expects {SCHEMA_VERSION}")
+    return problems
+
+
+def main():
+    # Usage: python artifact.py build --db data/business_data.db --data-dir data
+    #        python artifact.py verify --db data/business_data.db
+    parser = argparse.ArgumentParser(description="Prebuild and checksum the database artifact")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="load the CSVs and write the artifact and manifest")
+    build_cmd.add_argument("--db", required=True)
+    build_cmd.add_argument("--data-dir", required=True)
+    build_cmd.add_argument("--artifact-dir")
+    build_cmd.add_argument("--no-columnar", action="store_true", help="skip building the columnar store")
+    build_cmd.add_argument("--partition", action="append", default=[], choices=list(PARTITIONED),
+                           help="store this table as monthly partitions (repeatable)")
+    verify_cmd = commands.add_parser("verify", help="check the database against its manifest")
+    verify_cmd.add_argument("--db", required=True)
+    verify_cmd.add_argument("--artifact-dir")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "build":
+        manifest = build(args.db, args.data_dir, args.artifact_dir, columnar=not args.no_columnar,
+                         partitioned=args.partition)
+        print(json.dumps(manifest, indent=2))
+        return 0
+    problems = verify(args.db, args.artifact_dir)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    print("ok" if not problems else "mismatch")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "last_modified", "expires_at")
+
+    def __init__(self, body, ttl):
+        now = time.time()
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.last_modified = formatdate(now, usegmt=True)
+        self.expires_at = now + ttl
+
+    @classmethod
+    def stored(cls, body, etag, last_modified, expires_at):
+        """An entry read back from a shared store, keeping its original validators."""
+        entry = cls.__new__(cls)
+        entry.body, entry.etag, entry.last_modified, entry.expires_at = body, etag, last_modified, expires_at
+        return entry
+
+
+class ResponseCache:
+    """TTL + LRU cache of pre-encoded response bodies.
+
+    Entries expire after ``ttl`` seconds and the least recently used entry is
+    evicted past ``maxsize``. ``invalidate`` bumps a per-key generation and
+    ``clear`` a cache-wide one, so a value computed before either is never
+    stored afterwards. Past ``maxsize`` per-key generations they are dropped
+    for one cache-wide bump, which keeps that guarantee.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at < time.time():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def generation(self, key):
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key, body, generation=None):
+        entry = CacheEntry(body, self.ttl)
+        with self._lock:
+            if generation is not None and generation != (self._epoch, self._generations.get(key, 0)):
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, keys):
+        with self._lock:
+            for key in keys:
+                self._generations[key] = self._generations.get(key, 0) + 1
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+            if len(self._generations) > self.maxsize:
+                self._epoch += 1
+                self._generations.clear()
+
+    def clear(self):
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._generations.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,654 @@
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from partitions import partition_source
+from queries import statements
+
+logger = logging.getLogger(__name__)
+
+# Day number (days since 1970-01-01) stored for rows without a date
+NULL_DAY = np.iinfo(np.int32).min
+
+# Above this many possible groups, keys are compacted with np.unique before bincount
+_DENSE_GROUPS = 1 << 24
+
+DATE_DIMENSIONS = ("day", "month", "year")
+
+# Per table: how rows are read, which code columns are derived and what is summed
+TABLES = {
+    "sales": {
+        "id": "transaction_id",
+        "sql": """
+            SELECT transaction_id,
+                   COALESCE(CAST(julianday(transaction_date) - 2440587.5 AS INTEGER), -2147483648),
+                   customer_id, product_id, COALESCE(quantity, 0), COALESCE(sale_amount, 0)
+            FROM sales
+        """,
+        "columns": [("id", np.int64), ("day", np.int32), ("customer_id", np.int32),
+                    ("product_id", np.int32), ("quantity", np.int32), ("sale_amount", np.float64)],
+        "date": "transaction_date",
+        "text": [],
+        "dimensions": DATE_DIMENSIONS + ("region", "industry", "category", "product_id"),
+    },
+    "tickets": {
+        "id": "ticket_id",
+        "sql": """
+            SELECT ticket_id,
+                   COALESCE(CAST(julianday(creation_date) - 2440587.5 AS INTEGER), -2147483648),
+                   customer_id, product_id, COALESCE(sentiment_score, 0), issue_type, status
+            FROM tickets
+        """,
+        "columns": [("id", np.int64), ("day", np.int32), ("customer_id", np.int32),
+                    ("product_id", np.int32), ("sentiment_score", np.float64)],
+        "date": "creation_date",
+        "text": ["issue_type", "status"],
+        "dimensions": DATE_DIMENSIONS + ("region", "industry", "category", "product_id", "issue_type", "status"),
+    },
+}
+
+
+def _days(values):
+    """'YYYY-MM-DD' strings (or None) to int32 day numbers."""
+    days = np.array([v if v else "NaT" for v in values], dtype="datetime64[D]").astype(np.int64)
+    days[days == np.datetime64("NaT").astype(np.int64)] = NULL_DAY
+    return days.astype(np.int32)
+
+
+def _months(days):
+    months = days.astype(np.int64).astype("datetime64[D]").astype("datetime64[M]").astype(np.int32)
+    months[days == NULL_DAY] = NULL_DAY
+    return months
+
+
+def parse_day(value):
+    """ISO date string to a day number; raises ValueError on bad input."""
+    return (date.fromisoformat(value) - date(1970, 1, 1)).days
+
+
+def _day_label(day):
+    return None if day == NULL_DAY else str(np.datetime64(int(day), "D"))
+
+
+def _month_label(month):
+    return None if month == NULL_DAY else str(np.datetime64(int(month), "M"))
+
+
+def _year_label(month):
+    return None if month == NULL_DAY else f"{1970 + int(month) // 12:04d}"
+
+
+class Dictionary:
+    """Text values to small integer codes; code 0 is reserved for NULL."""
+
+    def __init__(self, labels=None):
+        self.labels = list(labels) if labels else [None]
+        self._codes = {label: code for code, label in enumerate(self.labels)}
+
+    def encode(self, values):
+        codes = np.empty(len(values), dtype=np.int16)
+        for i, value in enumerate(values):
+            code = self._codes.get(value)
+            if code is None:
+                code = self._codes[value] = len(self.labels)
+                self.labels.append(value)
+            codes[i] = code
+        return codes
+
+
+class _Codes:
+    """Dictionaries plus customer -> region/industry and product -> category codes."""
+
+    def __init__(self, dictionaries, customer_codes, product_codes):
+        self.dictionaries = dictionaries
+        self.customer_codes = customer_codes
+        self.product_codes = product_codes
+
+    @classmethod
+    def read(cls, conn):
+        dictionaries = {dim: Dictionary() for dim in ("region", "industry", "category", "issue_type", "status")}
+        customers = conn.execute("SELECT customer_id, region, industry FROM customers").fetchall()
+        size = max((row[0] for row in customers), default=0) + 1
+        customer_codes = {dim: np.zeros(size, dtype=np.int16) for dim in ("region", "industry")}
+        if customers:
+            ids = np.array([row[0] for row in customers])
+            customer_codes["region"][ids] = dictionaries["region"].encode([row[1] for row in customers])
+            customer_codes["industry"][ids] = dictionaries["industry"].encode([row[2] for row in customers])
+
+        products = conn.execute("SELECT product_id, category FROM products").fetchall()
+        product_codes = np.zeros(max((row[0] for row in products), default=0) + 1, dtype=np.int16)
+        if products:
+            product_codes[np.array([row[0] for row in products])] = \
+                dictionaries["category"].encode([row[1] for row in products])
+        return cls(dictionaries, customer_codes, product_codes)
+
+    def derive(self, columns):
+        """Add month and customer/product code columns to raw fact columns."""
+        columns["month"] = _months(columns["day"])
+        for dim, codes in self.customer_codes.items():
+            columns[dim] = _lookup(codes, columns["customer_id"])
+        columns["category"] = _lookup(self.product_codes, columns["product_id"])
+        return columns
+
+    def read_table(self, conn, name, batch=200_000):
+        spec = TABLES[name]
+        dtypes = dict(spec["columns"])
+        dtypes.update({column: np.int16 for column in spec["text"]})
+        parts = {column: [] for column in dtypes}
+        cursor = conn.execute(spec["sql"])
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            values = list(zip(*rows))
+            for (column, dtype), column_values in zip(spec["columns"], values):
+                parts[column].append(np.array(column_values, dtype=dtype))
+            for column, column_values in zip(spec["text"], values[len(spec["columns"]):]):
+                parts[column].append(self.dictionaries[column].encode(column_values))
+        columns = {column: np.concatenate(chunks) if chunks else np.empty(0, dtype=dtypes[column])
+                   for column, chunks in parts.items()}
+        return self.derive(columns)
+
+
+def _lookup(codes, ids):
+    known = (ids >= 0) & (ids < len(codes))
+    return np.where(known, codes[np.where(known, ids, 0)], 0).astype(np.int16)
+
+
+class _Table:
+    """One table's columns, sorted by day so a date range is a contiguous slice."""
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.rows = len(columns["day"])
+
+    def slice(self, start, end):
+        days = self.columns["day"]
+        lo = 0 if start is None else int(np.searchsorted(days, start, side="left"))
+        hi = self.rows if end is None else int(np.searchsorted(days, end, side="right"))
+        if start is not None:
+            # Undated rows sort first; a lower bound excludes them
+            lo = max(lo, int(np.searchsorted(days, NULL_DAY, side="right")))
+        return {name: column[lo:hi] for name, column in self.columns.items()}
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class ColumnStore:
+    """Columnar copy of ``sales`` and ``tickets`` for grouped analytics.
+
+    Each table is held as NumPy columns sorted by day number, with customer
+    region/industry and product category stored as int16 codes next to the
+    facts. Columns are saved as ``.npy`` files under ``directory`` and
+    memory-mapped on startup when they still match the database. Recorded
+    rows go to a small in-memory tail that a background thread merges into
+    a new persisted version once it exceeds ``tail_rows``.
+
+    New versions are written without holding ``_lock``, so recording rows
+    and queries carry on meanwhile; only the swap to the written version
+    takes it. ``_save_lock`` lets one rebuild or compaction write at a time.
+    """
+
+    def __init__(self, directory, tail_rows=250_000):
+        self.directory = directory
+        self.tail_rows = tail_rows
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._compaction = None
+        self._tables = {}
+        self._tails = {name: [] for name in TABLES}
+        self._fingerprint = {}
+        self._codes = None
+        # Rows recorded while a rebuild reads the database, replayed after the swap
+        self._replay = None
+        self.version = 0
+        self.built_at = None
+        self.loaded_from_disk = False
+
+    @classmethod
+    def from_env(cls, database_path):
+        # Kept next to the database by default, e.g. business_data.columnar/
+        return cls(
+            os.getenv("COLUMNAR_DIR", os.path.splitext(database_path)[0] + ".columnar"),
+            tail_rows=int(os.getenv("COLUMNAR_TAIL_ROWS", 250_000)),
+        )
+
+    # -- building and persistence -------------------------------------------
+
+    def _db_fingerprint(self, conn):
+        return {
+            name: list(conn.execute(f"SELECT COUNT(*), MAX({spec['id']}) FROM {name}").fetchone())
+            for name, spec in TABLES.items()
+        }
+
+    def load_or_build(self, conn):
+        """Memory-map the saved columns if they match the database, else rebuild."""
+        fingerprint = self._db_fingerprint(conn)
+        try:
+            with open(os.path.join(self.directory, "current.json")) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = None
+        if manifest is not None and manifest["fingerprint"] == fingerprint:
+            try:
+                self._load(manifest)
+                self.loaded_from_disk = True
+                logger.info("columnar: mapped version %s from %s", manifest["version"], self.directory)
+                return
+            except (OSError, ValueError, KeyError) as exc:
+                logger.warning("columnar: could not map saved columns (%s), rebuilding", exc)
+        self.rebuild(conn)
+
+    def _map(self, path, name, columns):
+        return _Table({column: np.load(os.path.join(path, f"{name}.{column}.npy"), mmap_mode="r")
+                       for column in columns})
+
+    def _load(self, manifest):
+        path = os.path.join(self.directory, manifest["path"])
+        tables = {name: self._map(path, name, manifest["columns"][name]) for name in TABLES}
+        codes = _Codes(
+            {dim: Dictionary(labels) for dim, labels in manifest["dictionaries"].items()},
+            {dim: np.load(os.path.join(path, f"customers.{dim}.npy")) for dim in ("region", "industry")},
+            np.load(os.path.join(path, "products.category.npy")),
+        )
+        with self._lock:
+            self._tables = tables
+            self._tails = {name: [] for name in TABLES}
+            self._codes = codes
+            self._fingerprint = manifest["fingerprint"]
+            self.version = manifest["version"]
+            self.built_at = manifest["built_at"]
+
+    def rebuild(self, conn):
+        """Re-read both tables; queries keep using the current version meanwhile."""
+        started = time.perf_counter()
+        with self._lock:
+            self._replay = {name: [] for name in TABLES}
+        try:
+            fingerprint = self._db_fingerprint(conn)
+            codes = _Codes.read(conn)
+            tables = {name: codes.read_table(conn, name) for name in TABLES}
+        except Exception:
+            with self._lock:
+                self._replay = None
+            raise
+
+        with self._save_lock:
+            with self._lock:
+                version = self.version + 1
+            relative = self._write(tables, codes, version)
+            mapped = self._map_version(relative, tables)
+            with self._lock:
+                self._swap(version, relative, mapped, codes, fingerprint, {name: [] for name in TABLES})
+                replay, self._replay = self._replay, None
+                # Rows recorded while the tables were read, unless the read already saw them
+                for name, rows in replay.items():
+                    seen = set(tables[name]["id"].tolist())
+                    rows = [row for row in rows if row[TABLES[name]["id"]] not in seen]
+                    if rows:
+                        self._append(name, rows)
+            self._prune(keep=relative)
+        self._schedule_compaction()
+        logger.info("columnar: rebuilt %s in %.2fs",
+                    ", ".join(f"{t.rows} {name}" for name, t in self._tables.items()),
+                    time.perf_counter() - started)
+
+    def _write(self, tables, codes, version):
+        """Write ``tables`` and ``codes`` as ``version``; returns its directory name.
+
+        Runs without ``_lock``. Every worker process saves its own versions
+        (e.g. when compacting its tail), so each goes to a directory named
+        after the writing process and is never written to again once renamed
+        into place: files another process has mapped are never overwritten.
+        """
+        relative = f"v{version}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        path = os.path.join(self.directory, relative)
+        tmp_path = os.path.join(self.directory, f".{relative}.tmp")
+        os.makedirs(tmp_path)
+        for name, columns in tables.items():
+            order = np.argsort(columns["day"], kind="stable")
+            for column, values in columns.items():
+                np.save(os.path.join(tmp_path, f"{name}.{column}.npy"), np.ascontiguousarray(values[order]))
+        for dim, values in codes.customer_codes.items():
+            np.save(os.path.join(tmp_path, f"customers.{dim}.npy"), values)
+        np.save(os.path.join(tmp_path, "products.category.npy"), codes.product_codes)
+        os.rename(tmp_path, path)
+        return relative
+
+    def _map_version(self, relative, tables):
+        path = os.path.join(self.directory, relative)
+        return {name: self._map(path, name, columns) for name, columns in tables.items()}
+
+    def _swap(self, version, relative, mapped, codes, fingerprint, tails):
+        """Make a written version current. Caller holds the lock."""
+        built_at = datetime.now(timezone.utc).isoformat()
+        manifest = {
+            "version": version,
+            "path": relative,
+            "built_at": built_at,
+            "fingerprint": fingerprint,
+            "columns": {name: list(table.columns) for name, table in mapped.items()},
+            # Taken now, so they cover codes handed out while the version was written
+            "dictionaries": {dim: d.labels for dim, d in codes.dictionaries.items()},
+        }
+        tmp = os.path.join(self.directory, f"current.json.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.directory, "current.json"))
+
+        self._tables = mapped
+        self._codes = codes
+        self._tails = tails
+        self._fingerprint = fingerprint
+        self.version = version
+        self.built_at = built_at
+
+    def _prune(self, keep):
+        # Only versions this process wrote, or left behind by processes that have exited,
+        # are removed; unlinked files stay readable to whoever still maps them
+        for entry in os.listdir(self.directory):
+            # Half-written versions (".v…tmp") are only removed once their process is gone
+            partial = entry.startswith(".v") and entry.endswith(".tmp")
+            if not (entry.startswith("v") or partial) or entry == keep:
+                continue
+            try:
+                pid = int(entry.split("-")[1])
+            except (IndexError, ValueError):
+                pid = None
+            if pid is None or (pid == os.getpid() and not partial) or not _alive(pid):
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    # -- incremental updates ------------------------------------------------
+
+    def record_sales(self, rows):
+        self._record("sales", rows)
+
+    def record_tickets(self, rows):
+        self._record("tickets", rows)
+
+    def _record(self, name, rows):
+        if not rows:
+            return
+        with self._lock:
+            if self._replay is not None:
+                self._replay[name].extend(rows)
+            if self._tables:
+                self._append(name, rows)
+        self._schedule_compaction()
+
+    def _append(self, name, rows):
+        """Add recorded rows to the tail of ``name``. Caller holds the lock."""
+        spec = TABLES[name]
+        columns = {
+            "id": np.array([row[spec["id"]] for row in rows], dtype=np.int64),
+            "day": _days([row[spec["date"]] for row in rows]),
+        }
+        for column, dtype in spec["columns"][2:]:
+            columns[column] = np.array([row[column] or 0 for row in rows], dtype=dtype)
+        for column in spec["text"]:
+            columns[column] = self._codes.dictionaries[column].encode([row[column] for row in rows])
+        self._tails[name].append(self._codes.derive(columns))
+        count, newest = self._fingerprint[name]
+        self._fingerprint[name] = [count + len(rows), max(newest or 0, int(columns["id"].max()))]
+
+    def _tail_full(self):
+        # Caller holds the lock
+        return any(sum(len(part["day"]) for part in parts) >= self.tail_rows for parts in self._tails.values())
+
+    def _schedule_compaction(self):
+        with self._lock:
+            if self._compaction is not None or not self._tables or not self._tail_full():
+                return
+            self._compaction = threading.Thread(target=self._compact, name="columnar-compact", daemon=True)
+            self._compaction.start()
+
+    def _compact(self):
+        """Merge the tails into the mapped columns as a new version, without blocking queries or records."""
+        try:
+            with self._save_lock:
+                with self._lock:
+                    if not self._tail_full():
+                        return
+                    parts = {name: [table.columns] + self._tails[name] for name, table in self._tables.items()}
+                    codes, fingerprint, version = self._codes, dict(self._fingerprint), self.version + 1
+                tables = {name: {column: np.concatenate([part[column] for part in table_parts])
+                                 for column in table_parts[0]}
+                          for name, table_parts in parts.items()}
+                relative = self._write(tables, codes, version)
+                mapped = self._map_version(relative, tables)
+                with self._lock:
+                    # Rows recorded while the version was written stay in the tails, and in
+                    # the fingerprint of what is in memory; the manifest has the saved rows'
+                    tails = {name: self._tails[name][len(table_parts) - 1:] for name, table_parts in parts.items()}
+                    current = self._fingerprint
+                    self._swap(version, relative, mapped, codes, fingerprint, tails)
+                    self._fingerprint = current
+                self._prune(keep=relative)
+        except Exception:
+            logger.exception("columnar: compaction failed; the rows stay in the tail")
+        finally:
+            with self._lock:
+                self._compaction = None
+        self._schedule_compaction()
+
+    def wait_for_compaction(self):
+        """Block until a running background compaction has finished."""
+        with self._lock:
+            compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+
+    # -- queries ------------------------------------------------------------
+
+    def group(self, name, dimensions, start=None, end=None):
+        """Grouped measures of ``name`` between day numbers ``start`` and ``end`` (inclusive).
+
+        Returns one dict per non-empty group with the dimension labels and
+        the table's measures.
+        """
+        with self._lock:
+            table = self._tables[name]
+            tail = list(self._tails[name])
+            labels = {dim: list(d.labels) for dim, d in self._codes.dictionaries.items()}
+
+        parts = [table.slice(start, end)]
+        for part in tail:
+            mask = np.ones(len(part["day"]), dtype=bool)
+            if start is not None:
+                mask &= (part["day"] >= start) & (part["day"] != NULL_DAY)
+            if end is not None:
+                mask &= part["day"] <= end
+            parts.append({column: values[mask] for column, values in part.items()})
+
+        groups = {}
+        for part in parts:
+            for key, sums in _group(part, dimensions, _measures(name, part)).items():
+                total = groups.get(key)
+                groups[key] = sums if total is None else total + sums
+
+        results = []
+        for key, sums in groups.items():
+            row = {dim: _label(dim, value, labels) for dim, value in zip(dimensions, key)}
+            row.update(_finish(name, sums))
+            results.append(row)
+        results.sort(key=lambda row: tuple((row[dim] is None, row[dim]) for dim in dimensions))
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "built_at": self.built_at,
+                "loaded_from_disk": self.loaded_from_disk,
+                "rows": {name: table.rows for name, table in self._tables.items()},
+                "tail_rows": {name: sum(len(part["day"]) for part in parts) for name, parts in self._tails.items()},
+            }
+
+
+def _measures(name, columns):
+    if name == "sales":
+        return [columns["sale_amount"], columns["quantity"]]
+    return [columns["sentiment_score"]]
+
+
+def _finish(name, sums):
+    if name == "sales":
+        total_sales, quantity, count = sums
+        return {"total_sales": round(float(total_sales), 2), "quantity": int(quantity), "transactions": int(count)}
+    sentiment, count = float(sums[0]), int(sums[1])
+    return {"tickets": count, "avg_sentiment": round(sentiment / count, 2) if count else None}
+
+
+def _dimension(columns, dim):
+    if dim == "year":
+        months = columns["month"]
+        return np.where(months == NULL_DAY, NULL_DAY, months // 12 * 12)
+    return columns[dim]
+
+
+def _label(dim, value, labels):
+    if dim == "day":
+        return _day_label(value)
+    if dim == "month":
+        return _month_label(value)
+    if dim == "year":
+        return _year_label(value)
+    if dim == "product_id":
+        return int(value)
+    return labels[dim][value]
+
+
+def _group(columns, dimensions, measures):
+    """Sum ``measures`` (plus a row count) per distinct combination of ``dimensions``."""
+    rows = len(columns["day"])
+    if rows == 0:
+        return {}
+    if not dimensions:
+        return {(): np.array([float(np.sum(m)) for m in measures] + [rows])}
+
+    codes, sizes, offsets = [], [], []
+    for dim in dimensions:
+        values = _dimension(columns, dim).astype(np.int64)
+        if dim in DATE_DIMENSIONS:
+            # Undated rows get their own slot after the last date
+            dated = values != NULL_DAY
+            low = int(values[dated].min()) if dated.any() else 0
+            high = int(values[dated].max()) if dated.any() else 0
+            codes.append(np.where(dated, values - low, high - low + 1))
+            sizes.append(high - low + 2)
+            offsets.append(low)
+        else:
+            codes.append(values)
+            sizes.append(int(values.max()) + 1)
+            offsets.append(0)
+
+    key = codes[0]
+    for code, size in zip(codes[1:], sizes[1:]):
+        key = key * size + code
+    space = int(np.prod(sizes, dtype=np.float64))
+    if space <= _DENSE_GROUPS:
+        present = np.bincount(key, minlength=space)
+        group_keys = np.flatnonzero(present)
+        inverse, groups = key, space
+    else:
+        group_keys, inverse = np.unique(key, return_inverse=True)
+        groups = len(group_keys)
+    counts = np.bincount(inverse, minlength=groups)
+    sums = [np.bincount(inverse, weights=m, minlength=groups) for m in measures]
+    if space <= _DENSE_GROUPS:
+        counts = counts[group_keys]
+        sums = [s[group_keys] for s in sums]
+
+    decoded = np.unravel_index(group_keys, sizes)
+    result = {}
+    for i in range(len(group_keys)):
+        key_values = []
+        for dim, code, size, offset in zip(dimensions, decoded, sizes, offsets):
+            value = int(code[i])
+            if dim in DATE_DIMENSIONS:
+                value = NULL_DAY if value == size - 1 else value + offset
+            key_values.append(value)
+        result[tuple(key_values)] = np.array([float(s[i]) for s in sums] + [float(counts[i])])
+    return result
+
+
+# Equivalent row-store queries, used when the column store is disabled
+_SQL_DIMENSIONS = {
+    "sales": {
+        "day": "s.transaction_date",
+        "month": "substr(s.transaction_date, 1, 7)",
+        "year": "substr(s.transaction_date, 1, 4)",
+        "region": "c.region",
+        "industry": "c.industry",
+        "category": "p.category",
+        "product_id": "s.product_id",
+    },
+    "tickets": {
+        "day": "s.creation_date",
+        "month": "substr(s.creation_date, 1, 7)",
+        "year": "substr(s.creation_date, 1, 4)",
+        "region": "c.region",
+        "industry": "c.industry",
+        "category": "p.category",
+        "product_id": "s.product_id",
+        "issue_type": "s.issue_type",
+        "status": "s.status",
+    },
+}
+
+
+def group_sql(conn, name, dimensions, start=None, end=None):
+    """Same result as ``ColumnStore.group`` computed with SQL on the row store."""
+    expressions = [_SQL_DIMENSIONS[name][dim] for dim in dimensions]
+    date_column = f"s.{TABLES[name]['date']}"
+    if name == "sales":
+        measures = "SUM(s.sale_amount), SUM(s.quantity), COUNT(*)"
+    else:
+        measures = "SUM(s.sentiment_score), COUNT(*)"
+    conditions, params = [], {}
+    if start is not None:
+        conditions.append(f"{date_column} >= :start")
+        params["start"] = _day_label(start)
+    if end is not None:
+        conditions.append(f"{date_column} <= :end")
+        params["end"] = _day_label(end)
+
+    # Only the partitions the date range can match are read
+    source, label = partition_source(conn, name, params.get("start"), params.get("end"))
+    sql = f"SELECT {', '.join(expressions + [measures])} FROM {source} s"
+    if {"region", "industry"} & set(dimensions):
+        sql += " LEFT JOIN customers c ON s.customer_id = c.customer_id"
+    if "category" in dimensions:
+        sql += " LEFT JOIN products p ON s.product_id = p.product_id"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    if expressions:
+        sql += " GROUP BY " + ", ".join(str(i + 1) for i in range(len(expressions)))
+
+    statement = statements.register(f"{label}_group({','.join(dimensions)};{','.join(params)})", sql)
+    results = []
+    for row in statements.execute(conn, statement, params):
+        row = tuple(row)
+        if not expressions and row[-1] == 0:
+            continue
+        key = row[:len(expressions)]
+        result = dict(zip(dimensions, key))
+        result.update(_finish(name, np.array([v or 0 for v in row[len(expressions):]], dtype=np.float64)))
+        results.append((key, result))
+    results.sort(key=lambda item: tuple((v is None, v) for v in item[0]))
+    return [result for _, result in results]
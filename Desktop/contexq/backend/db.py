@@ -0,0 +1,261 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import observe_statement
+from queries import Statement, statements
+
+
+def _execute(conn, sql, params):
+    # Registered statements are tracked and reported under their name
+    if isinstance(sql, Statement):
+        return statements.execute(conn, sql, params), sql.name
+    return conn.execute(sql, params), sql
+
+
+def fetch_all(conn, sql, params=()):
+    """Run a query (SQL text or a registered ``Statement``) and return its rows as plain dicts."""
+    started = time.perf_counter()
+    cursor, label = _execute(conn, sql, params)
+    columns = [column[0] for column in cursor.description]
+    rows = [dict(zip(columns, row)) for row in cursor]
+    observe_statement(label, time.perf_counter() - started, len(rows))
+    return rows
+
+
+def fetch_one(conn, sql, params=()):
+    started = time.perf_counter()
+    cursor, label = _execute(conn, sql, params)
+    row = cursor.fetchone()
+    observe_statement(label, time.perf_counter() - started, 1 if row is not None else 0)
+    return dict(zip(row.keys(), row)) if row is not None else None
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+class PooledConnection(sqlite3.Connection):
+    """Connection that remembers which registered statements it has prepared."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+class ConnectionPool:
+    """Bounded pool of SQLite connections opened in WAL mode.
+
+    A thread checks out one connection at a time; nested checkouts on the same
+    thread reuse the connection it already holds, so helpers that open their
+    own ``with pool.connection()`` block never deadlock against the caller.
+    With ``read_only`` the file is opened immutable, for snapshots that never
+    change once written. Each connection caches up to
+    ``statement_cache_size`` prepared statements, enough to hold every
+    statement in the ``queries.statements`` registry.
+    """
+
+    def __init__(self, database_path, max_size=8, timeout=5.0, cache_size_kb=65536,
+                 mmap_size=268435456, synchronous="NORMAL", busy_timeout_ms=5000,
+                 healthcheck_interval=30.0, read_only=False, statement_cache_size=256):
+        self.database_path = database_path
+        self.read_only = read_only
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.synchronous = synchronous
+        self.busy_timeout_ms = busy_timeout_ms
+        self.healthcheck_interval = healthcheck_interval
+        self.statement_cache_size = statement_cache_size
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._size = 0
+        self._in_use = 0
+        self._last_used = {}
+        self._closed = False
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._healthcheck_failures = 0
+
+    @classmethod
+    def from_env(cls, database_path):
+        return cls(
+            database_path,
+            max_size=_env_int("DB_POOL_SIZE", 8),
+            timeout=_env_float("DB_POOL_TIMEOUT", 5.0),
+            cache_size_kb=_env_int("DB_CACHE_SIZE_KB", 65536),
+            mmap_size=_env_int("DB_MMAP_SIZE", 268435456),
+            synchronous=os.getenv("DB_SYNCHRONOUS", "NORMAL").upper(),
+            busy_timeout_ms=_env_int("DB_BUSY_TIMEOUT_MS", 5000),
+            healthcheck_interval=_env_float("DB_POOL_HEALTHCHECK_INTERVAL", 30.0),
+            statement_cache_size=_env_int("DB_STATEMENT_CACHE_SIZE", 256),
+        )
+
+    def _open(self):
+        if self.read_only:
+            conn = sqlite3.connect(f"file:{self.database_path}?mode=ro&immutable=1", uri=True,
+                                   check_same_thread=False, factory=PooledConnection,
+                                   cached_statements=self.statement_cache_size)
+        else:
+            conn = sqlite3.connect(self.database_path, check_same_thread=False, factory=PooledConnection,
+                                   cached_statements=self.statement_cache_size)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        if not self.read_only:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        with self._lock:
+            self._created += 1
+            self._last_used[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self._size -= 1
+            self._discarded += 1
+            self._last_used.pop(id(conn), None)
+
+    def _is_healthy(self, conn):
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle_for < self.healthcheck_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            with self._lock:
+                self._healthcheck_failures += 1
+            return False
+
+    def _acquire(self):
+        started = time.monotonic()
+        waited = False
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+                with self._lock:
+                    can_grow = self._size < self.max_size
+                    if can_grow:
+                        self._size += 1
+                if can_grow:
+                    try:
+                        conn = self._open()
+                    except sqlite3.Error:
+                        with self._lock:
+                            self._size -= 1
+                        raise
+                else:
+                    waited = True
+                    remaining = self.timeout - (time.monotonic() - started)
+                    try:
+                        conn = self._idle.get(timeout=max(remaining, 0))
+                    except queue.Empty:
+                        with self._lock:
+                            self._timeouts += 1
+                        raise PoolTimeout(
+                            f"no database connection available after {self.timeout}s")
+            if self._is_healthy(conn):
+                break
+            self._discard(conn)
+
+        wait = time.monotonic() - started
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+            if waited:
+                self._waits += 1
+                self._wait_time += wait
+                self._max_wait = max(self._max_wait, wait)
+        return conn
+
+    def _release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self._discard(conn)
+            return
+        if self._closed:
+            self._discard(conn)
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            try:
+                yield held
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            self._release(conn)
+
+    def close(self):
+        # Connections still checked out are closed as they come back
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total": round(self._wait_time, 6),
+                "wait_time_max": round(self._max_wait, 6),
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "healthcheck_failures": self._healthcheck_failures,
+            }
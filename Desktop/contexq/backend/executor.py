@@ -0,0 +1,169 @@
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QueryTimeout(Exception):
+    """Raised when a job did not finish within its timeout and was interrupted."""
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """Raised when an endpoint's concurrency slot could not be taken in time."""
+
+
+class _Job:
+    """Tracks which connection a job is running on, so it can be interrupted."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = None
+        self.cancelled = False
+
+    def interrupt(self):
+        with self.lock:
+            self.cancelled = True
+            if self.conn is not None:
+                self.conn.interrupt()
+
+
+class DBExecutor:
+    """Dedicated, bounded thread pools for database work.
+
+    Jobs run on one of two lanes: ``lookup`` for cheap point reads and
+    ``analytics`` for heavy aggregates, so a burst of slow analytical requests
+    can never occupy the threads the lookups need. Each endpoint can also cap
+    how many of its jobs run at once. A job that overruns its timeout has its
+    running SQLite statement cancelled with ``Connection.interrupt()``.
+    A job may be given another ``pool`` (e.g. a read replica); the pool a
+    thread's current job runs on is available from ``current_pool()``.
+    """
+
+    def __init__(self, pool, lanes, timeouts):
+        self.pool = pool
+        self.timeouts = timeouts
+        self._executors = {
+            lane: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"db-{lane}")
+            for lane, workers in lanes.items()
+        }
+        self._lanes = dict(lanes)
+        self._limits = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {lane: {"submitted": 0, "active": 0, "completed": 0, "timeouts": 0, "rejected": 0}
+                       for lane in lanes}
+
+    @classmethod
+    def from_env(cls, pool):
+        return cls(
+            pool,
+            lanes={
+                "lookup": int(os.getenv("DB_LOOKUP_WORKERS", 6)),
+                "analytics": int(os.getenv("DB_ANALYTICS_WORKERS", 2)),
+            },
+            timeouts={
+                "lookup": float(os.getenv("DB_LOOKUP_TIMEOUT", 5.0)),
+                "analytics": float(os.getenv("DB_ANALYTICS_TIMEOUT", 30.0)),
+            },
+        )
+
+    def current_pool(self):
+        """Pool of the job running on this thread, or None outside a job."""
+        return getattr(self._local, "pool", None)
+
+    def _run_job(self, job, lane, fn, args, kwargs, pool, connection):
+        with job.lock:
+            if job.cancelled:
+                raise QueryTimeout("request timed out before it started")
+        with self._lock:
+            self._stats[lane]["active"] += 1
+        self._local.pool = pool
+        try:
+            if not connection:
+                return fn(*args, **kwargs)
+            with pool.connection() as conn:
+                with job.lock:
+                    job.conn = conn
+                try:
+                    # fn's own get_db_connection() reuses this thread's connection
+                    return fn(*args, **kwargs)
+                finally:
+                    with job.lock:
+                        job.conn = None
+        finally:
+            self._local.pool = None
+            with self._lock:
+                self._stats[lane]["active"] -= 1
+                self._stats[lane]["completed"] += 1
+
+    async def run(self, lane, fn, args=(), kwargs=None, timeout=None, limit_key=None, limit=None, pool=None,
+                  connection=True):
+        """Run ``fn(*args, **kwargs)`` on ``lane`` and await its result.
+
+        ``limit`` caps concurrent jobs sharing ``limit_key``; the wait for a
+        slot counts against the same ``timeout`` as the job itself, and the
+        slot is held until the job has finished, even after a timeout.
+        ``pool`` defaults to the executor's own. Jobs that work from memory
+        pass ``connection=False`` so they do not hold a pooled connection;
+        such a job cannot be interrupted once it has started.
+        """
+        kwargs = kwargs or {}
+        pool = self.pool if pool is None else pool
+        timeout = self.timeouts[lane] if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        semaphore = self._semaphore(limit_key, limit) if limit else None
+        if semaphore is not None:
+            try:
+                await asyncio.wait_for(semaphore.acquire(), timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._stats[lane]["rejected"] += 1
+                raise ConcurrencyLimitExceeded(f"too many concurrent {limit_key} requests")
+
+        job = _Job()
+        with self._lock:
+            self._stats[lane]["submitted"] += 1
+        try:
+            # Carry the caller's context variables (e.g. per-request timings) into the thread
+            context = contextvars.copy_context()
+            future = loop.run_in_executor(
+                self._executors[lane],
+                functools.partial(context.run, self._run_job, job, lane, fn, args, kwargs, pool, connection))
+        except BaseException:
+            if semaphore is not None:
+                semaphore.release()
+            raise
+        if semaphore is not None:
+            # A job that timed out keeps running until the interrupt lands, so its slot is only freed then
+            future.add_done_callback(lambda f: semaphore.release())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(deadline - loop.time(), 0))
+        except asyncio.TimeoutError:
+            job.interrupt()
+            with self._lock:
+                self._stats[lane]["timeouts"] += 1
+            # Retrieve the interrupted job's error so it is not reported as unhandled
+            future.add_done_callback(lambda f: f.exception())
+            raise QueryTimeout(f"query exceeded {timeout}s and was interrupted")
+
+    def _semaphore(self, key, limit):
+        with self._lock:
+            semaphore = self._limits.get(key)
+            if semaphore is None:
+                semaphore = self._limits[key] = asyncio.Semaphore(limit)
+            return semaphore
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                lane: dict(stats, workers=self._lanes[lane], timeout=self.timeouts[lane])
+                for lane, stats in self._stats.items()
+            }
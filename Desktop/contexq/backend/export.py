@@ -0,0 +1,215 @@
+import csv
+import io
+import json
+import sqlite3
+import zlib
+
+from ingest import SOURCES
+from partitions import partition_source
+
+# Column the from/to filters apply to, per table
+DATE_COLUMNS = {
+    "sales": "transaction_date",
+    "tickets": "creation_date",
+    "customers": "join_date",
+}
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", ".ndjson"),
+    "csv": ("text/csv", ".csv"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+COMPRESSIONS = ("none", "gzip", "zstd")
+
+
+class ExportError(ValueError):
+    """Raised for an export request that cannot be served as asked."""
+
+
+def export_columns(table, columns=None):
+    """Validate a comma-separated column list against the table's layout."""
+    available = list(SOURCES[table]["dtypes"])
+    if not columns:
+        return available
+    selected = [column.strip() for column in columns.split(",") if column.strip()]
+    unknown = [column for column in selected if column not in available]
+    if unknown or not selected:
+        raise ExportError(f"columns must be taken from: {', '.join(available)}")
+    return selected
+
+
+def export_query(table, columns, start=None, end=None, source=None):
+    """SELECT for an export; ``start``/``end`` are inclusive 'YYYY-MM-DD' bounds.
+
+    ``source`` replaces the table in the FROM clause, e.g. with only the
+    partitions the date range can match.
+    """
+    conditions, params = [], {}
+    if start or end:
+        date_column = DATE_COLUMNS.get(table)
+        if date_column is None:
+            raise ExportError(f"{table} has no date column to filter on")
+        if start:
+            conditions.append(f"{date_column} >= :start")
+            params["start"] = start
+        if end:
+            conditions.append(f"{date_column} <= :end")
+            params["end"] = end
+    sql = f"SELECT {', '.join(columns)} FROM {source or table}"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return sql, params
+
+
+def connect_readonly(database_path):
+    return sqlite3.connect(f"file:{database_path}?mode=ro", uri=True, check_same_thread=False)
+
+
+def stream_rows(conn, sql, params, batch_rows=10_000):
+    """Yield lists of row tuples from ``conn``, closing it once the rows run out.
+
+    The connection is opened for this export only (see ``export_stream``),
+    so a slow client never holds a pooled connection, and rows are pulled
+    ``batch_rows`` at a time from the cursor so memory stays flat regardless
+    of table size.
+    """
+    def generate():
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    return generate()
+
+
+def encode_ndjson(batches, columns):
+    for rows in batches:
+        yield "".join(json.dumps(dict(zip(columns, row)), separators=(",", ":")) + "\n"
+                      for row in rows).encode()
+
+
+def encode_csv(batches, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _Sink:
+    """Write-only file object that hands its contents back in pieces."""
+
+    def __init__(self):
+        self._chunks = []
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+def encode_parquet(batches, table, columns, codec="snappy"):
+    """One Parquet row group per batch, written through as soon as it is encoded."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("parquet export requires pyarrow")
+
+    types = {"int64": pa.int64(), "float64": pa.float64(), "object": pa.string()}
+    dtypes = SOURCES[table]["dtypes"]
+    dates = set(SOURCES[table]["dates"])
+    schema = pa.schema([(column, pa.date32() if column in dates else types[dtypes[column]])
+                        for column in columns])
+
+    def generate():
+        sink = _Sink()
+        writer = pq.ParquetWriter(sink, schema, compression=codec)
+        try:
+            for rows in batches:
+                values = list(zip(*rows))
+                arrays = [pa.array(column_values, type=pa.string()).cast(field.type)
+                          if field.type == pa.date32() else pa.array(column_values, type=field.type)
+                          for field, column_values in zip(schema, values)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    return generate()
+
+
+def compressor(compression):
+    """Streaming compressor object for ``compression``, or None for "none"."""
+    if compression == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ExportError("zstd compression requires the zstandard package")
+        return zstandard.ZstdCompressor().compressobj()
+    return None
+
+
+def compress(chunks, compressor):
+    """Compress a byte stream on the fly; returns ``chunks`` untouched without a compressor."""
+    if compressor is None:
+        return chunks
+
+    def generate():
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    return generate()
+
+
+def export_stream(database_path, table, fmt, columns, start=None, end=None, compression="none",
+                  batch_rows=10_000):
+    """Byte generator for one export; validation errors raise before streaming starts."""
+    if fmt not in FORMATS:
+        raise ExportError(f"format must be one of: {', '.join(FORMATS)}")
+    if compression not in COMPRESSIONS:
+        raise ExportError(f"compression must be one of: {', '.join(COMPRESSIONS)}")
+    # Parquet compresses its own pages, so the codec goes inside the file
+    stream_compressor = compressor(compression) if fmt != "parquet" else None
+    # Opened right away rather than on the first batch, so the file is held from here on.
+    # The rows generator only closes it once started, so any failure before that closes it here.
+    conn = connect_readonly(database_path)
+    try:
+        source, _ = partition_source(conn, table, start or None, end or None)
+        sql, params = export_query(table, columns, start, end, source)
+        batches = stream_rows(conn, sql, params, batch_rows)
+        if fmt == "ndjson":
+            return compress(encode_ndjson(batches, columns), stream_compressor)
+        if fmt == "csv":
+            return compress(encode_csv(batches, columns), stream_compressor)
+        return encode_parquet(batches, table, columns, codec="snappy" if compression == "none" else compression)
+    except Exception:
+        conn.close()
+        raise
@@ -0,0 +1,191 @@
+import logging
+import os
+import sqlite3
+import sys
+import time
+
+from partitions import route
+from product_stats import record as record_product_stats, refresh as refresh_product_stats
+
+logger = logging.getLogger(__name__)
+
+# CSV layout per table: default file name, column dtypes and date columns.
+# Dates are parsed once here and stored as 'YYYY-MM-DD' text.
+SOURCES = {
+    "customers": {
+        "file": "customers.csv",
+        "dtypes": {"customer_id": "int64", "customer_name": "object", "industry": "object",
+                   "region": "object", "join_date": "object"},
+        "dates": ["join_date"],
+    },
+    "products": {
+        "file": "products.csv",
+        "dtypes": {"product_id": "int64", "product_name": "object", "category": "object",
+                   "cost_price": "float64", "sales_price": "float64"},
+        "dates": [],
+    },
+    "sales": {
+        "file": "sales_transactions.csv",
+        "dtypes": {"transaction_id": "int64", "customer_id": "int64", "product_id": "int64",
+                   "quantity": "int64", "sale_amount": "float64", "transaction_date": "object"},
+        "dates": ["transaction_date"],
+    },
+    "tickets": {
+        "file": "support_tickets.csv",
+        "dtypes": {"ticket_id": "int64", "customer_id": "int64", "product_id": "int64",
+                   "issue_type": "object", "status": "object", "creation_date": "object",
+                   "resolution_date": "object", "sentiment_score": "float64"},
+        "dates": ["creation_date", "resolution_date"],
+    },
+    "suppliers": {
+        "file": "supplier_data.csv",
+        "dtypes": {"supplier_id": "int64", "supplier_name": "object", "product_id": "int64",
+                   "lead_time_days": "int64", "reliability_score": "float64"},
+        "dates": [],
+    },
+}
+
+# Dimension tables first, so facts never reference rows that are not loaded yet
+LOAD_ORDER = ["customers", "products", "suppliers", "sales", "tickets"]
+
+CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", 100_000))
+COMMIT_ROWS = int(os.getenv("INGEST_COMMIT_ROWS", 1_000_000))
+
+
+def _chunk_rows(chunk, columns, dates):
+    import pandas as pd
+
+    for column in dates:
+        chunk[column] = pd.to_datetime(chunk[column], errors="coerce").dt.strftime("%Y-%m-%d")
+    # Plain Python values with NULL for missing cells; sqlite3 cannot bind NumPy scalars
+    values = [chunk[column].astype(object).where(chunk[column].notna(), None).tolist() for column in columns]
+    return list(zip(*values))
+
+
+def drop_indexes(conn, table):
+    """Drop the secondary indexes of ``table`` and return their CREATE statements."""
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)).fetchall()
+    for name, _ in indexes:
+        conn.execute(f"DROP INDEX {name}")
+    return [sql for _, sql in indexes]
+
+
+def _already_ingested(conn, table, path):
+    stat = os.stat(path)
+    row = conn.execute(
+        "SELECT 1 FROM ingested_files WHERE table_name = ? AND path = ? AND size = ? AND mtime = ?",
+        (table, os.path.abspath(path), stat.st_size, int(stat.st_mtime))).fetchone()
+    return row is not None
+
+
+def ingest_csv(conn, table, path, chunk_rows=CHUNK_ROWS, commit_rows=COMMIT_ROWS, on_chunk=None, force=False):
+    """Stream one CSV file into ``table``, appending to what is already there.
+
+    Rows are inserted with executemany in transactions of ``commit_rows``
+    rows; rows whose primary key already exists are skipped. When the table
+    is empty its secondary indexes are dropped for the load and rebuilt once
+    at the end, and the whole load is one transaction so that a failed load
+    leaves the table empty with its indexes in place. Files already recorded
+    in ``ingested_files`` with the same size and mtime are skipped unless
+    ``force`` is set. ``on_chunk`` is called with each chunk's rows as dicts,
+    e.g. to feed in-memory rollups.
+    """
+    source = SOURCES[table]
+    if not force and _already_ingested(conn, table, path):
+        logger.info("%s: %s already ingested, skipping", table, path)
+        return {"table": table, "path": path, "rows": 0, "inserted": 0, "skipped_file": True}
+
+    columns = list(source["dtypes"])
+    insert = f"INSERT OR IGNORE INTO {{}} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+
+    started = time.perf_counter()
+    empty = conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is None
+    conn.execute("BEGIN")
+    deferred_indexes = drop_indexes(conn, table) if empty else []
+
+    # pandas is only needed while loading CSVs, so API workers never import it
+    import pandas as pd
+
+    rows_read = inserted = pending = 0
+    try:
+        reader = pd.read_csv(path, dtype=source["dtypes"], usecols=columns, chunksize=chunk_rows)
+        for chunk in reader:
+            rows = _chunk_rows(chunk, columns, source["dates"])
+            # route() sends each row to its month's partition (creating new ones) for partitioned
+            # tables; rowcount counts those inserts but not what triggers write, e.g. the search index
+            chunk_inserted = sum(conn.executemany(insert.format(target), target_rows).rowcount
+                                 for target, target_rows in route(conn, table, columns, rows).items())
+            inserted += chunk_inserted
+            # product_stats may only count rows that were inserted; when some were
+            # skipped as duplicates, the products they touch are recounted instead
+            if chunk_inserted == len(rows) or table == "products":
+                record_product_stats(conn, table, columns, rows)
+            elif table in ("sales", "tickets"):
+                refresh_product_stats(conn, {row[columns.index("product_id")] for row in rows})
+            rows_read += len(rows)
+            pending += len(rows)
+            if on_chunk is not None:
+                on_chunk([dict(zip(columns, row)) for row in rows])
+            # Committing before the dropped indexes are rebuilt could leave the table without them
+            if pending >= commit_rows and not deferred_indexes:
+                conn.commit()
+                conn.execute("BEGIN")
+                pending = 0
+            elapsed = time.perf_counter() - started
+            logger.info("%s: %d rows (%.0f rows/s)", table, rows_read, rows_read / elapsed if elapsed else 0)
+
+        for sql in deferred_indexes:
+            conn.execute(sql)
+        stat = os.stat(path)
+        conn.execute(
+            "INSERT OR REPLACE INTO ingested_files (table_name, path, size, mtime, rows, ingested_at) "
+            "VALUES (?, ?, ?, ?, ?, datetime('now'))",
+            (table, os.path.abspath(path), stat.st_size, int(stat.st_mtime), inserted))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    elapsed = time.perf_counter() - started
+    stats = {
+        "table": table,
+        "path": path,
+        "rows": rows_read,
+        "inserted": inserted,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows_read / elapsed) if elapsed else None,
+    }
+    logger.info("%s: loaded %d of %d rows in %.2fs (%s rows/s)",
+                table, inserted, rows_read, elapsed, stats["rows_per_sec"])
+    return stats
+
+
+def load_directory(conn, data_dir, **kwargs):
+    """Ingest the standard CSV file for every table found in ``data_dir``."""
+    results = []
+    for table in LOAD_ORDER:
+        path = os.path.join(data_dir, SOURCES[table]["file"])
+        if os.path.exists(path):
+            results.append(ingest_csv(conn, table, path, **kwargs))
+    conn.execute("ANALYZE")
+    conn.commit()
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python ingest.py path/to/business_data.db <table> file.csv [file.csv ...]
+    #        python ingest.py path/to/business_data.db --all path/to/data_dir
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from schema import migrate
+
+    conn = sqlite3.connect(sys.argv[1])
+    migrate(conn)
+    if sys.argv[2] == "--all":
+        load_directory(conn, sys.argv[3])
+    else:
+        for csv_path in sys.argv[3:]:
+            ingest_csv(conn, sys.argv[2], csv_path)
+        conn.execute("ANALYZE")
+        conn.commit()
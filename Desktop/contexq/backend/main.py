@@ -1,16 +1,63 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
-import pandas as pd
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Optional
 import sqlite3
-from datetime import datetime, timedelta
-import numpy as np
-from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from email.utils import parsedate_to_datetime
+import asyncio
+import functools
 import json
+import logging
 import os
+import re
+import threading
+import time
 
-app = FastAPI(title="Business Insights Dashboard API")
+from aggregates import DashboardAggregates
+from artifact import artifact_dir, build_lock, is_prebuilt, load_views, read_manifest, save_views
+from cache import ResponseCache
+from db import ConnectionPool, PoolTimeout, fetch_all, fetch_one
+from export import FORMATS as EXPORT_FORMATS, ExportError, export_columns, export_stream
+from executor import ConcurrencyLimitExceeded, DBExecutor, QueryTimeout
+from ingest import load_directory
+from metrics import PROCESS_STARTED_AT, TimingMiddleware, registry as metrics_registry, timed
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_condition
+from partitions import partition_source, partition_stats, partition_tables
+from queries import statements
+from recommender import CoPurchaseRecommender
+from replica import ReplicaManager
+from risk import SupplierRisk
+from schema import HOT_QUERIES, migrate, verify_query_plans
+from search import SearchError, search
+from shared import ChangeFeed, SharedCache, SharedStore
+from sketches import TicketSketches
+from writer import BatchWriter, WriterBusy, WriterClosed
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Startup runs here rather than at import, so importing main stays cheap
+    # and every phase is reported under app_startup_seconds
+    metrics_registry.observe_startup("import", time.time() - PROCESS_STARTED_AT)
+    started = time.perf_counter()
+    init_db()
+    metrics_registry.observe_startup("lifespan", time.perf_counter() - started)
+    yield
+    # Commit whatever is still queued before the process exits
+    writer.close()
+    if change_feed is not None:
+        change_feed.close()
+        shared_store.close()
+    db_executor.shutdown()
+    if replicas is not None:
+        replicas.close()
+
+app = FastAPI(title="Business Insights Dashboard API", lifespan=lifespan)
 
 
 origins = os.getenv("CORS_ORIGINS", "http://localhost:3000").split(",")
@@ -23,54 +70,304 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
+)
+
+# Per-request and per-statement timings for /metrics and the Server-Timing header.
+# PROFILING_ENABLED=1 additionally lets ?profile=1 return a sampled stack dump.
+app.add_middleware(
+    TimingMiddleware,
+    metrics=metrics_registry,
+    profiling=os.getenv("PROFILING_ENABLED", "0").lower() in ("1", "true", "yes"),
+    profile_interval=float(os.getenv("PROFILE_INTERVAL", 0.001)),
 )
 
 # Database setup - using file-based SQLite for persistence
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATABASE_PATH = os.path.join(BASE_DIR, 'data', 'business_data.db')
+DATABASE_PATH = os.getenv("DATABASE_PATH", os.path.join(BASE_DIR, 'data', 'business_data.db'))
 #DATABASE_PATH = "data/business_data.db"
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, 'data'))
+
+# Manifest and saved rollups written by `python artifact.py build`
+ARTIFACT_DIR = artifact_dir(DATABASE_PATH)
+
+# Create a global connection pool (sized and tuned through DB_POOL_* / DB_* env vars)
+pool = ConnectionPool.from_env(DATABASE_PATH)
+
+# Bounded executor that runs every endpoint's database work off the event loop
+db_executor = DBExecutor.from_env(pool)
+
+# Materialized rollups behind /dashboard/stats, rebuilt on startup
+dashboard = DashboardAggregates()
+
+# Co-purchase matrix behind /recommendations, rebuilt on startup
+recommender = CoPurchaseRecommender.from_env()
+
+# Resolution time and sentiment sketches behind /analytics/tickets, rebuilt on startup
+ticket_sketches = TicketSketches.from_env()
+
+# Recent sales velocity per product and the supplier table behind /suppliers/risk, rebuilt on startup
+supplier_risk = SupplierRisk.from_env()
+
+# Rollups saved next to the database and restored on startup while they still match it
+VIEWS = {"dashboard": dashboard, "recommender": recommender, "tickets": ticket_sketches,
+         "supplier_risk": supplier_risk}
+
+# Optional columnar copy of sales/tickets behind /analytics (COLUMNAR_ENABLED=0 uses SQL),
+# created by init_db() so NumPy is only imported once startup needs it
+COLUMNAR_ENABLED = os.getenv("COLUMNAR_ENABLED", "1").lower() in ("1", "true", "yes")
+column_store = None
+
+# Tables stored as monthly partitions behind views of the same name, e.g. "sales,tickets".
+# Existing rows are split once on startup; freezing old months is done with partitions.py
+PARTITIONED_TABLES = [name.strip() for name in os.getenv("PARTITIONED_TABLES", "").split(",") if name.strip()]
+
+# Most rows one page of a list endpoint may hold
+PAGE_MAX_ROWS = int(os.getenv("PAGE_MAX_ROWS", 1000))
+
+# Most ids one summary:batch request may ask for
+BATCH_MAX_IDS = int(os.getenv("BATCH_MAX_IDS", 1000))
+
+# Streaming exports: rows fetched per batch and how many may run at once
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", 10000))
+EXPORT_MAX_CONCURRENT = int(os.getenv("EXPORT_MAX_CONCURRENT", 4))
+active_exports = 0
+export_lock = threading.Lock()
+
+# Worker processes started by `python main.py` (WEB_CONCURRENCY, one per core by default).
+# With more than one, encoded responses are cached in a SQLite file all workers share and
+# every worker replays the rows the others commit into its own rollups.
+WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "1" if WORKERS > 1 else "0").lower() in ("1", "true", "yes")
+shared_store = SharedStore.from_env(DATABASE_PATH) if SHARED_CACHE_ENABLED else None
+
+# Read-only snapshots of the database that analytical queries run against, refreshed
+# every REPLICA_INTERVAL seconds (REPLICAS_ENABLED=0 keeps everything on the primary).
+# Each process copies the whole database for its own snapshot, so they are off by
+# default with several workers.
+REPLICAS_ENABLED = os.getenv("REPLICAS_ENABLED", "1" if WORKERS == 1 else "0").lower() in ("1", "true", "yes")
+replicas = ReplicaManager.from_env(DATABASE_PATH) if REPLICAS_ENABLED else None
+
+def response_cache(name, maxsize, ttl):
+    if shared_store is not None:
+        return SharedCache(shared_store, name, maxsize=maxsize, ttl=ttl)
+    return ResponseCache(maxsize=maxsize, ttl=ttl)
+
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", 10000))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", 300))
+
+# Encoded responses, dropped when the sales or tickets they are computed from change
+customer_summaries = response_cache("customer_summaries", SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL)
+product_summaries = response_cache("product_summaries", SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL)
+product_recommendations = response_cache("product_recommendations", SUMMARY_CACHE_SIZE, SUMMARY_CACHE_TTL)
+dashboard_stats = response_cache("dashboard_stats", 1, float(os.getenv("DASHBOARD_CACHE_TTL", 30)))
+supplier_risk_rankings = response_cache("supplier_risk_rankings", 100, SUMMARY_CACHE_TTL)
+CACHES = {
+    "customer_summaries": customer_summaries,
+    "product_summaries": product_summaries,
+    "product_recommendations": product_recommendations,
+    "dashboard_stats": dashboard_stats,
+    "supplier_risk_rankings": supplier_risk_rankings,
+}
+
+def record_sales(rows):
+    # Keep the derived views in step with newly inserted sales
+    dashboard.record_sales(rows)
+    recommender.record_sales(rows)
+    supplier_risk.record_sales(rows)
+    if column_store is not None:
+        column_store.record_sales(rows)
+
+def record_tickets(rows):
+    dashboard.record_tickets(rows)
+    ticket_sketches.record_tickets(rows)
+    if column_store is not None:
+        column_store.record_tickets(rows)
+
+def apply_change(table, rows):
+    # Rows committed by this process, or by another worker when replayed from the change feed
+    if table == "sales":
+        record_sales(rows)
+    else:
+        record_tickets(rows)
+
+def record_written(table, rows):
+    # Called by the writer thread once rows are durably committed. The caches are
+    # shared, so only the writing worker invalidates them, even if a rollup fails to update.
+    try:
+        apply_change(table, rows)
+    finally:
+        customer_summaries.invalidate({row["customer_id"] for row in rows})
+        product_summaries.invalidate({row["product_id"] for row in rows})
+        dashboard_stats.clear()
+        if table == "sales":
+            product_recommendations.clear()
+            supplier_risk_rankings.clear()
+
+def resync_views(conn):
+    # Rebuild every rollup and restart the change feed from the same read snapshot,
+    # so no change is missed or counted twice
+    with build_lock(ARTIFACT_DIR), read_snapshot(conn):
+        change_feed.mark(conn)
+        for view in VIEWS.values():
+            view.rebuild(conn)
+        if column_store is not None:
+            column_store.rebuild(conn)
+    dashboard_stats.clear()
+    product_recommendations.clear()
+    supplier_risk_rankings.clear()
+
+# Rows the other workers commit, replayed into this worker's rollups (multi-worker mode)
+change_feed = ChangeFeed(
+    pool.connection, apply_change, resync_views,
+    interval=float(os.getenv("CHANGE_FEED_INTERVAL", 1.0)),
+    retention=float(os.getenv("CHANGE_FEED_RETENTION", 3600)),
+    report=shared_store.report,
+) if SHARED_CACHE_ENABLED else None
+
+def catch_up():
+    # Replay what other workers committed before answering from the rollups
+    if change_feed is not None:
+        try:
+            change_feed.poll()
+        except PoolTimeout as exc:
+            raise HTTPException(status_code=503, detail=str(exc))
+
+# Single writer thread that group-commits POSTed sales and tickets; with the change
+# feed it also logs them to change_log in the same transaction
+writer = BatchWriter.from_env(DATABASE_PATH, on_commit=record_written, journal=SHARED_CACHE_ENABLED)
+
+# Most rows one POST /sales or /tickets request may carry, and how long it waits for its commit
+WRITE_MAX_ROWS = int(os.getenv("WRITE_MAX_ROWS", 10000))
+WRITE_TIMEOUT = float(os.getenv("WRITE_TIMEOUT", 30))
 
-# Create a global connection pool
 def init_db():
-    # Create tables and load data if they don't exist
-    with get_db_connection() as conn:
-        # Check if tables exist
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='customers'")
-        if not cursor.fetchone():
-            load_data(conn)
+    # Bring the schema up to date, then load data if the tables are empty. A database
+    # prebuilt with `python artifact.py build` is only opened, and its saved rollups
+    # are restored instead of rebuilt while they still match it. Workers starting
+    # together take turns, so only the first one builds anything.
+    global column_store
+    with build_lock(ARTIFACT_DIR), get_db_connection() as conn:
+        migrate(conn)
+        if not is_prebuilt(read_manifest(ARTIFACT_DIR), conn):
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM customers LIMIT 1")
+            if not cursor.fetchone():
+                load_data(conn)
+        partition_tables(conn, PARTITIONED_TABLES)
+        verify_query_plans(conn, {**HOT_QUERIES, **summary_queries(conn)})
+        with read_snapshot(conn):
+            if change_feed is not None:
+                change_feed.mark(conn)
+            if not load_views(ARTIFACT_DIR, conn, VIEWS):
+                for view in VIEWS.values():
+                    view.rebuild(conn)
+                try:
+                    save_views(ARTIFACT_DIR, conn, VIEWS)
+                except OSError as exc:
+                    logger.warning("could not save rollups to %s: %s", ARTIFACT_DIR, exc)
+            if COLUMNAR_ENABLED and column_store is None:
+                from columnar import ColumnStore
+
+                column_store = ColumnStore.from_env(DATABASE_PATH)
+                column_store.load_or_build(conn)
+    writer.start()
+    if change_feed is not None:
+        change_feed.start()
+    if replicas is not None:
+        replicas.start()
 
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Enable column access by name
+    # Inside an executor job this is the job's pool, i.e. the replica for replica=True endpoints
+    try:
+        with (db_executor.current_pool() or pool).connection() as conn:
+            yield conn
+    except PoolTimeout as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+
+@contextmanager
+def read_snapshot(conn):
+    # Every read inside the block sees the database as of its first one
+    conn.execute("BEGIN")
     try:
         yield conn
     finally:
-        conn.close()
+        conn.execute("COMMIT")
 
-def load_data(conn):
-    # Load data from CSV files into SQLite
-    customers = pd.read_csv(os.path.join(BASE_DIR, 'customers.csv'))
-    products = pd.read_csv(os.path.join(BASE_DIR, 'products.csv'))
-    sales = pd.read_csv(os.path.join(BASE_DIR, 'sales_transactions.csv'))
-    tickets = pd.read_csv(os.path.join(BASE_DIR, 'support_tickets.csv'))
-    suppliers = pd.read_csv(os.path.join(BASE_DIR, 'supplier_data.csv'))
+@contextmanager
+def replica_lease():
+    # The latest snapshot, held open until the block exits; None means use the primary
+    if replicas is None:
+        yield None
+        return
+    with replicas.lease() as snapshot:
+        yield snapshot
 
-    sales['transaction_date'] = pd.to_datetime(sales['transaction_date'], errors='coerce').dt.strftime('%Y-%m-%d')
+async def run_in_lane(lane, fn, args=(), kwargs=None, limit_key=None, limit=None, timeout=None,
+                      replica=False, connection=True):
+    # args/kwargs are passed through as-is so endpoint parameters such as
+    # ``limit`` never collide with the executor's own keyword arguments.
+    # connection=False is for jobs answered from in-memory rollups.
+    try:
+        with timed(lane), replica_lease() if replica else nullcontext() as snapshot:
+            return await db_executor.run(
+                lane, fn, args, kwargs, timeout=timeout, limit_key=limit_key, limit=limit,
+                pool=snapshot.pool if snapshot is not None else None, connection=connection)
+    except QueryTimeout as exc:
+        raise HTTPException(status_code=504, detail=str(exc))
+    except ConcurrencyLimitExceeded as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+
+def db_endpoint(lane, limit=None, timeout=None, replica=False):
+    """Serve a sync endpoint asynchronously through ``db_executor``.
+
+    ``lane`` is "lookup" for point reads or "analytics" for heavy aggregates;
+    ``limit`` caps how many calls of this endpoint run at once and
+    ``timeout`` overrides the lane's default (DB_LOOKUP_TIMEOUT /
+    DB_ANALYTICS_TIMEOUT). With ``replica`` the endpoint reads the latest
+    snapshot instead of the primary, once one exists.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await run_in_lane(
+                lane, fn, args, kwargs, limit_key=fn.__name__, limit=limit, timeout=timeout,
+                replica=replica)
+        return wrapper
+    return decorator
 
-    customers.to_sql('customers', conn, index=False, if_exists='replace')
-    products.to_sql('products', conn, index=False, if_exists='replace')
-    sales.to_sql('sales', conn, index=False, if_exists='replace')
-    tickets.to_sql('tickets', conn, index=False, if_exists='replace')
-    suppliers.to_sql('suppliers', conn, index=False, if_exists='replace')
-    
+def not_modified(request, entry):
+    """True when the client's validators still match the cached entry."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(entry.last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
 
+def cached_response(request, entry):
+    headers = {"ETag": entry.etag, "Last-Modified": entry.last_modified, "Cache-Control": "no-cache"}
+    if not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+def load_data(conn):
+    # Stream the CSV files from data/ into the keyed tables created by migrate()
+    load_directory(conn, DATA_DIR)
 
-    # Initialize database on startup
-init_db()
 
 # Pydantic models for request/response validation
+
+# SQLite stores integers in 64 bits; larger ones would only fail in the writer
+SqliteInt = Annotated[int, Field(ge=-2**63, le=2**63 - 1)]
+RowId = Annotated[int, Field(ge=1, le=2**63 - 1)]
+
 class Customer(BaseModel):
     customer_id: int
     customer_name: str
@@ -85,18 +382,26 @@ class Product(BaseModel):
     cost_price: float
     sales_price: float
 
+class ProductListing(Product):
+    # Present when the listing is sorted with sort_by, which reads them from product_stats
+    total_quantity: Optional[int] = None
+    total_sales: Optional[float] = None
+    profit: Optional[float] = None
+    ticket_count: Optional[int] = None
+    avg_sentiment: Optional[float] = None
+
 class Sale(BaseModel):
-    transaction_id: int
-    customer_id: int
-    product_id: int
-    quantity: int
+    transaction_id: RowId
+    customer_id: RowId
+    product_id: RowId
+    quantity: SqliteInt
     sale_amount: float
     transaction_date: str
 
 class Ticket(BaseModel):
-    ticket_id: int
-    customer_id: int
-    product_id: int
+    ticket_id: RowId
+    customer_id: RowId
+    product_id: RowId
     issue_type: str
     status: str
     creation_date: str
@@ -126,21 +431,77 @@ class ProductSummary(BaseModel):
     avg_sentiment: float
     common_issues: List[str]
 
+class SummaryBatchRequest(BaseModel):
+    ids: List[int]
+
 class Recommendation(BaseModel):
     product_id: int
     product_name: str
     confidence: float
 
+def fetch_page(conn, table, keys, conditions, params, limit, offset, cursor, descending=False, name=None):
+    """Fetch one page of ``table`` ordered by ``keys``, highest first if ``descending``.
+
+    With a ``cursor`` the page starts right after the last row of the previous
+    page (keyset pagination), so deep pages cost the same as the first one.
+    Without one, the legacy ``offset`` form is used. Returns the rows and the
+    cursor for the next page, or None on the last page. ``name`` labels the
+    statements of a listing whose order varies; it defaults to ``table``.
+    """
+    conditions = list(conditions)
+    params = dict(params)
+    if cursor:
+        try:
+            after = decode_cursor(cursor, keys)
+        except InvalidCursor as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        condition, after_params = keyset_condition(keys, after, descending)
+        conditions.append(condition)
+        params.update(after_params)
+        offset = 0
+
+    query = f"SELECT * FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    direction = " DESC" if descending else ""
+    query += f" ORDER BY {', '.join(key + direction for key in keys)} LIMIT :limit OFFSET :offset"
+    # The text only depends on which filters are set, so each combination is one statement
+    statement = statements.register(f"{name or table}_page({','.join(sorted(params))})", query)
+    # Fetch one extra row to know whether another page follows
+    params.update(limit=limit + 1, offset=offset)
+
+    records = fetch_all(conn, statement, params)
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        if records:
+            next_cursor = encode_cursor(records[-1][key] for key in keys)
+    return records, next_cursor
+
+def rows_response(records, next_cursor=None):
+    """Pre-encode plain rows as JSON, skipping response-model validation.
+
+    The rows come straight from typed tables, so re-validating every field
+    through Pydantic only adds cost on large pages.
+    """
+    with timed("serialize"):
+        body = json.dumps(records, separators=(",", ":"))
+    response = Response(content=body, media_type="application/json")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
 # API Endpoints - Updated to use the connection manager
 @app.get("/customers", response_model=List[Customer])
+@db_endpoint("lookup", limit=16)
 def get_customers(
-    limit: int = 100,
-    offset: int = 0,
+    limit: int = Query(100, ge=1, le=PAGE_MAX_ROWS),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     industry: Optional[str] = None,
     region: Optional[str] = None
 ):
     with get_db_connection() as conn:
-        query = "SELECT * FROM customers"
         conditions = []
         params = {}
         
@@ -150,25 +511,31 @@ def get_customers(
         if region:
             conditions.append("region = :region")
             params['region'] = region
-            
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-            
-        query += f" LIMIT {limit} OFFSET {offset}"
-        
-        df = pd.read_sql(query, conn, params=params)
-        return df.to_dict('records')
 
-@app.get("/products", response_model=List[Product])
+        records, next_cursor = fetch_page(
+            conn, "customers", ["customer_id"], conditions, params, limit, offset, cursor)
+    return rows_response(records, next_cursor)
+
+# /products?sort_by= orderings: product_stats column, each with its own index
+PRODUCT_SORTS = {"revenue": "total_sales", "profit": "profit", "sentiment": "avg_sentiment"}
+
+@app.get("/products", response_model=List[ProductListing])
+@db_endpoint("lookup", limit=16)
 def get_products(
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=PAGE_MAX_ROWS),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     category: Optional[str] = None,
     min_price: Optional[float] = None,
-    max_price: Optional[float] = None
+    max_price: Optional[float] = None,
+    sort_by: Optional[str] = None,
+    order: str = "desc"
 ):
+    if sort_by is not None and sort_by not in PRODUCT_SORTS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {', '.join(PRODUCT_SORTS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
     with get_db_connection() as conn:
-        query = "SELECT * FROM products"
         conditions = []
         params = {}
         
@@ -181,292 +548,643 @@ def get_products(
         if max_price is not None:
             conditions.append("sales_price <= :max_price")
             params['max_price'] = max_price
-            
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-            
-        query += f" LIMIT {limit} OFFSET {offset}"
-        
-        df = pd.read_sql(query, conn, params=params)
-        return df.to_dict('records')
+
+        if sort_by is None:
+            records, next_cursor = fetch_page(
+                conn, "products", ["product_id"], conditions, params, limit, offset, cursor)
+        else:
+            # Sorted listings come with their totals from product_stats
+            records, next_cursor = fetch_page(
+                conn, "product_listing", [PRODUCT_SORTS[sort_by], "product_id"], conditions, params,
+                limit, offset, cursor, descending=order == "desc", name=f"products_by_{sort_by}_{order}")
+    return rows_response(records, next_cursor)
 
 
 @app.get("/customers/{customer_id}", response_model=CustomerSummary)
+async def get_customer_summary(customer_id: int, request: Request):
+    # Repeat views are answered from the cache (or with a 304) without touching the database
+    entry = customer_summaries.get(customer_id)
+    if entry is None:
+        generation = customer_summaries.generation(customer_id)
+        summary = await run_in_lane("lookup", build_customer_summary, (customer_id,),
+                                    limit_key="get_customer_summary")
+        with timed("serialize"):
+            entry = customer_summaries.set(customer_id, encode_body(summary), generation)
+    return cached_response(request, entry)
 
-def get_customer_summary(customer_id: int):
-    with get_db_connection() as conn:
-        # Get customer info
-        customer_df = pd.read_sql(f"SELECT * FROM customers WHERE customer_id = {customer_id}", conn)
-        if customer_df.empty:
-            raise HTTPException(status_code=404, detail="Customer not found")
-        
-        customer = customer_df.iloc[0].to_dict()
-        
-        # Get sales data
-        sales_df = pd.read_sql(f"""
-            SELECT SUM(sale_amount) as total_spent, COUNT(*) as total_transactions 
-            FROM sales 
-            WHERE customer_id = {customer_id}
-        """, conn)
-        
-        # Get ticket data
-        tickets_df = pd.read_sql(f"""
-            SELECT COUNT(*) as open_tickets, AVG(sentiment_score) as avg_sentiment
-            FROM tickets 
-            WHERE customer_id = {customer_id} AND status IN ('Open', 'In Progress')
-        """, conn)
-        
-        # Get favorite category
-        category_df = pd.read_sql(f"""
-            SELECT p.category, COUNT(*) as count
-            FROM sales s
-            JOIN products p ON s.product_id = p.product_id
-            WHERE s.customer_id = {customer_id}
-            GROUP BY p.category
-            ORDER BY count DESC
-            LIMIT 1
-        """, conn)
-    
-    favorite_category = category_df.iloc[0]['category'] if not category_df.empty else "N/A"
-    
+# Summaries for a set of ids, passed as one JSON array so every batch size
+# shares a single statement. Each total is grouped once over the index range
+# of the requested ids rather than queried per id.
+CUSTOMER_SUMMARIES = """
+    WITH ids AS (SELECT DISTINCT value AS customer_id FROM json_each(:ids)),
+    sales_totals AS (
+        SELECT s.customer_id, SUM(s.sale_amount) as total_spent, COUNT(*) as total_transactions
+        FROM {sales} s
+        WHERE s.customer_id IN (SELECT customer_id FROM ids)
+        GROUP BY s.customer_id
+    ),
+    ticket_totals AS (
+        SELECT t.customer_id, COUNT(*) as open_tickets, AVG(t.sentiment_score) as avg_sentiment
+        FROM {tickets} t
+        WHERE t.customer_id IN (SELECT customer_id FROM ids) AND t.status IN ('Open', 'In Progress')
+        GROUP BY t.customer_id
+    ),
+    category_counts AS (
+        SELECT s.customer_id, p.category, COUNT(*) as purchases
+        FROM {sales} s
+        JOIN products p ON s.product_id = p.product_id
+        WHERE s.customer_id IN (SELECT customer_id FROM ids)
+        GROUP BY s.customer_id, p.category
+    ),
+    favorite AS (
+        SELECT customer_id, category
+        FROM (SELECT customer_id, category,
+                     ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY purchases DESC, category) as rank
+              FROM category_counts)
+        WHERE rank = 1
+    )
+    SELECT c.*, st.total_spent, st.total_transactions, tt.open_tickets, tt.avg_sentiment,
+           f.category as favorite_category
+    FROM ids
+    JOIN customers c ON c.customer_id = ids.customer_id
+    LEFT JOIN sales_totals st ON st.customer_id = c.customer_id
+    LEFT JOIN ticket_totals tt ON tt.customer_id = c.customer_id
+    LEFT JOIN favorite f ON f.customer_id = c.customer_id
+"""
+
+# Product totals are kept current in product_stats (see product_stats.py), so a
+# summary is a single-row read per product
+PRODUCT_SUMMARIES = statements.register("product_summaries", """
+    WITH ids AS (SELECT DISTINCT value AS product_id FROM json_each(:ids))
+    SELECT p.*, ps.total_quantity, ps.total_sales, ps.profit, ps.common_issues, ps.avg_sentiment
+    FROM ids
+    JOIN products p ON p.product_id = ids.product_id
+    LEFT JOIN product_stats ps ON ps.product_id = p.product_id
+""")
+
+def summary_statement(conn, name, sql, key):
+    # A filter on a subquery is not pushed into the partitions of a partitioned table,
+    # so the id filter is repeated inside each of them, where it can use their index
+    where = f"{key} IN (SELECT {key} FROM ids)"
+    sources = {table: partition_source(conn, table, where=where) for table in ("sales", "tickets")}
+    labels = [label for table, (_, label) in sources.items() if label != table]
+    return statements.register(f"{name}[{','.join(labels)}]" if labels else name,
+                               sql.format(**{table: source for table, (source, _) in sources.items()}))
+
+def summary_queries(conn):
     return {
-        "customer": customer,
-        "total_spent": sales_df.iloc[0]['total_spent'] or 0,
-        "total_transactions": sales_df.iloc[0]['total_transactions'] or 0,
-        "open_tickets": tickets_df.iloc[0]['open_tickets'] or 0,
-        "avg_sentiment": round(tickets_df.iloc[0]['avg_sentiment'] or 0, 2),
-        "favorite_category": favorite_category
+        "customer_summaries": (
+            summary_statement(conn, "customer_summaries", CUSTOMER_SUMMARIES, "customer_id").sql, {"ids": "[1, 2]"}),
+        "product_summaries": (PRODUCT_SUMMARIES.sql, {"ids": "[1, 2]"}),
     }
-'''
-@app.get("/products", response_model=List[Product])
-def get_products(limit: int = 50, offset: int = 0):
-    query = f"SELECT * FROM products LIMIT {limit} OFFSET {offset}"
+
+def build_customer_summaries(customer_ids):
+    """Summaries keyed by customer id; ids that do not exist are left out."""
     with get_db_connection() as conn:
-        df = pd.read_sql(query, conn)
-    return df.to_dict('records')
+        rows = fetch_all(conn, summary_statement(conn, "customer_summaries", CUSTOMER_SUMMARIES, "customer_id"),
+                         {"ids": json.dumps(list(customer_ids))})
 
-@app.get("/products/{product_id}", response_model=ProductSummary)
-def get_product_summary(product_id: int):
+    with timed("pydantic"):
+        return {
+            row['customer_id']: CustomerSummary(
+                customer=Customer(**{field: row[field] for field in Customer.model_fields}),
+                total_spent=row['total_spent'] or 0,
+                total_transactions=row['total_transactions'] or 0,
+                open_tickets=row['open_tickets'] or 0,
+                avg_sentiment=round(row['avg_sentiment'] or 0, 2),
+                favorite_category=row['favorite_category'] or "N/A"
+            )
+            for row in rows
+        }
+
+def build_product_summaries(product_ids):
+    """Summaries keyed by product id; ids that do not exist are left out."""
     with get_db_connection() as conn:
-    # Get product info
-        product_df = pd.read_sql(f"SELECT * FROM products WHERE product_id = {product_id}", conn)
-        if product_df.empty:
-            raise HTTPException(status_code=404, detail="Product not found")
-    
-        product = product_df.iloc[0].to_dict()
-    
-    # Get sales data
-        sales_df = pd.read_sql(f"""
-            SELECT SUM(sale_amount) as total_sales, SUM(quantity) as total_quantity,
-                SUM(sale_amount) - SUM(quantity * (SELECT cost_price FROM products WHERE product_id = {product_id})) as profit
-            FROM sales 
-            WHERE product_id = {product_id}
-        """, conn)
-    
-    # Get ticket data
-        ticket_df = pd.read_sql(f"""
-            SELECT AVG(sentiment_score) as avg_sentiment, issue_type, COUNT(*) as count
-            FROM tickets 
-            WHERE product_id = {product_id}
-            GROUP BY issue_type
-            ORDER BY count DESC
-            LIMIT 3
-        """, conn)
-    
-    common_issues = ticket_df['issue_type'].tolist() if not ticket_df.empty else []
-    avg_sentiment = round(ticket_df.iloc[0]['avg_sentiment'], 2) if not ticket_df.empty else 0
-    
-    return {
-        "product": product,
-        "total_sales": sales_df.iloc[0]['total_sales'] or 0,
-        "total_quantity": sales_df.iloc[0]['total_quantity'] or 0,
-        "profit": sales_df.iloc[0]['profit'] or 0,
-        "avg_sentiment": avg_sentiment,
-        "common_issues": common_issues
-    }
-'''
+        rows = fetch_all(conn, PRODUCT_SUMMARIES, {"ids": json.dumps(list(product_ids))})
+
+    with timed("pydantic"):
+        return {
+            row['product_id']: ProductSummary(
+                product=Product(**{field: row[field] for field in Product.model_fields}),
+                total_sales=row['total_sales'] or 0,
+                total_quantity=row['total_quantity'] or 0,
+                profit=row['profit'] or 0,
+                avg_sentiment=round(row['avg_sentiment'] or 0, 2),
+                common_issues=row['common_issues'].split(',') if row['common_issues'] else []
+            )
+            for row in rows
+        }
+
+def build_customer_summary(customer_id: int):
+    summary = build_customer_summaries([customer_id]).get(customer_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return summary
+
+def build_product_summary(product_id: int):
+    summary = build_product_summaries([product_id]).get(product_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return summary
 
 @app.get("/products/{product_id}", response_model=ProductSummary)
+async def get_product_summary(product_id: int, request: Request):
+    entry = product_summaries.get(product_id)
+    if entry is None:
+        generation = product_summaries.generation(product_id)
+        summary = await run_in_lane("lookup", build_product_summary, (product_id,),
+                                    limit_key="get_product_summary")
+        with timed("serialize"):
+            entry = product_summaries.set(product_id, encode_body(summary), generation)
+    return cached_response(request, entry)
 
-def get_product_summary(product_id: int):
-    with get_db_connection() as conn:
-        # Verify product exists first
-        product_exists = pd.read_sql(f"""
-            SELECT 1 FROM products WHERE product_id = {product_id}
-        """, conn)
-        if product_exists.empty:
-            raise HTTPException(status_code=404, detail="Product not found")
-
-        # Get main product data
-        product = pd.read_sql(f"""
-            SELECT * FROM products WHERE product_id = {product_id}
-        """, conn).iloc[0]
-
-        # Get sales and ticket data in single query
-        stats = pd.read_sql(f"""
-            SELECT 
-                SUM(s.quantity) as total_quantity,
-                SUM(s.sale_amount) as total_sales,
-                SUM(s.sale_amount) - SUM(s.quantity * p.cost_price) as profit,
-                (SELECT GROUP_CONCAT(issue_type) 
-                 FROM (SELECT issue_type 
-                       FROM tickets 
-                       WHERE product_id = {product_id}
-                       GROUP BY issue_type ORDER BY COUNT(*) DESC LIMIT 3)) as common_issues,
-                (SELECT AVG(sentiment_score) FROM tickets WHERE product_id = {product_id}) as avg_sentiment
-            FROM sales s
-            JOIN products p ON s.product_id = p.product_id
-            WHERE s.product_id = {product_id}
-        """, conn).iloc[0]
-
-        return ProductSummary(
-            product=Product(**product),
-            total_sales=stats['total_sales'] or 0,
-            total_quantity=stats['total_quantity'] or 0,
-            profit=stats['profit'] or 0,
-            avg_sentiment=round(stats['avg_sentiment'] or 0, 2),
-            common_issues=stats['common_issues'].split(',') if stats['common_issues'] else []
-        )
+def batch_ids(batch):
+    ids = list(dict.fromkeys(batch.ids))
+    if len(ids) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IDS} ids per batch")
+    return ids
+
+def batch_response(ids, bodies):
+    """``{"results": {id: summary | null}, "not_found": [ids]}`` from pre-encoded bodies."""
+    with timed("serialize"):
+        results = b",".join(b'"%d":%s' % (id_, bodies.get(id_, b"null")) for id_ in ids)
+        not_found = json.dumps([id_ for id_ in ids if id_ not in bodies]).encode()
+        content = b'{"results":{' + results + b'},"not_found":' + not_found + b'}'
+    return Response(content=content, media_type="application/json")
+
+def encode_body(value):
+    return json.dumps(jsonable_encoder(value), separators=(",", ":")).encode()
+
+async def cached_batch(cache, ids, build, limit_key):
+    # Cached summaries are reused; the rest are computed together in one query
+    bodies = {}
+    missing = []
+    for id_ in ids:
+        entry = cache.get(id_)
+        if entry is not None:
+            bodies[id_] = entry.body
+        else:
+            missing.append(id_)
+
+    if missing:
+        generations = {id_: cache.generation(id_) for id_ in missing}
+        summaries = await run_in_lane("lookup", build, (missing,), limit_key=limit_key, limit=4)
+        with timed("serialize"):
+            for id_, summary in summaries.items():
+                bodies[id_] = cache.set(id_, encode_body(summary), generations[id_]).body
+    return batch_response(ids, bodies)
+
+@app.post("/customers/summary:batch")
+async def get_customer_summaries(batch: SummaryBatchRequest):
+    return await cached_batch(customer_summaries, batch_ids(batch), build_customer_summaries,
+                              "get_customer_summaries")
+
+@app.post("/products/summary:batch")
+async def get_product_summaries(batch: SummaryBatchRequest):
+    return await cached_batch(product_summaries, batch_ids(batch), build_product_summaries,
+                              "get_product_summaries")
 
 @app.get("/sales", response_model=List[Sale])
-def get_sales(limit: int = 100, offset: int = 0):
-    query = f"SELECT * FROM sales LIMIT {limit} OFFSET {offset}"
+@db_endpoint("lookup", limit=16)
+def get_sales(limit: int = Query(100, ge=1, le=PAGE_MAX_ROWS), offset: int = Query(0, ge=0),
+                cursor: Optional[str] = None):
     with get_db_connection() as conn:
-        df = pd.read_sql(query, conn)
-    return df.to_dict('records')
+        records, next_cursor = fetch_page(
+            conn, "sales", ["transaction_date", "transaction_id"], [], {}, limit, offset, cursor)
+    return rows_response(records, next_cursor)
+
+# Dates are stored as 'YYYY-MM-DD' text and sliced by position (months, partitions, exports).
+# date.fromisoformat alone also takes '20240115' and '2024-W03-1', so the layout is checked first.
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+def check_dates(records, fields):
+    for index, record in enumerate(records):
+        for field in fields:
+            value = getattr(record, field)
+            if value is None:
+                continue
+            try:
+                if not ISO_DATE.fullmatch(value):
+                    raise ValueError(value)
+                date.fromisoformat(value)
+            except ValueError:
+                raise HTTPException(status_code=422, detail=f"item {index}: {field} must be a YYYY-MM-DD date")
+
+async def write_rows(table, records):
+    """Queue validated rows on the writer and wait until they are committed."""
+    if len(records) > WRITE_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {WRITE_MAX_ROWS} rows per request")
+    if not records:
+        return {"inserted": 0, "duplicates": []}
+    try:
+        future = writer.submit(table, [record.model_dump() for record in records])
+    except WriterBusy as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"})
+    except WriterClosed as exc:
+        raise HTTPException(status_code=503, detail=str(exc))
+    try:
+        with timed("write"):
+            # Shielded so a timeout does not cancel the future the writer will still resolve
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), WRITE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"write not committed within {WRITE_TIMEOUT}s")
+    except sqlite3.Error as exc:
+        raise HTTPException(status_code=400, detail=f"rows rejected: {exc}")
+
+@app.post("/sales", status_code=201)
+async def create_sales(sales: List[Sale]):
+    # Acknowledged once durable; ids that already exist are reported, not overwritten
+    check_dates(sales, ["transaction_date"])
+    return await write_rows("sales", sales)
+
+@app.post("/tickets", status_code=201)
+async def create_tickets(tickets: List[Ticket]):
+    check_dates(tickets, ["creation_date", "resolution_date"])
+    return await write_rows("tickets", tickets)
 
 @app.get("/tickets", response_model=List[Ticket])
-def get_tickets(limit: int = 100, offset: int = 0):
-    query = f"SELECT * FROM tickets LIMIT {limit} OFFSET {offset}"
+@db_endpoint("lookup", limit=16)
+def get_tickets(limit: int = Query(100, ge=1, le=PAGE_MAX_ROWS), offset: int = Query(0, ge=0),
+                cursor: Optional[str] = None):
     with get_db_connection() as conn:
-        df = pd.read_sql(query, conn)
-    return df.to_dict('records')
+        records, next_cursor = fetch_page(
+            conn, "tickets", ["ticket_id"], [], {}, limit, offset, cursor)
+    return rows_response(records, next_cursor)
 
 @app.get("/suppliers", response_model=List[Supplier])
-def get_suppliers(limit: int = 50, offset: int = 0):
-    query = f"SELECT * FROM suppliers LIMIT {limit} OFFSET {offset}"
+@db_endpoint("lookup", limit=16)
+def get_suppliers(limit: int = Query(50, ge=1, le=PAGE_MAX_ROWS), offset: int = Query(0, ge=0),
+                cursor: Optional[str] = None):
     with get_db_connection() as conn:
-        df = pd.read_sql(query, conn)
-    return df.to_dict('records')
+        records, next_cursor = fetch_page(
+            conn, "suppliers", ["supplier_id", "product_id"], [], {}, limit, offset, cursor)
+    return rows_response(records, next_cursor)
+
+# Suppliers ranked by the revenue their delays would put at risk
+SUPPLIER_RISK_GROUPS = ("product", "supplier")
+
+def rank_supplier_risk(group_by, limit):
+    catch_up()
+    return supplier_risk.rank(group_by, limit)
+
+@app.get("/suppliers/risk")
+async def get_supplier_risk(request: Request, group_by: str = "product", limit: int = Query(50, ge=1, le=1000)):
+    # One entry per supplier and product, or per supplier with its products' exposure summed
+    if group_by not in SUPPLIER_RISK_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(SUPPLIER_RISK_GROUPS)}")
+    key = f"{group_by}:{limit}"
+    entry = supplier_risk_rankings.get(key)
+    if entry is None:
+        generation = supplier_risk_rankings.generation(key)
+        ranking = await run_in_lane("analytics", rank_supplier_risk, (group_by, limit),
+                                    limit_key="get_supplier_risk", limit=8, connection=False)
+        with timed("serialize"):
+            entry = supplier_risk_rankings.set(key, encode_body(ranking), generation)
+    return cached_response(request, entry)
+
+@app.post("/suppliers/risk/rebuild")
+@db_endpoint("analytics", limit=1)
+def rebuild_supplier_risk():
+    # Reloads the suppliers too, e.g. after supplier_data.csv was ingested again
+    rebuild_view(supplier_risk.rebuild)
+    supplier_risk_rankings.clear()
+    return supplier_risk.stats()
+
+# Name search over the FTS5 indexes, with facet counts
+def search_response(table, q, filters, fuzzy, limit, offset):
+    try:
+        with get_db_connection() as conn:
+            return rows_response(search(conn, table, q, filters, fuzzy, limit, offset))
+    except SearchError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+@app.get("/search/customers")
+@db_endpoint("lookup", limit=16)
+def search_customers(
+    q: str = Query(..., min_length=1, max_length=200),
+    industry: Optional[str] = None,
+    region: Optional[str] = None,
+    fuzzy: bool = True,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    # Prefix matching on every word of customer_name; misspelled words fall back to near terms
+    return search_response("customers", q, {"industry": industry, "region": region}, fuzzy, limit, offset)
+
+@app.get("/search/products")
+@db_endpoint("lookup", limit=16)
+def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    category: Optional[str] = None,
+    fuzzy: bool = True,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    return search_response("products", q, {"category": category}, fuzzy, limit, offset)
 
 # AI/ML Feature: Product Recommendations
+def recommend(product_id: int, limit: int):
+    # Served from the precomputed co-purchase matrix; no per-request SQL
+    catch_up()
+    if not recommender.has_product(product_id):
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    recommendations = recommender.recommend(product_id, limit)
+    if not recommendations:
+        # No co-purchased products found - fallback to popular products
+        return recommender.popular(product_id, limit)
+    return recommendations
+
 @app.get("/recommendations/{product_id}", response_model=List[Recommendation])
-def get_recommendations(product_id: int, limit: int = 5):
-    with get_db_connection() as conn:
-        # First verify the product exists
-        product_check = pd.read_sql(f"""
-            SELECT product_id FROM products WHERE product_id = {product_id}
-        """, conn)
-        if product_check.empty:
-            raise HTTPException(status_code=404, detail="Product not found")
-
-        # Get transactions containing the target product
-        target_transactions = pd.read_sql(f"""
-            SELECT DISTINCT transaction_id 
-            FROM sales 
-            WHERE product_id = {product_id}
-        """, conn)
-        
-        if target_transactions.empty:
-            # Product exists but has no sales - recommend popular products
-            return get_popular_products(conn, product_id, limit)
-        
-        # Convert transaction IDs to comma-separated string safely
-        transaction_ids = ",".join([str(tid) for tid in target_transactions['transaction_id']])
-        
-        # Get co-purchased products
-        related_products = pd.read_sql(f"""
-            SELECT s.product_id, p.product_name, COUNT(*) as co_occurrence
-            FROM sales s
-            JOIN products p ON s.product_id = p.product_id
-            WHERE s.transaction_id IN ({transaction_ids})
-              AND s.product_id != {product_id}
-            GROUP BY s.product_id, p.product_name
-            ORDER BY co_occurrence DESC
-            LIMIT {limit}
-        """, conn)
-        
-        if not related_products.empty:
-            # Calculate confidence scores
-            max_co = related_products['co_occurrence'].max()
-            return [
-                {
-                    "product_id": row['product_id'],
-                    "product_name": row['product_name'],
-                    "confidence": round(row['co_occurrence'] / max_co, 2)
-                }
-                for _, row in related_products.iterrows()
-            ]
-        else:
-            # No co-purchased products found - fallback to popular products
-            return get_popular_products(conn, product_id, limit)
-
-def get_popular_products(conn, exclude_product_id: int, limit: int):
-    """Fallback to recommend generally popular products"""
-    popular = pd.read_sql(f"""
-        SELECT p.product_id, p.product_name, 0.5 as confidence
-        FROM products p
-        LEFT JOIN sales s ON p.product_id = s.product_id
-        WHERE p.product_id != {exclude_product_id}
-        GROUP BY p.product_id, p.product_name
-        ORDER BY COUNT(s.product_id) DESC
-        LIMIT {limit}
-    """, conn)
-    return popular.to_dict('records')
-    
+async def get_recommendations(product_id: int, request: Request,
+                              limit: int = Query(5, ge=1, le=recommender.top_k)):
+    # Only the top_k neighbours of each product are kept, so more cannot be asked for
+    key = f"{product_id}:{limit}"
+    entry = product_recommendations.get(key)
+    if entry is None:
+        generation = product_recommendations.generation(key)
+        recommendations = await run_in_lane("analytics", recommend, (product_id, limit),
+                                            limit_key="get_recommendations", limit=8, connection=False)
+        with timed("serialize"):
+            entry = product_recommendations.set(key, encode_body(recommendations), generation)
+    return cached_response(request, entry)
+
+def rebuild_view(rebuild):
+    # With the change feed running, all rollups are rebuilt from one snapshot so its
+    # position stays valid for every one of them
+    if change_feed is not None:
+        change_feed.resync_now()
+        return
+    with get_db_connection() as conn, read_snapshot(conn):
+        rebuild(conn)
+
+@app.post("/recommendations/rebuild")
+@db_endpoint("analytics", limit=1)
+def rebuild_recommendations():
+    rebuild_view(recommender.rebuild)
+    product_recommendations.clear()
+    return recommender.stats()
+
 # Dashboard Statistics
+def dashboard_snapshot():
+    catch_up()
+    return dashboard.snapshot()
+
 @app.get("/dashboard/stats")
-def get_dashboard_stats():
+async def get_dashboard_stats(request: Request):
+    entry = dashboard_stats.get("stats")
+    if entry is None:
+        generation = dashboard_stats.generation("stats")
+        stats = await run_in_lane("analytics", dashboard_snapshot, limit_key="get_dashboard_stats", limit=8,
+                                  connection=False)
+        with timed("serialize"):
+            entry = dashboard_stats.set("stats", encode_body(stats), generation)
+    return cached_response(request, entry)
+
+@app.post("/dashboard/stats/rebuild")
+@db_endpoint("analytics", limit=1)
+def rebuild_dashboard_stats():
+    rebuild_view(dashboard.rebuild)
+    dashboard_stats.clear()
+    return dashboard.snapshot()
+
+# Grouped analytics over the columnar store
+def parse_group_by(table, group_by):
+    from columnar import TABLES as COLUMNAR_TABLES
+
+    dimensions = [dim.strip() for dim in group_by.split(",") if dim.strip()] if group_by else []
+    allowed = COLUMNAR_TABLES[table]["dimensions"]
+    unknown = [dim for dim in dimensions if dim not in allowed]
+    if unknown or len(set(dimensions)) != len(dimensions):
+        raise HTTPException(status_code=400,
+                            detail=f"group_by must be distinct values from: {', '.join(allowed)}")
+    return dimensions
+
+def parse_date_range(start, end):
+    from columnar import parse_day
+
+    try:
+        return (parse_day(start) if start else None, parse_day(end) if end else None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from/to must be YYYY-MM-DD dates")
+
+@app.get("/analytics/sales")
+@db_endpoint("analytics", limit=8, replica=True)
+def get_sales_analytics(
+    group_by: Optional[str] = "month",
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+):
+    # Total sales, quantity and transaction count per group; from/to are inclusive
+    dimensions = parse_group_by("sales", group_by)
+    start_day, end_day = parse_date_range(start, end)
+    if column_store is not None:
+        catch_up()
+        return rows_response(column_store.group("sales", dimensions, start_day, end_day))
+    from columnar import group_sql
+
     with get_db_connection() as conn:
-        # Get basic stats
-        stats = pd.read_sql("""
-            SELECT 
-                (SELECT COUNT(*) FROM customers) as total_customers,
-                (SELECT SUM(sale_amount) FROM sales) as total_sales,
-                (SELECT COUNT(*) FROM tickets WHERE status IN ('Open', 'In Progress')) as open_tickets
-        """, conn).iloc[0]
-
-        # Get top products
-        top_products = pd.read_sql("""
-            SELECT p.product_id, p.product_name, SUM(s.sale_amount) as total_sales
-            FROM sales s 
-            JOIN products p ON s.product_id = p.product_id
-            GROUP BY p.product_id, p.product_name
-            ORDER BY total_sales DESC
-            LIMIT 5
-        """, conn).to_dict('records')
-
-        # Get sales by region
-        sales_by_region = pd.read_sql("""
-            SELECT c.region, SUM(s.sale_amount) as total_sales
-            FROM sales s 
-            JOIN customers c ON s.customer_id = c.customer_id
-            GROUP BY c.region
-        """, conn).to_dict('records')
-
-        # Get sales trend (last 12 months)
-        sales_trend = pd.read_sql("""
-            SELECT 
-                strftime('%Y-%m', transaction_date) as month,
-                SUM(sale_amount) as total_sales
-            FROM sales
-            
-            -- TEMPORARY: remove this line to test
-            --WHERE transaction_date >= date('now', '-12 months')
-
-            GROUP BY month
-            ORDER BY month
-        """, conn).to_dict('records')
+        return rows_response(group_sql(conn, "sales", dimensions, start_day, end_day))
+
+# Ticket resolution and sentiment percentiles from the quantile sketches
+TICKET_GROUPS = ("month", "issue_type", "product_id")
+MAX_QUANTILES = 10
+
+def parse_month(value):
+    # Sketches are kept per creation month, so a date stands for its whole month
+    try:
+        return date.fromisoformat(value + "-01" if len(value) == 7 else value).isoformat()[:7]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="from/to must be YYYY-MM or YYYY-MM-DD dates")
+
+def parse_quantiles(quantiles):
+    try:
+        values = [float(q) for q in quantiles.split(",") if q.strip()]
+    except ValueError:
+        values = None
+    if not values or len(values) > MAX_QUANTILES or not all(0 <= q <= 1 for q in values):
+        raise HTTPException(status_code=400,
+                            detail=f"quantiles must be 1-{MAX_QUANTILES} comma-separated values in [0, 1]")
+    return values
+
+@app.get("/analytics/tickets")
+@db_endpoint("analytics", limit=8)
+def get_ticket_analytics(
+    group_by: Optional[str] = "issue_type",
+    issue_type: Optional[str] = None,
+    product_id: Optional[int] = None,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    quantiles: str = "0.5,0.9,0.99",
+):
+    # Resolution days and sentiment percentiles per group for tickets created in the
+    # from/to months (inclusive); each is within relative_error of the exact value
+    if group_by and group_by not in TICKET_GROUPS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(TICKET_GROUPS)}")
+    catch_up()
+    try:
+        result = ticket_sketches.query(
+            group_by or None, issue_type, product_id,
+            parse_month(start) if start else None, parse_month(end) if end else None,
+            parse_quantiles(quantiles))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return rows_response(result)
+
+@app.post("/analytics/tickets/rebuild")
+@db_endpoint("analytics", limit=1)
+def rebuild_ticket_analytics():
+    rebuild_view(ticket_sketches.rebuild)
+    return ticket_sketches.stats()
+
+@app.post("/analytics/rebuild")
+@db_endpoint("analytics", limit=1)
+def rebuild_analytics():
+    if column_store is None:
+        raise HTTPException(status_code=404, detail="Columnar analytics are disabled")
+    rebuild_view(column_store.rebuild)
+    return column_store.stats()
+
+# Full-table exports
+EXPORT_TABLES = ("customers", "products", "sales", "tickets", "suppliers")
+COMPRESSED_TYPES = {"gzip": ("application/gzip", ".gz"), "zstd": ("application/zstd", ".zst")}
+
+def reserve_export():
+    # Takes an export slot, or returns False when all of them are in use
+    global active_exports
+    with export_lock:
+        if active_exports >= EXPORT_MAX_CONCURRENT:
+            return False
+        active_exports += 1
+        return True
+
+def release_export():
+    global active_exports
+    with export_lock:
+        active_exports -= 1
+
+def track_export(chunks):
+    # Holds the slot reserved by export_table while the export streams; released even if the client disconnects
+    try:
+        yield from chunks
+    finally:
+        release_export()
+
+@app.get("/export/{table}")
+def export_table(
+    table: str,
+    format: str = "ndjson",
+    columns: Optional[str] = None,
+    start: Optional[str] = Query(None, alias="from"),
+    end: Optional[str] = Query(None, alias="to"),
+    compression: str = "none",
+):
+    """Stream a whole table (optionally a date range and a subset of columns).
+
+    Rows are read in batches from a dedicated read-only connection and
+    encoded as they go, so memory stays constant however large the table.
+    Exports read the latest replica snapshot when there is one.
+    """
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table; choose from: {', '.join(EXPORT_TABLES)}")
+    parse_date_range(start, end)
+    # The slot is taken before any work so concurrent requests cannot all pass the check,
+    # and handed to track_export once the stream exists
+    if not reserve_export():
+        raise HTTPException(status_code=503, detail="Too many exports running, retry later")
+    try:
+        selected = export_columns(table, columns)
+        # The export's connection is opened before the lease ends, so the snapshot
+        # file stays readable for the whole stream even if it is swapped out meanwhile
+        with replica_lease() as snapshot:
+            source = snapshot.path if snapshot is not None else DATABASE_PATH
+            chunks = export_stream(source, table, format, selected, start, end, compression,
+                                   batch_rows=EXPORT_BATCH_ROWS)
+    except ExportError as exc:
+        release_export()
+        raise HTTPException(status_code=400, detail=str(exc))
+    except BaseException:
+        release_export()
+        raise
+
+    media_type, extension = EXPORT_FORMATS[format]
+    if format != "parquet" and compression in COMPRESSED_TYPES:
+        media_type, suffix = COMPRESSED_TYPES[compression]
+        extension += suffix
+    return StreamingResponse(
+        track_export(chunks),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}{extension}"'},
+    )
+
+@app.get("/health/db")
+@db_endpoint("lookup")
+def get_db_health():
+    with get_db_connection() as conn:
+        conn.execute("SELECT 1").fetchone()
+        partitions = partition_stats(conn)
+    return {
+        "status": "ok",
+        "pool": pool.stats(),
+        "executor": db_executor.stats(),
+        "worker": os.getpid(),
+        "caches": {name: cache.stats() for name, cache in CACHES.items()},
+        "workers": worker_cache_stats(),
+        "change_feed": change_feed.stats() if change_feed is not None else None,
+        "statements": statements.stats(),
+        "columnar": column_store.stats() if column_store is not None else None,
+        "ticket_sketches": ticket_sketches.stats(),
+        "supplier_risk": supplier_risk.stats(),
+        "partitions": partitions,
+        "writer": writer.stats(),
+        "replica": replicas.stats() if replicas is not None else None,
+        "startup_seconds": dict(metrics_registry.startup),
+    }
+
+def worker_cache_stats():
+    # {pid: {cache: stats}} for every live worker; counters are per worker, sizes are shared
+    workers = {}
+    if shared_store is not None:
+        shared_store.report()
+        workers = {pid: {name: stats for name, stats in caches.items() if name in CACHES}
+                   for pid, caches in shared_store.worker_stats().items()}
+    workers[os.getpid()] = {name: cache.stats() for name, cache in CACHES.items()}
+    return workers
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus text format; pool, executor and cache state are sampled at scrape time
+    gauges = []
+    for key, value in pool.stats().items():
+        gauges.append((f"db_pool_{key}", "Connection pool state", {}, value))
+    for lane, stats in db_executor.stats().items():
+        for key, value in stats.items():
+            gauges.append((f"db_executor_{key}", "DB executor lane state", {"lane": lane}, value))
+    for pid, caches in worker_cache_stats().items():
+        for name, stats in caches.items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)):
+                    gauges.append((f"response_cache_{key}", "Response cache state per worker",
+                                   {"cache": name, "worker": str(pid)}, value))
+    for name, stats in statements.stats().items():
+        for key, value in stats.items():
+            gauges.append((f"db_statement_cache_{key}", "Registered statement reuse per pooled connection",
+                           {"statement": name}, value))
+    for key, value in writer.stats().items():
+        if isinstance(value, (int, float)):
+            gauges.append((f"db_writer_{key}", "Batch writer state", {}, float(value)))
+    if replicas is not None:
+        for key, value in replicas.stats().items():
+            if isinstance(value, (int, float)):
+                gauges.append((f"db_replica_{key}", "Read replica snapshot state", {}, float(value)))
+    return Response(content=metrics_registry.render(gauges), media_type="text/plain; version=0.0.4")
 
-        return {
-            "total_customers": int(stats['total_customers']),
-            "total_sales": float(stats['total_sales'] or 0),
-            "open_tickets": int(stats['open_tickets'] or 0),
-            "top_products": top_products,
-            "sales_by_region": sales_by_region,
-            "sales_trend": sales_trend
-        }
-    
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+
+    # uvicorn imports "main:app" afresh in every worker; exporting the count lets
+    # each of them see that it runs alongside others and use the shared cache
+    workers = int(os.getenv("WEB_CONCURRENCY") or os.cpu_count() or 1)
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    uvicorn.run("main:app" if workers > 1 else app, host=os.getenv("HOST", "0.0.0.0"),
+                port=int(os.getenv("PORT", 8000)), workers=workers)
\ No newline at end of file
@@ -0,0 +1,323 @@
+import contextvars
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Timings of the request being served; copied into executor threads with the context
+_current = contextvars.ContextVar("request_timings", default=None)
+
+
+def _process_started_at():
+    """Wall-clock time this process started, or when this module was imported off Linux."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the parenthesised command name that may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime "))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+PROCESS_STARTED_AT = _process_started_at()
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram, one series per label tuple."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def collect(self):
+        with self._lock:
+            return {labels: (list(counts), count, total) for labels, (counts, count, total) in self._series.items()}
+
+
+class Metrics:
+    """Process-wide request, phase and SQL statement metrics."""
+
+    def __init__(self):
+        self.requests = Histogram()
+        self.statements = Histogram()
+        self.phases = defaultdict(float)
+        self.statement_rows = Counter()
+        self.status_codes = Counter()
+        self.startup = {}
+        self._lock = threading.Lock()
+
+    def observe_request(self, method, route, status, seconds, phases):
+        self.requests.observe((method, route), seconds)
+        with self._lock:
+            self.status_codes[(method, route, str(status))] += 1
+            for phase, phase_seconds in phases.items():
+                self.phases[(route, phase)] += phase_seconds
+
+    def observe_statement(self, statement, seconds, rows):
+        self.statements.observe((statement,), seconds)
+        with self._lock:
+            self.statement_rows[statement] += rows
+
+    def observe_startup(self, phase, seconds):
+        """Record how long startup ``phase`` took, e.g. "lifespan" or "first_request"."""
+        with self._lock:
+            self.startup[phase] = round(seconds, 6)
+
+    def render(self, gauges=()):
+        """Render everything in the Prometheus text exposition format.
+
+        ``gauges`` is an iterable of ``(name, help, labels, value)`` tuples
+        sampled by the caller, e.g. pool and executor state.
+        """
+        lines = []
+        _histogram(lines, "http_request_duration_seconds", "HTTP request latency",
+                   ("method", "route"), self.requests.collect())
+        _histogram(lines, "db_statement_duration_seconds", "SQL statement latency including fetch",
+                   ("statement",), self.statements.collect())
+        with self._lock:
+            status_codes = dict(self.status_codes)
+            phases = dict(self.phases)
+            statement_rows = dict(self.statement_rows)
+            startup = dict(self.startup)
+
+        lines += ["# HELP http_requests_total HTTP requests by status", "# TYPE http_requests_total counter"]
+        for (method, route, status), count in sorted(status_codes.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {count}")
+        lines += ["# HELP http_request_phase_seconds_total Time spent per request phase",
+                  "# TYPE http_request_phase_seconds_total counter"]
+        for (route, phase), seconds in sorted(phases.items()):
+            lines.append(f"http_request_phase_seconds_total{_labels(route=route, phase=phase)} {seconds:.6f}")
+        lines += ["# HELP db_statement_rows_total Rows returned per SQL statement",
+                  "# TYPE db_statement_rows_total counter"]
+        for statement, rows in sorted(statement_rows.items()):
+            lines.append(f"db_statement_rows_total{_labels(statement=statement)} {rows}")
+
+        lines += ["# HELP app_startup_seconds Seconds spent per startup phase; first_request is measured "
+                  "from process start", "# TYPE app_startup_seconds gauge"]
+        for phase, seconds in startup.items():
+            lines.append(f"app_startup_seconds{_labels(phase=phase)} {seconds}")
+
+        seen = set()
+        for name, help_text, labels, value in gauges:
+            if name not in seen:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+                seen.add(name)
+            lines.append(f"{name}{_labels(**labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram(lines, name, help_text, label_names, series):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for labels, (counts, count, total) in sorted(series.items()):
+        base = dict(zip(label_names, labels))
+        for bound, bucket_count in zip(BUCKETS, counts):
+            lines.append(f"{name}_bucket{_labels(**base, le=bound)} {bucket_count}")
+        lines.append(f"{name}_bucket{_labels(**base, le='+Inf')} {count}")
+        lines.append(f"{name}_sum{_labels(**base)} {total:.6f}")
+        lines.append(f"{name}_count{_labels(**base)} {count}")
+
+
+registry = Metrics()
+
+
+class RequestTimings:
+    """Phase durations, statements and threads touched while serving one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = defaultdict(float)
+        self.statements = 0
+        self.rows = 0
+        self.threads = {threading.get_ident()}
+        self._lock = threading.Lock()
+
+    def add(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] += seconds
+            self.threads.add(threading.get_ident())
+
+    def server_timing(self, total):
+        parts = [f"total;dur={total * 1000:.2f}"]
+        for phase, seconds in self.phases.items():
+            desc = f';desc="{self.statements} statements, {self.rows} rows"' if phase == "sql" else ""
+            parts.append(f"{phase};dur={seconds * 1000:.2f}{desc}")
+        return ", ".join(parts)
+
+
+def statement_label(sql):
+    # Collapse whitespace so the same statement always maps to one series
+    return _WHITESPACE.sub(" ", sql).strip()[:200]
+
+
+def observe_statement(sql, seconds, rows):
+    registry.observe_statement(statement_label(sql), seconds, rows)
+    timings = _current.get()
+    if timings is not None:
+        timings.add("sql", seconds)
+        with timings._lock:
+            timings.statements += 1
+            timings.rows += rows
+
+
+@contextmanager
+def timed(phase):
+    """Attribute the enclosed block to ``phase`` of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _current.get()
+        if timings is not None:
+            timings.add(phase, time.perf_counter() - started)
+
+
+class StackSampler:
+    """Samples thread stacks every ``interval`` seconds into folded-stack counts.
+
+    The output is Brendan Gregg's collapsed format (``frame;frame;frame count``),
+    which flamegraph.pl, speedscope and inferno read directly.
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self._samples = defaultdict(Counter)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                self._samples[ident][";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self, threads):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        lines = []
+        for ident in threads:
+            for stack, count in self._samples.get(ident, {}).items():
+                lines.append(f"{names.get(ident, ident)};{stack} {count}")
+        return "\n".join(sorted(lines)) + "\n"
+
+
+class TimingMiddleware:
+    """ASGI middleware recording request metrics and a ``Server-Timing`` header.
+
+    With ``profiling`` enabled, a request carrying ``profile=1`` is run under
+    a ``StackSampler`` and answered with the folded stacks of the threads it
+    touched instead of its normal body.
+    """
+
+    def __init__(self, app, metrics=registry, profiling=False, profile_interval=0.001):
+        self.app = app
+        self.metrics = metrics
+        self.profiling = profiling
+        self.profile_interval = profile_interval
+        self._served_first = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = 500
+
+        if self.profiling and _wants_profile(scope):
+            try:
+                with StackSampler(self.profile_interval) as sampler:
+                    async def discard(message):
+                        nonlocal status
+                        if message["type"] == "http.response.start":
+                            status = message["status"]
+                    await self.app(scope, receive, discard)
+            finally:
+                _current.reset(token)
+            body = sampler.folded(timings.threads).encode()
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"text/plain; charset=utf-8"),
+                                    (b"x-profiled-status", str(status).encode())]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total = time.perf_counter() - timings.started
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timings.server_timing(total).encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            self.metrics.observe_request(
+                scope["method"], _route_label(scope), status,
+                time.perf_counter() - timings.started, timings.phases)
+            if not self._served_first:
+                # Time to first request: process start until the first response was sent
+                self._served_first = True
+                self.metrics.observe_startup("first_request", time.time() - PROCESS_STARTED_AT)
+
+
+def _route_label(scope):
+    # The path template, so /customers/1 and /customers/2 share one series
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    endpoint = scope.get("endpoint")
+    return endpoint.__name__ if endpoint is not None else "unmatched"
+
+
+def _wants_profile(scope):
+    query = scope.get("query_string", b"").decode()
+    return any(part in ("profile=1", "profile=true") for part in query.split("&"))
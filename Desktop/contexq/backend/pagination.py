@@ -0,0 +1,51 @@
+import base64
+import json
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, keys):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("malformed cursor") from exc
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor("cursor does not match this listing")
+    # Each value is bound as a query parameter, so only scalars can be
+    if not all(value is None or isinstance(value, (int, float, str)) for value in values):
+        raise InvalidCursor("cursor does not match this listing")
+    return values
+
+
+def keyset_condition(keys, values, descending=False):
+    """SQL condition and params selecting the rows that sort after ``values``.
+
+    Only the leading key may be NULL (e.g. an unparseable transaction date);
+    NULLs sort first, so in ascending order rows after a NULL key are the
+    rest of the NULL run followed by every non-NULL key, and in descending
+    order they are only the rest of the NULL run.
+    """
+    op = "<" if descending else ">"
+    params = {f"after_{key}": value for key, value in zip(keys, values)}
+    if len(keys) == 1:
+        return f"{keys[0]} {op} :after_{keys[0]}", params
+
+    head, rest = keys[0], keys[1:]
+    rest_columns = ", ".join(rest)
+    rest_params = ", ".join(f":after_{key}" for key in rest)
+    if values[0] is None:
+        del params[f"after_{head}"]
+        condition = f"({head} IS NULL AND ({rest_columns}) {op} ({rest_params}))"
+        if not descending:
+            condition = f"({condition} OR {head} IS NOT NULL)"
+    else:
+        condition = f"({head}, {rest_columns}) {op} (:after_{head}, {rest_params})"
+    return condition, params
@@ -0,0 +1,317 @@
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from collections import defaultdict
+
+from schema import TABLES
+
+logger = logging.getLogger(__name__)
+
+# Tables that can be split into monthly partitions: key column and the date column
+# rows are partitioned on
+PARTITIONED = {
+    "sales": ("transaction_id", "transaction_date"),
+    "tickets": ("ticket_id", "creation_date"),
+}
+
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+def _month(value):
+    # 'YYYY-MM' of a stored 'YYYY-MM-DD' date; None sends the row to the default partition
+    return value[:7] if value and _DATE.match(value) else None
+
+
+def _next_month(month):
+    year, number = int(month[:4]), int(month[5:7])
+    return f"{year + number // 12:04d}-{number % 12 + 1:02d}"
+
+
+def partition_name(table, month):
+    return f"{table}_{month.replace('-', '_')}" if month else f"{table}_default"
+
+
+def layout(conn, table):
+    """{month: partition} of a partitioned table (month None is the default partition); empty if unpartitioned."""
+    if table not in PARTITIONED:
+        return {}
+    return {month: name for month, name in conn.execute(
+        "SELECT month, name FROM partitions WHERE table_name = ? ORDER BY month", (table,))}
+
+
+def is_partitioned(conn, table):
+    return bool(layout(conn, table))
+
+
+def _columns(conn, name):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({name})")]
+
+
+def _indexes(conn, name):
+    # (index name, unique, columns) of every explicitly created index
+    indexes = []
+    for row in conn.execute(f"PRAGMA index_list({name})"):
+        if row[3] == "c":
+            columns = [info[2] for info in conn.execute(f"PRAGMA index_info({row[1]})")]
+            indexes.append((row[1], row[2], columns))
+    return indexes
+
+
+def _create_partition(conn, table, name, indexes, source):
+    conn.execute(TABLES[table].format(name=name))
+    if source is not None:
+        sql, params = source
+        conn.execute(f"INSERT INTO {name} {sql}", params)
+    # The template's index names carry its own name, e.g. idx_sales_default_customer_id
+    for index, template, unique, columns in indexes:
+        index_name = index.replace(template, name, 1) if template in index else f"{name}_{index}"
+        conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {index_name} ON {name} ({', '.join(columns)})")
+
+
+def _create_view(conn, table):
+    # The table's own name stays readable as the union of its partitions
+    names = list(layout(conn, table).values())
+    conn.execute(f"DROP VIEW IF EXISTS {table}")
+    conn.execute(f"CREATE VIEW {table} AS " + " UNION ALL ".join(f"SELECT * FROM {name}" for name in names))
+
+
+def _atomic(conn, step, *args):
+    conn.execute("BEGIN")
+    try:
+        result = step(conn, *args)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+
+def partition_table(conn, table):
+    """Move ``table`` into monthly partitions behind a view of the same name.
+
+    Every month found in the date column gets its own table with the
+    original indexes; rows without a valid date go to ``<table>_default``,
+    which is also the template later partitions are created from. Must run
+    inside a transaction; returns the number of partitions.
+    """
+    key, date_column = PARTITIONED[table]
+    legacy = f"{table}_unpartitioned"
+    indexes = [(index, table, unique, columns) for index, unique, columns in _indexes(conn, table)]
+    conn.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    column_list = ", ".join(_columns(conn, legacy))
+    months = [month for (month,) in conn.execute(
+        f"SELECT DISTINCT substr({date_column}, 1, 7) FROM {legacy} "
+        f"WHERE {date_column} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' ORDER BY 1")]
+
+    default = partition_name(table, None)
+    _create_partition(conn, table, default, indexes, (
+        f"SELECT {column_list} FROM {legacy} WHERE {date_column} IS NULL "
+        f"OR {date_column} NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' ORDER BY {key}", ()))
+    for month in months:
+        _create_partition(conn, table, partition_name(table, month), indexes, (
+            f"SELECT {column_list} FROM {legacy} WHERE {date_column} >= ? AND {date_column} < ? ORDER BY {key}",
+            (f"{month}-01", f"{_next_month(month)}-01")))
+    conn.executemany(
+        "INSERT INTO partitions (table_name, month, name, created_at) VALUES (?, ?, ?, datetime('now'))",
+        [(table, month, partition_name(table, month)) for month in [None, *months]])
+    conn.execute(f"DROP TABLE {legacy}")
+    _create_view(conn, table)
+    return len(months) + 1
+
+
+def partition_tables(conn, tables):
+    """Partition each of ``tables`` that is not partitioned yet, each in its own transaction."""
+    partitioned = []
+    for table in tables:
+        if table not in PARTITIONED:
+            raise ValueError(f"{table} cannot be partitioned; choose from: {', '.join(PARTITIONED)}")
+        if is_partitioned(conn, table):
+            continue
+        started = time.perf_counter()
+        count = _atomic(conn, partition_table, table)
+        conn.execute("ANALYZE")
+        conn.commit()
+        logger.info("%s: split into %d partitions in %.2fs", table, count, time.perf_counter() - started)
+        partitioned.append(table)
+    return partitioned
+
+
+def add_partitions(conn, table, months):
+    """Create empty partitions for new ``months``; existing partitions are not touched.
+
+    Must run inside a transaction. New partitions copy the default
+    partition's columns and indexes.
+    """
+    default = partition_name(table, None)
+    indexes = [(index, default, unique, columns) for index, unique, columns in _indexes(conn, default)]
+    for month in months:
+        _create_partition(conn, table, partition_name(table, month), indexes, None)
+    conn.executemany(
+        "INSERT INTO partitions (table_name, month, name, created_at) VALUES (?, ?, ?, datetime('now'))",
+        [(table, month, partition_name(table, month)) for month in months])
+    _create_view(conn, table)
+
+
+def route(conn, table, columns, rows):
+    """Split row tuples by the table they are inserted into: {table or partition: rows}.
+
+    Inserting through the view is not possible, so writers send each group
+    to its partition, which is created first for a month not seen before.
+    Must run inside the writer's transaction.
+    """
+    months = layout(conn, table)
+    if not months:
+        return {table: rows}
+    date_index = columns.index(PARTITIONED[table][1])
+    groups = defaultdict(list)
+    for row in rows:
+        groups[_month(row[date_index])].append(row)
+    missing = sorted(month for month in groups if month not in months)
+    if missing:
+        add_partitions(conn, table, missing)
+        months.update((month, partition_name(table, month)) for month in missing)
+    return {months[month]: group for month, group in groups.items()}
+
+
+def partition_source(conn, table, start=None, end=None, where=None):
+    """FROM clause over only the partitions that can hold rows dated ``start``..``end``.
+
+    ``start``/``end`` are inclusive 'YYYY-MM-DD' bounds. The caller still
+    filters on the date column; this only skips the partitions that cannot
+    match. SQLite does not push a condition with a subquery down into the
+    partitions of the view, so ``where`` (unqualified column names) is
+    applied inside each partition, where it can use that partition's
+    indexes; the caller keeps it in its own WHERE clause too. Returns the
+    clause and a short label naming it, e.g. for registered statements.
+    Unpartitioned tables are returned as they are.
+    """
+    months = layout(conn, table)
+    if not months or (start is None and end is None and where is None):
+        return table, table
+    # Rows in the default partition have no valid date, so no range matches them
+    names = [name for month, name in months.items()
+             if (start is None and end is None) or (
+                 month is not None and (start is None or month >= start[:7]) and (end is None or month <= end[:7]))]
+    if not names:
+        names = [partition_name(table, None)]
+    if len(names) == 1 and where is None:
+        return names[0], names[0]
+    condition = f" WHERE {where}" if where else ""
+    source = "(" + " UNION ALL ".join(f"SELECT * FROM {name}{condition}" for name in names) + ")"
+    return source, f"{table}#{zlib.crc32(source.encode()):08x}"
+
+
+def _frozen_triggers(conn, name):
+    for operation in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {name}_frozen_{operation.lower()} BEFORE {operation} ON {name} BEGIN
+                SELECT RAISE(ABORT, 'partition {name} is frozen');
+            END""")
+
+
+def compact_partition(conn, table, name):
+    """Rewrite one partition in key order so its pages are full, then refresh its statistics.
+
+    Must run inside a transaction; the partition is rebuilt under a
+    temporary name and renamed back, with its indexes and triggers.
+    """
+    key = PARTITIONED[table][0]
+    rebuilt = f"{name}_compacting"
+    frozen = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?",
+                          (name,)).fetchone() is not None
+    indexes = [(index, name, unique, columns) for index, unique, columns in _indexes(conn, name)]
+    # The view refers to the partition by name, so it is recreated once the rename is done
+    conn.execute(f"DROP VIEW IF EXISTS {table}")
+    conn.execute(TABLES[table].format(name=rebuilt))
+    conn.execute(f"INSERT INTO {rebuilt} SELECT * FROM {name} ORDER BY {key}")
+    conn.execute(f"DROP TABLE {name}")
+    conn.execute(f"ALTER TABLE {rebuilt} RENAME TO {name}")
+    for index, _, unique, columns in indexes:
+        conn.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {index} ON {name} ({', '.join(columns)})")
+    if frozen:
+        _frozen_triggers(conn, name)
+    _create_view(conn, table)
+    conn.execute("UPDATE partitions SET compacted_at = datetime('now') WHERE table_name = ? AND name = ?",
+                 (table, name))
+
+
+def freeze_partitions(conn, table, through, compact=True):
+    """Make every monthly partition up to and including month ``through`` read-only.
+
+    Frozen partitions reject inserts, updates and deletes, so rows for
+    those months can no longer be written. Each one is compacted first
+    unless ``compact`` is False, and its row count is recorded. Every
+    partition is frozen in its own transaction; returns their names.
+    """
+    frozen = []
+    candidates = conn.execute(
+        "SELECT month, name FROM partitions WHERE table_name = ? AND month <= ? AND frozen_at IS NULL "
+        "ORDER BY month", (table, through)).fetchall()
+    for month, name in candidates:
+        def freeze(conn):
+            if compact:
+                compact_partition(conn, table, name)
+            _frozen_triggers(conn, name)
+            rows = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+            conn.execute("UPDATE partitions SET frozen_at = datetime('now'), rows = ? "
+                         "WHERE table_name = ? AND name = ?", (rows, table, name))
+
+        _atomic(conn, freeze)
+        if compact:
+            conn.execute(f"ANALYZE {name}")
+            conn.commit()
+        frozen.append(name)
+        logger.info("%s: froze %s", table, name)
+    return frozen
+
+
+def partition_stats(conn):
+    stats = {}
+    for table, count, frozen, first, last in conn.execute(
+            "SELECT table_name, COUNT(*), COUNT(frozen_at), MIN(month), MAX(month) FROM partitions "
+            "GROUP BY table_name ORDER BY table_name"):
+        stats[table] = {"partitions": count, "frozen": frozen, "first_month": first, "last_month": last}
+    return stats
+
+
+def main():
+    # Usage: python partitions.py partition --db data/business_data.db sales tickets
+    #        python partitions.py freeze --db data/business_data.db sales 2022-12
+    #        python partitions.py list --db data/business_data.db
+    parser = argparse.ArgumentParser(description="Split sales and tickets into monthly partitions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    partition_cmd = commands.add_parser("partition", help="move tables into monthly partitions")
+    partition_cmd.add_argument("--db", required=True)
+    partition_cmd.add_argument("tables", nargs="+", choices=list(PARTITIONED))
+    freeze_cmd = commands.add_parser("freeze", help="make every partition up to a month read-only")
+    freeze_cmd.add_argument("--db", required=True)
+    freeze_cmd.add_argument("table", choices=list(PARTITIONED))
+    freeze_cmd.add_argument("through", help="last month to freeze, YYYY-MM")
+    freeze_cmd.add_argument("--no-compact", action="store_true", help="freeze without rewriting the partitions")
+    list_cmd = commands.add_parser("list", help="show the partitions of every table")
+    list_cmd.add_argument("--db", required=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    from schema import migrate
+
+    conn = sqlite3.connect(args.db)
+    conn.execute("PRAGMA journal_mode=WAL")
+    migrate(conn)
+    if args.command == "partition":
+        partition_tables(conn, args.tables)
+    elif args.command == "freeze":
+        if not re.fullmatch(r"\d{4}-\d{2}", args.through):
+            parser.error("through must be a YYYY-MM month")
+        freeze_partitions(conn, args.table, args.through, compact=not args.no_compact)
+    print(json.dumps(partition_stats(conn), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+import json
+import logging
+from collections import defaultdict
+
+from partitions import partition_source
+
+# Per-product totals kept in product_stats, so a product summary or a listing
+# sorted by revenue, profit or sentiment reads one row per product instead of
+# grouping its sales and tickets. Every product has a row; the writer and the
+# CSV ingest update them in the transaction that inserts the counted rows.
+#
+# Profit is revenue less quantity times the product's cost_price. Both paths read
+# cost_price as it is when they run; products are never updated in place (the
+# ingest skips existing ids), so the two agree. A cost changed by hand needs a
+# refresh() of that product. Sales and tickets of product ids missing from
+# products are not counted by either path.
+
+logger = logging.getLogger(__name__)
+
+# Issue types listed in a product's common_issues
+COMMON_ISSUES = 3
+
+_SALES_DELTA = """
+    INSERT INTO product_stats (product_id, total_quantity, total_sales, profit)
+    SELECT product_id, :quantity, :revenue, COALESCE(:revenue - :quantity * cost_price, 0)
+    FROM products WHERE product_id = :product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        total_quantity = total_quantity + excluded.total_quantity,
+        total_sales = total_sales + excluded.total_sales,
+        profit = profit + excluded.profit
+"""
+
+_TICKETS_DELTA = """
+    INSERT INTO product_stats (product_id, ticket_count, sentiment_sum, sentiment_count, avg_sentiment)
+    SELECT product_id, :tickets, :sentiment_sum, :rated, COALESCE(:sentiment_sum / NULLIF(:rated, 0), 0)
+    FROM products WHERE product_id = :product_id
+    ON CONFLICT (product_id) DO UPDATE SET
+        ticket_count = ticket_count + excluded.ticket_count,
+        sentiment_sum = sentiment_sum + excluded.sentiment_sum,
+        sentiment_count = sentiment_count + excluded.sentiment_count,
+        avg_sentiment = COALESCE((sentiment_sum + excluded.sentiment_sum)
+                                 / NULLIF(sentiment_count + excluded.sentiment_count, 0), 0)
+"""
+
+_ISSUES_DELTA = """
+    INSERT INTO product_issue_counts (product_id, issue_type, tickets) VALUES (?, ?, ?)
+    ON CONFLICT (product_id, issue_type) DO UPDATE SET tickets = tickets + excluded.tickets
+"""
+
+_COMMON_ISSUES = f"""
+    UPDATE product_stats SET common_issues = (
+        SELECT GROUP_CONCAT(issue_type) FROM (
+            SELECT issue_type FROM product_issue_counts i
+            WHERE i.product_id = product_stats.product_id
+            ORDER BY tickets DESC, issue_type LIMIT {COMMON_ISSUES}))
+"""
+
+_REFRESH_STATS = """
+    WITH sales_totals AS (
+        SELECT product_id, SUM(quantity) AS quantity, SUM(sale_amount) AS revenue
+        FROM {sales} WHERE {where} GROUP BY product_id
+    ),
+    ticket_totals AS (
+        SELECT product_id, COUNT(*) AS tickets, SUM(sentiment_score) AS sentiment_sum,
+               COUNT(sentiment_score) AS rated
+        FROM {tickets} WHERE {where} GROUP BY product_id
+    )
+    INSERT OR REPLACE INTO product_stats (product_id, total_quantity, total_sales, profit, ticket_count,
+                                          sentiment_sum, sentiment_count, avg_sentiment)
+    SELECT p.product_id, COALESCE(st.quantity, 0), COALESCE(st.revenue, 0),
+           COALESCE(st.revenue - st.quantity * p.cost_price, 0), COALESCE(tt.tickets, 0),
+           COALESCE(tt.sentiment_sum, 0), COALESCE(tt.rated, 0), COALESCE(tt.sentiment_sum / tt.rated, 0)
+    FROM products p
+    LEFT JOIN sales_totals st ON st.product_id = p.product_id
+    LEFT JOIN ticket_totals tt ON tt.product_id = p.product_id
+    WHERE {where_products}
+"""
+
+_REFRESH_ISSUES = """
+    INSERT INTO product_issue_counts (product_id, issue_type, tickets)
+    SELECT product_id, issue_type, COUNT(*) FROM {tickets}
+    WHERE {where} AND issue_type IS NOT NULL
+    GROUP BY product_id, issue_type
+"""
+
+
+def _sales_deltas(columns, rows):
+    product, quantity, amount = (columns.index(c) for c in ("product_id", "quantity", "sale_amount"))
+    totals = defaultdict(lambda: [0, 0.0])
+    for row in rows:
+        total = totals[row[product]]
+        total[0] += row[quantity] or 0
+        total[1] += row[amount] or 0
+    return [{"product_id": product_id, "quantity": q, "revenue": revenue}
+            for product_id, (q, revenue) in totals.items()]
+
+
+def _ticket_deltas(columns, rows):
+    product, issue, score = (columns.index(c) for c in ("product_id", "issue_type", "sentiment_score"))
+    totals = defaultdict(lambda: [0, 0.0, 0])
+    issues = defaultdict(int)
+    for row in rows:
+        total = totals[row[product]]
+        total[0] += 1
+        if row[score] is not None:
+            total[1] += row[score]
+            total[2] += 1
+        if row[issue] is not None:
+            issues[row[product], row[issue]] += 1
+    deltas = [{"product_id": product_id, "tickets": tickets, "sentiment_sum": float(sentiment_sum), "rated": rated}
+              for product_id, (tickets, sentiment_sum, rated) in totals.items()]
+    return deltas, [(product_id, issue_type, n) for (product_id, issue_type), n in issues.items()]
+
+
+def _warn_unknown(table, deltas, counted):
+    # The deltas select from products, so one per unknown product id changes nothing
+    if counted < len(deltas):
+        logger.warning("product_stats: %d %s product ids are not in products and were not counted",
+                       len(deltas) - counted, table)
+
+
+def record(conn, table, columns, rows):
+    """Count newly inserted ``rows`` (tuples in ``columns`` order) of ``table`` into product_stats.
+
+    Must run in the transaction that inserted them, and only with rows that
+    were actually inserted; see ``refresh`` for a batch of which some were
+    skipped.
+    """
+    if not rows:
+        return
+    if table == "products":
+        key = columns.index("product_id")
+        conn.executemany("INSERT OR IGNORE INTO product_stats (product_id) VALUES (?)", [(row[key],) for row in rows])
+    elif table == "sales":
+        deltas = _sales_deltas(columns, rows)
+        _warn_unknown(table, deltas, conn.executemany(_SALES_DELTA, deltas).rowcount)
+    elif table == "tickets":
+        deltas, issues = _ticket_deltas(columns, rows)
+        _warn_unknown(table, deltas, conn.executemany(_TICKETS_DELTA, deltas).rowcount)
+        if issues:
+            conn.executemany(_ISSUES_DELTA, issues)
+            conn.execute(_COMMON_ISSUES + " WHERE product_id IN (SELECT value FROM json_each(?))",
+                         (json.dumps(sorted({product_id for product_id, _, _ in issues})),))
+
+
+def refresh(conn, product_ids=None):
+    """Recount product_stats from sales and tickets, for ``product_ids`` or every product."""
+    if product_ids is None:
+        where = where_products = "1"
+        params = {}
+        sources = {"sales": "sales", "tickets": "tickets"}
+    else:
+        where = "product_id IN (SELECT value FROM json_each(:ids))"
+        where_products = "p." + where
+        params = {"ids": json.dumps(sorted(product_ids))}
+        # As for the summaries, the id filter is repeated inside each partition so it can use their index
+        sources = {table: partition_source(conn, table, where=where)[0] for table in ("sales", "tickets")}
+    conn.execute(f"DELETE FROM product_issue_counts WHERE {where}", params)
+    conn.execute(_REFRESH_ISSUES.format(where=where, **sources), params)
+    conn.execute(_REFRESH_STATS.format(where=where, where_products=where_products, **sources), params)
+    conn.execute(f"{_COMMON_ISSUES} WHERE {where}", params)
@@ -0,0 +1,69 @@
+import threading
+from collections import defaultdict
+
+
+class Statement:
+    """A named SQL statement whose text never changes; every value is a bound parameter."""
+
+    __slots__ = ("name", "sql")
+
+    def __init__(self, name, sql):
+        self.name = name
+        self.sql = sql
+
+    def __repr__(self):
+        return f"Statement({self.name!r})"
+
+
+class StatementRegistry:
+    """Named, fully parameterized statements, prepared once per pooled connection.
+
+    sqlite3 keeps a per-connection cache of prepared statements keyed by
+    their text, so running a registered statement again on the same
+    connection skips parsing and planning. Pooled connections remember the
+    statements they have prepared, which gives each statement a hit count
+    (reused) and a miss count (prepared on a new connection).
+    """
+
+    def __init__(self):
+        self._statements = {}
+        self._lock = threading.Lock()
+        self._hits = defaultdict(int)
+        self._misses = defaultdict(int)
+
+    def register(self, name, sql):
+        """The statement called ``name``; registering the same name again must give the same SQL."""
+        with self._lock:
+            statement = self._statements.get(name)
+            if statement is None:
+                statement = self._statements[name] = Statement(name, sql)
+            elif statement.sql != sql:
+                raise ValueError(f"statement {name!r} is already registered with different SQL")
+            return statement
+
+    def __getitem__(self, name):
+        return self._statements[name]
+
+    def __len__(self):
+        return len(self._statements)
+
+    def execute(self, conn, statement, params=()):
+        prepared = getattr(conn, "prepared", None)
+        if prepared is not None:
+            with self._lock:
+                if statement.name in prepared:
+                    self._hits[statement.name] += 1
+                else:
+                    prepared.add(statement.name)
+                    self._misses[statement.name] += 1
+        return conn.execute(statement.sql, params)
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {"hits": self._hits[name], "misses": self._misses[name]}
+                for name in sorted(self._statements)
+            }
+
+
+statements = StatementRegistry()
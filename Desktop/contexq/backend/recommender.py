@@ -0,0 +1,204 @@
+import heapq
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+
+EPOCH = date(1970, 1, 1)
+
+
+def _bucket(transaction_date, window_days):
+    if not window_days:
+        return 0
+    if not transaction_date:
+        return -1
+    return (date.fromisoformat(transaction_date[:10]) - EPOCH).days // window_days
+
+
+class CoPurchaseRecommender:
+    """Sparse product x product co-occurrence counts with precomputed top-K.
+
+    ``transaction_id`` is unique per sales row, so baskets are built per
+    customer instead: every product a customer bought (optionally within the
+    same ``window_days`` bucket) co-occurs with every other one. The counts
+    only ever grow, which lets ``record_sales`` keep each product's top-K
+    list exact with an O(K) update per affected pair.
+    """
+
+    def __init__(self, top_k=20, window_days=0):
+        self.top_k = top_k
+        self.window_days = window_days
+        self._lock = threading.Lock()
+        self._reset()
+        self.version = 0
+        self.built_at = None
+        self.build_seconds = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            top_k=int(os.getenv("RECOMMENDER_TOP_K", 20)),
+            window_days=int(os.getenv("RECOMMENDER_BASKET_DAYS", 0)),
+        )
+
+    def _reset(self):
+        self.product_names = {}
+        self.popularity = defaultdict(int)
+        self._counts = defaultdict(dict)
+        self._top = {}
+        self._baskets = defaultdict(set)
+
+    def _basket_items(self):
+        # One row per distinct (customer, bucket, product), bucketed as _bucket() does
+        if not self.window_days:
+            return "SELECT DISTINCT customer_id, 0 AS bucket, product_id FROM sales"
+        return """
+            SELECT DISTINCT customer_id,
+                   CASE WHEN days IS NULL THEN -1 ELSE (days - (days % {w} + {w}) % {w}) / {w} END AS bucket,
+                   product_id
+            FROM (SELECT customer_id, product_id,
+                         CAST(julianday(substr(transaction_date, 1, 10)) - julianday('1970-01-01') AS INTEGER) AS days
+                  FROM sales)
+        """.format(w=int(self.window_days))
+
+    def rebuild(self, conn):
+        started = time.perf_counter()
+        product_names = dict(conn.execute("SELECT product_id, product_name FROM products"))
+        popularity = dict(conn.execute("SELECT product_id, COUNT(*) FROM sales GROUP BY product_id"))
+        items = self._basket_items()
+
+        # The pairs are counted by SQLite, so no per-purchase pair list is built here
+        counts = defaultdict(dict)
+        for product_id, other_id, count in conn.execute(f"""
+            WITH items AS ({items})
+            SELECT a.product_id, b.product_id, COUNT(*)
+            FROM items a JOIN items b
+              ON b.customer_id = a.customer_id AND b.bucket = a.bucket AND b.product_id != a.product_id
+            GROUP BY a.product_id, b.product_id
+        """):
+            counts[product_id][other_id] = count
+
+        # record_sales needs every basket's products to count only the pairs a sale adds
+        baskets = defaultdict(set)
+        for customer_id, bucket, product_id in conn.execute(items):
+            baskets[(customer_id, bucket)].add(product_id)
+
+        top = {
+            product_id: heapq.nlargest(self.top_k, ((count, other) for other, count in neighbours.items()))
+            for product_id, neighbours in counts.items()
+        }
+
+        with self._lock:
+            self.product_names = product_names
+            self.popularity = defaultdict(int, popularity)
+            self._counts = counts
+            self._top = top
+            self._baskets = baskets
+            self.version += 1
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+
+    def state(self):
+        """What ``rebuild`` computed, as plain containers that can be pickled."""
+        with self._lock:
+            return {
+                "top_k": self.top_k,
+                "window_days": self.window_days,
+                "built_at": self.built_at,
+                "product_names": dict(self.product_names),
+                "popularity": dict(self.popularity),
+                "counts": {product_id: dict(neighbours) for product_id, neighbours in self._counts.items()},
+                "top": {product_id: list(top) for product_id, top in self._top.items()},
+                "baskets": {basket: set(products) for basket, products in self._baskets.items()},
+            }
+
+    def restore(self, state):
+        """Load a ``state()``; returns False if it was built with other settings."""
+        if (state["top_k"], state["window_days"]) != (self.top_k, self.window_days):
+            return False
+        with self._lock:
+            self.product_names = state["product_names"]
+            self.popularity = defaultdict(int, state["popularity"])
+            self._counts = defaultdict(dict, state["counts"])
+            self._top = state["top"]
+            self._baskets = defaultdict(set, state["baskets"])
+            self.version += 1
+            self.built_at = state["built_at"]
+        return True
+
+    def _bump(self, product_id, other_id):
+        neighbours = self._counts[product_id]
+        count = neighbours.get(other_id, 0) + 1
+        neighbours[other_id] = count
+
+        top = self._top.setdefault(product_id, [])
+        for i, (_, existing) in enumerate(top):
+            if existing == other_id:
+                top[i] = (count, other_id)
+                break
+        else:
+            if len(top) >= self.top_k and (count, other_id) <= top[-1]:
+                return
+            top.append((count, other_id))
+        top.sort(reverse=True)
+        del top[self.top_k:]
+
+    def record_sales(self, rows):
+        with self._lock:
+            for row in rows:
+                product_id = row["product_id"]
+                self.popularity[product_id] += 1
+                basket = self._baskets[(row["customer_id"], _bucket(row["transaction_date"], self.window_days))]
+                if product_id in basket:
+                    continue
+                for other_id in basket:
+                    self._bump(product_id, other_id)
+                    self._bump(other_id, product_id)
+                basket.add(product_id)
+            self.version += 1
+
+    def has_product(self, product_id):
+        return product_id in self.product_names
+
+    def recommend(self, product_id, limit):
+        """Up to ``limit`` co-purchased products, scored relative to the strongest one."""
+        with self._lock:
+            top = self._top.get(product_id, [])[:limit]
+            if not top:
+                return []
+            max_co = top[0][0]
+            return [
+                {
+                    "product_id": other_id,
+                    "product_name": self.product_names.get(other_id),
+                    "confidence": round(count / max_co, 2),
+                }
+                for count, other_id in top
+                if other_id in self.product_names
+            ]
+
+    def popular(self, exclude_product_id, limit):
+        """Fallback to recommend generally popular products"""
+        with self._lock:
+            ranked = heapq.nlargest(
+                limit,
+                (pid for pid in self.product_names if pid != exclude_product_id),
+                key=lambda pid: self.popularity.get(pid, 0),
+            )
+            return [
+                {"product_id": pid, "product_name": self.product_names[pid], "confidence": 0.5}
+                for pid in ranked
+            ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "built_at": self.built_at,
+                "products": len(self._counts),
+                "pairs": sum(len(neighbours) for neighbours in self._counts.values()),
+                "baskets": len(self._baskets),
+                "top_k": self.top_k,
+                "window_days": self.window_days,
+            }
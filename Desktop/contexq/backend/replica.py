@@ -0,0 +1,214 @@
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from db import ConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class Snapshot:
+    """One replica file and the read-only pool serving it."""
+
+    def __init__(self, path, pool, created_at):
+        self.path = path
+        self.pool = pool
+        self.created_at = created_at
+        self.created_monotonic = time.monotonic()
+        self.leases = 0
+        self.retired = False
+
+    def age(self):
+        return time.monotonic() - self.created_monotonic
+
+
+class ReplicaManager:
+    """Periodic read-only snapshots of the primary database for analytics.
+
+    Every ``interval`` seconds a background thread copies the primary with
+    ``sqlite3.Connection.backup`` into a new ``replica-<pid>-<n>.db`` file in
+    ``directory``; the online backup reads one consistent snapshot while
+    writers carry on in WAL mode. The new file is opened through its own
+    read-only ``ConnectionPool`` and swapped in under a lock.
+
+    Readers take a ``lease()`` on the current snapshot for as long as they
+    use it. A swapped-out snapshot is only closed and deleted once its last
+    lease is returned, so requests already running on it finish undisturbed.
+    """
+
+    def __init__(self, database_path, directory, interval=300.0, pool_size=4):
+        self.database_path = database_path
+        self.directory = directory
+        self.interval = interval
+        self.pool_size = pool_size
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._current = None
+        self._retired = []
+        self._sequence = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._stats = {
+            "refreshes": 0,
+            "failures": 0,
+            "last_duration": None,
+            "last_error": None,
+        }
+
+    @classmethod
+    def from_env(cls, database_path):
+        # Kept next to the database by default, e.g. business_data.replicas/
+        return cls(
+            database_path,
+            os.getenv("REPLICA_DIR", os.path.splitext(database_path)[0] + ".replicas"),
+            interval=float(os.getenv("REPLICA_INTERVAL", 300)),
+            pool_size=int(os.getenv("REPLICA_POOL_SIZE", 4)),
+        )
+
+    def start(self):
+        """Take a first snapshot in the background and refresh it every ``interval``."""
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="db-replica", daemon=True)
+                self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join()
+        with self._lock:
+            current, self._current = self._current, None
+            if current is not None:
+                self._retire(current)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("replica: snapshot of %s failed", self.database_path)
+            if self._stop.wait(self.interval):
+                break
+
+    # -- snapshots ------------------------------------------------------------
+
+    def refresh(self):
+        """Copy the primary into a new replica file and swap it in."""
+        with self._refresh_lock:
+            started = time.perf_counter()
+            os.makedirs(self.directory, exist_ok=True)
+            if self._sequence == 0:
+                self._remove_stale_files()
+            self._sequence += 1
+            path = os.path.join(self.directory, f"replica-{os.getpid()}-{self._sequence}.db")
+            try:
+                self._copy(path)
+            except sqlite3.Error as exc:
+                with self._lock:
+                    self._stats["failures"] += 1
+                    self._stats["last_error"] = str(exc)
+                _unlink(path)
+                raise
+
+            pool = ConnectionPool(path, max_size=self.pool_size, read_only=True)
+            snapshot = Snapshot(path, pool, datetime.now(timezone.utc).isoformat())
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                previous, self._current = self._current, snapshot
+                if previous is not None:
+                    self._retire(previous)
+                self._stats["refreshes"] += 1
+                self._stats["last_duration"] = round(elapsed, 3)
+                self._stats["last_error"] = None
+            logger.info("replica: %s ready in %.2fs", path, elapsed)
+            return snapshot
+
+    def _copy(self, path):
+        source = sqlite3.connect(f"file:{self.database_path}?mode=ro", uri=True)
+        target = sqlite3.connect(path)
+        try:
+            # pages=-1 copies everything in one step, i.e. from a single read transaction
+            source.backup(target, pages=-1)
+            target.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            target.close()
+            source.close()
+
+    def _remove_stale_files(self):
+        # Snapshots left behind by processes that have exited; other worker
+        # processes share the directory and keep theirs
+        for path in glob.glob(os.path.join(self.directory, "replica-*.db*")):
+            pid = os.path.basename(path).split("-")[1]
+            if not pid.isdigit() or int(pid) == os.getpid() or not _is_running(int(pid)):
+                _unlink(path)
+
+    def _retire(self, snapshot):
+        # Caller holds self._lock
+        snapshot.retired = True
+        if snapshot.leases:
+            self._retired.append(snapshot)
+        else:
+            _dispose(snapshot)
+
+    @contextmanager
+    def lease(self):
+        """Yield the current snapshot (None until the first one exists) and keep it open meanwhile."""
+        with self._lock:
+            snapshot = self._current
+            if snapshot is not None:
+                snapshot.leases += 1
+        try:
+            yield snapshot
+        finally:
+            if snapshot is not None:
+                with self._lock:
+                    snapshot.leases -= 1
+                    if snapshot.retired and not snapshot.leases:
+                        self._retired.remove(snapshot)
+                        _dispose(snapshot)
+
+    def stats(self):
+        with self._lock:
+            current = self._current
+            stats = dict(self._stats)
+            stats.update(
+                interval=self.interval,
+                path=current.path if current is not None else None,
+                created_at=current.created_at if current is not None else None,
+                age_seconds=round(current.age(), 3) if current is not None else None,
+                active_leases=current.leases if current is not None else 0,
+                retired_pending=len(self._retired),
+            )
+        return stats
+
+
+def _dispose(snapshot):
+    snapshot.pool.close()
+    _unlink(snapshot.path)
+
+
+def _is_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
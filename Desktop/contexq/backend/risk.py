@@ -0,0 +1,244 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import date
+
+from partitions import partition_source
+
+
+def _day(value):
+    # Day number of a 'YYYY-MM-DD' date; None if it is missing or not a date
+    try:
+        return date.fromisoformat(value[:10]).toordinal() if value else None
+    except ValueError:
+        return None
+
+
+class SupplierRisk:
+    """Revenue at risk per supplier and product, behind /suppliers/risk.
+
+    A product's sales velocity is its revenue per day over the last
+    ``window_days`` days of sales, ending at the latest sale dated no later
+    than today. A supplier of that product puts at risk the revenue of
+    ``lead_time_days`` days, weighted by its chance of failing to deliver
+    (``1 - reliability_score``) and split across the product's suppliers::
+
+        revenue_at_risk = velocity * lead_time_days * (1 - reliability_score) / suppliers
+
+    Missing lead times and reliabilities count as the average of the known
+    ones. Revenue is kept per day for the window and updated as sales are
+    recorded; the scores of every supplier row are computed at once with
+    NumPy and reused until sales or suppliers change.
+    """
+
+    def __init__(self, window_days=90):
+        self.window_days = window_days
+        self._lock = threading.Lock()
+        self._reset()
+        self.version = 0
+        self.built_at = None
+        self.build_seconds = None
+        self.score_seconds = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(window_days=int(os.getenv("SUPPLIER_RISK_WINDOW_DAYS", 90)))
+
+    def _reset(self):
+        # (supplier_id, supplier_name, product_id, lead_time_days, reliability_score) per supplier row
+        self.suppliers = []
+        self.product_names = {}
+        self.latest_day = None
+        # day -> {product_id: revenue} for the days in the window, and their sum per product
+        self._daily = {}
+        self._revenue = defaultdict(float)
+        self._arrays = None
+        self._scores = None
+
+    def rebuild(self, conn):
+        started = time.perf_counter()
+        today = date.today().isoformat()
+        suppliers = conn.execute("""
+            SELECT supplier_id, supplier_name, product_id, lead_time_days, reliability_score
+            FROM suppliers ORDER BY supplier_id, product_id
+        """).fetchall()
+        product_names = dict(conn.execute("SELECT product_id, product_name FROM products"))
+        latest = conn.execute("SELECT MAX(transaction_date) FROM sales WHERE transaction_date <= ?",
+                              (today,)).fetchone()[0]
+        rows = []
+        if latest is not None:
+            start = date.fromordinal(_day(latest) - self.window_days + 1).isoformat()
+            source, _ = partition_source(conn, "sales", start, latest)
+            rows = conn.execute(f"""
+                SELECT transaction_date, product_id, SUM(sale_amount) FROM {source}
+                WHERE transaction_date >= ? AND transaction_date <= ?
+                GROUP BY transaction_date, product_id
+            """, (start, latest)).fetchall()
+
+        with self._lock:
+            self._reset()
+            self.suppliers = [tuple(row) for row in suppliers]
+            self.product_names = product_names
+            self.latest_day = _day(latest)
+            for transaction_date, product_id, amount in rows:
+                self._add(_day(transaction_date), product_id, amount or 0.0)
+            self.version += 1
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+
+    def _add(self, day, product_id, amount):
+        if self.latest_day is None or day > self.latest_day:
+            self.latest_day = day
+            # The window moved on; drop the days that fell out of it
+            cutoff = day - self.window_days
+            for old in [old for old in self._daily if old <= cutoff]:
+                for old_product, old_amount in self._daily.pop(old).items():
+                    self._revenue[old_product] -= old_amount
+        if day > self.latest_day - self.window_days:
+            revenue = self._daily.setdefault(day, {})
+            revenue[product_id] = revenue.get(product_id, 0.0) + amount
+            self._revenue[product_id] += amount
+
+    def record_sales(self, rows):
+        today = date.today().toordinal()
+        with self._lock:
+            for row in rows:
+                day = _day(row["transaction_date"])
+                # Sales dated in the future would move the window past today
+                if day is not None and day <= today:
+                    self._add(day, row["product_id"], row["sale_amount"] or 0.0)
+            self._scores = None
+            self.version += 1
+
+    def state(self):
+        """The suppliers and the revenue window as plain containers that can be pickled."""
+        with self._lock:
+            return {
+                "window_days": self.window_days,
+                "built_at": self.built_at,
+                "suppliers": list(self.suppliers),
+                "product_names": dict(self.product_names),
+                "latest_day": self.latest_day,
+                "daily": {day: dict(revenue) for day, revenue in self._daily.items()},
+            }
+
+    def restore(self, state):
+        """Load a ``state()``; returns False if it was built with another window."""
+        if state["window_days"] != self.window_days:
+            return False
+        with self._lock:
+            self._reset()
+            self.suppliers = state["suppliers"]
+            self.product_names = state["product_names"]
+            self.latest_day = state["latest_day"]
+            self._daily = state["daily"]
+            for revenue in self._daily.values():
+                for product_id, amount in revenue.items():
+                    self._revenue[product_id] += amount
+            self.built_at = state["built_at"]
+            self.version += 1
+        return True
+
+    def _supplier_arrays(self):
+        # Called with the lock held; only change when the suppliers are reloaded
+        import numpy as np
+
+        if self._arrays is None:
+            columns = list(zip(*self.suppliers)) or [(), (), (), (), ()]
+            lead_time = np.array(columns[3], dtype=np.float64)
+            reliability = np.clip(np.array(columns[4], dtype=np.float64), 0, 1)
+            for values in (lead_time, reliability):
+                known = ~np.isnan(values)
+                values[~known] = values[known].mean() if known.any() else 0
+            product_ids = np.array(columns[2], dtype=np.int64)
+            products, product_idx = np.unique(product_ids, return_inverse=True)
+            self._arrays = {
+                "names": dict(zip(columns[0], columns[1])),
+                "supplier_id": np.array(columns[0], dtype=np.int64),
+                "product_id": product_ids,
+                "lead_time_days": lead_time,
+                "reliability_score": reliability,
+                "products": products.tolist(),
+                "product_idx": product_idx,
+                "sources": np.bincount(product_idx, minlength=len(products))[product_idx],
+            }
+        return self._arrays
+
+    def _score(self):
+        # Called with the lock held; every array is indexed by supplier row
+        import numpy as np
+
+        if self._scores is not None:
+            return self._scores
+        started = time.perf_counter()
+        arrays = self._supplier_arrays()
+        revenue = np.array([self._revenue.get(product_id, 0.0) for product_id in arrays["products"]])
+        # Subtracting days that left the window can leave a rounding residue below zero
+        velocity = (np.maximum(revenue, 0) / self.window_days)[arrays["product_idx"]]
+        self._scores = dict(
+            arrays,
+            daily_revenue=velocity,
+            revenue_at_risk=velocity * arrays["lead_time_days"] * (1 - arrays["reliability_score"]) / arrays["sources"],
+        )
+        self.score_seconds = time.perf_counter() - started
+        return self._scores
+
+    def rank(self, group_by="product", limit=50):
+        """The ``limit`` largest exposures, per supplier row ("product") or summed per supplier."""
+        import numpy as np
+
+        with self._lock:
+            scores = self._score()
+            if group_by == "supplier":
+                suppliers, supplier_idx = np.unique(scores["supplier_id"], return_inverse=True)
+                at_risk = np.bincount(supplier_idx, weights=scores["revenue_at_risk"], minlength=len(suppliers))
+                daily_revenue = np.bincount(supplier_idx, weights=scores["daily_revenue"], minlength=len(suppliers))
+                products = np.bincount(supplier_idx, minlength=len(suppliers))
+            else:
+                at_risk = scores["revenue_at_risk"]
+            # Only the top rows are sorted, largest first, ties by position (i.e. by id)
+            top = np.argpartition(-at_risk, limit - 1)[:limit] if limit < len(at_risk) else np.arange(len(at_risk))
+            top = top[np.lexsort((top, -at_risk[top]))]
+
+            names = scores["names"]
+            results = []
+            for i in top.tolist():
+                if group_by == "supplier":
+                    supplier_id = int(suppliers[i])
+                    results.append({
+                        "supplier_id": supplier_id,
+                        "supplier_name": names.get(supplier_id),
+                        "products": int(products[i]),
+                        "daily_revenue": round(float(daily_revenue[i]), 2),
+                        "revenue_at_risk": round(float(at_risk[i]), 2),
+                    })
+                else:
+                    supplier_id, product_id = int(scores["supplier_id"][i]), int(scores["product_id"][i])
+                    results.append({
+                        "supplier_id": supplier_id,
+                        "supplier_name": names.get(supplier_id),
+                        "product_id": product_id,
+                        "product_name": self.product_names.get(product_id),
+                        "lead_time_days": float(scores["lead_time_days"][i]),
+                        "reliability_score": float(scores["reliability_score"][i]),
+                        "daily_revenue": round(float(scores["daily_revenue"][i]), 2),
+                        "revenue_at_risk": round(float(at_risk[i]), 2),
+                    })
+            return {
+                "as_of": date.fromordinal(self.latest_day).isoformat() if self.latest_day else None,
+                "window_days": self.window_days,
+                "results": results,
+            }
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "built_at": self.built_at,
+                "build_seconds": self.build_seconds,
+                "score_seconds": self.score_seconds,
+                "supplier_rows": len(self.suppliers),
+                "window_days": self.window_days,
+                "latest_sale_date": date.fromordinal(self.latest_day).isoformat() if self.latest_day else None,
+            }
@@ -0,0 +1,331 @@
+import logging
+import re
+import sqlite3
+import sys
+
+logger = logging.getLogger(__name__)
+
+# Declared schema for every table; load_data() appends into these instead of
+# letting pandas infer an unkeyed table.
+TABLES = {
+    "customers": """
+        CREATE TABLE {name} (
+            customer_id INTEGER PRIMARY KEY,
+            customer_name TEXT NOT NULL,
+            industry TEXT,
+            region TEXT,
+            join_date TEXT
+        )""",
+    "products": """
+        CREATE TABLE {name} (
+            product_id INTEGER PRIMARY KEY,
+            product_name TEXT NOT NULL,
+            category TEXT,
+            cost_price REAL,
+            sales_price REAL
+        )""",
+    "sales": """
+        CREATE TABLE {name} (
+            transaction_id INTEGER PRIMARY KEY,
+            customer_id INTEGER NOT NULL REFERENCES customers (customer_id),
+            product_id INTEGER NOT NULL REFERENCES products (product_id),
+            quantity INTEGER,
+            sale_amount REAL,
+            transaction_date TEXT
+        )""",
+    "tickets": """
+        CREATE TABLE {name} (
+            ticket_id INTEGER PRIMARY KEY,
+            customer_id INTEGER NOT NULL REFERENCES customers (customer_id),
+            product_id INTEGER NOT NULL REFERENCES products (product_id),
+            issue_type TEXT,
+            status TEXT,
+            creation_date TEXT,
+            resolution_date TEXT,
+            sentiment_score REAL
+        )""",
+    "suppliers": """
+        CREATE TABLE {name} (
+            supplier_id INTEGER NOT NULL,
+            supplier_name TEXT,
+            product_id INTEGER NOT NULL REFERENCES products (product_id),
+            lead_time_days INTEGER,
+            reliability_score REAL,
+            PRIMARY KEY (supplier_id, product_id)
+        )""",
+}
+
+# Foreign-key indexes double as covering indexes for the summary and
+# dashboard aggregates, so those queries never have to touch the table rows.
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_sales_customer_id ON sales (customer_id, product_id, sale_amount)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_product_id ON sales (product_id, quantity, sale_amount)",
+    "CREATE INDEX IF NOT EXISTS idx_sales_transaction_date ON sales (transaction_date, sale_amount)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_product_id ON tickets (product_id, issue_type, sentiment_score)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_customer_status ON tickets (customer_id, status, sentiment_score)",
+    "CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets (status)",
+    "CREATE INDEX IF NOT EXISTS idx_customers_industry ON customers (industry)",
+    "CREATE INDEX IF NOT EXISTS idx_customers_region ON customers (region)",
+    "CREATE INDEX IF NOT EXISTS idx_products_category ON products (category, sales_price)",
+    "CREATE INDEX IF NOT EXISTS idx_suppliers_product_id ON suppliers (product_id)",
+]
+
+
+def _table_exists(conn, name):
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name = ?", (name,)).fetchone()
+    return row is not None
+
+
+def _columns(conn, name):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({name})")]
+
+
+def _create_tables(conn):
+    # Tables written by DataFrame.to_sql have no keys; rebuild them in place
+    for name, ddl in TABLES.items():
+        if not _table_exists(conn, name):
+            conn.execute(ddl.format(name=name))
+            continue
+        conn.execute(ddl.format(name=f"{name}_new"))
+        columns = [c for c in _columns(conn, f"{name}_new") if c in _columns(conn, name)]
+        column_list = ", ".join(columns)
+        # Rows repeating a primary key in the legacy table are dropped
+        conn.execute(f"INSERT OR IGNORE INTO {name}_new ({column_list}) SELECT {column_list} FROM {name}")
+        conn.execute(f"DROP TABLE {name}")
+        conn.execute(f"ALTER TABLE {name}_new RENAME TO {name}")
+
+
+def _create_indexes(conn):
+    for ddl in INDEXES:
+        conn.execute(ddl)
+    conn.execute("ANALYZE")
+
+
+def _create_keyset_indexes(conn):
+    # /sales pages in (transaction_date, transaction_id) order
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sales_date_keyset ON sales (transaction_date, transaction_id)")
+
+
+def _create_ingest_ledger(conn):
+    # CSV files already appended by ingest.py, so re-running a load is a no-op
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS ingested_files (
+            table_name TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime INTEGER NOT NULL,
+            rows INTEGER NOT NULL,
+            ingested_at TEXT NOT NULL,
+            PRIMARY KEY (table_name, path)
+        )""")
+
+
+# Name columns with an external-content FTS5 index: table -> (key column, name column)
+SEARCH_INDEXES = {
+    "customers": ("customer_id", "customer_name"),
+    "products": ("product_id", "product_name"),
+}
+
+
+def _create_search_indexes(conn):
+    # Triggers keep <table>_fts in step with every insert, update and delete on
+    # the table; <table>_fts_vocab lists the indexed terms for fuzzy matching.
+    for table, (key, column) in SEARCH_INDEXES.items():
+        fts = f"{table}_fts"
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                {column}, content='{table}', content_rowid='{key}',
+                tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+            )""")
+        conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts}_vocab USING fts5vocab({fts}, 'row')")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts} (rowid, {column}) VALUES (new.{key}, new.{column});
+            END""")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.{key}, old.{column});
+            END""")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {key}, {column} ON {table} BEGIN
+                INSERT INTO {fts} ({fts}, rowid, {column}) VALUES ('delete', old.{key}, old.{column});
+                INSERT INTO {fts} (rowid, {column}) VALUES (new.{key}, new.{column});
+            END""")
+        conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+
+def _create_change_log(conn):
+    # Rows committed by the batch writer of each worker process, read back by
+    # the other workers to keep their in-memory rollups current (see shared.py)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            pid INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_change_log_created_at ON change_log (created_at)")
+
+
+def _create_partition_catalog(conn):
+    # Monthly partitions of tables split by partitions.py; month is NULL for the
+    # default partition holding rows without a valid date
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS partitions (
+            table_name TEXT NOT NULL,
+            month TEXT,
+            name TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            frozen_at TEXT,
+            compacted_at TEXT,
+            rows INTEGER,
+            PRIMARY KEY (table_name, name)
+        )""")
+
+
+def _create_product_stats(conn):
+    # Per-product totals maintained by product_stats.py as sales and tickets are
+    # inserted, so product summaries and sorted listings never aggregate the fact tables
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS product_stats (
+            product_id INTEGER PRIMARY KEY REFERENCES products (product_id),
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            total_sales REAL NOT NULL DEFAULT 0,
+            profit REAL NOT NULL DEFAULT 0,
+            ticket_count INTEGER NOT NULL DEFAULT 0,
+            sentiment_sum REAL NOT NULL DEFAULT 0,
+            sentiment_count INTEGER NOT NULL DEFAULT 0,
+            avg_sentiment REAL NOT NULL DEFAULT 0,
+            common_issues TEXT
+        )""")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS product_issue_counts (
+            product_id INTEGER NOT NULL,
+            issue_type TEXT NOT NULL,
+            tickets INTEGER NOT NULL,
+            PRIMARY KEY (product_id, issue_type)
+        ) WITHOUT ROWID""")
+    # /products?sort_by= walks one of these, in either direction
+    for column in ("total_sales", "profit", "avg_sentiment"):
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_product_stats_{column} ON product_stats ({column}, product_id)")
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS product_listing AS
+        SELECT ps.product_id, p.product_name, p.category, p.cost_price, p.sales_price,
+               ps.total_quantity, ps.total_sales, ps.profit, ps.ticket_count, ps.avg_sentiment
+        FROM product_stats ps
+        JOIN products p ON p.product_id = ps.product_id""")
+    # Imported here, as product_stats reaches back into this module through partitions
+    from product_stats import refresh
+    refresh(conn)
+    conn.execute("ANALYZE product_stats")
+
+
+# Ordered (version, step) pairs; the applied version is kept in PRAGMA user_version
+MIGRATIONS = [
+    (1, _create_tables),
+    (2, _create_indexes),
+    (3, _create_keyset_indexes),
+    (4, _create_ingest_ledger),
+    (5, _create_search_indexes),
+    (6, _create_change_log),
+    (7, _create_partition_catalog),
+    (8, _create_product_stats),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Apply every pending migration, each in its own transaction."""
+    applied = []
+    for version, step in MIGRATIONS:
+        if version <= schema_version(conn):
+            continue
+        conn.execute("BEGIN")
+        try:
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# Point lookups the API runs on every request; none of them may scan a table
+HOT_QUERIES = {
+    "customer_by_id": ("SELECT * FROM customers WHERE customer_id = ?", (1,)),
+    "product_by_id": ("SELECT * FROM products WHERE product_id = ?", (1,)),
+    "product_stats_by_id": ("SELECT * FROM product_stats WHERE product_id = ?", (1,)),
+    "products_by_revenue": (
+        "SELECT * FROM product_listing WHERE (total_sales, product_id) < (?, ?) "
+        "ORDER BY total_sales DESC, product_id DESC LIMIT 50", (1e9, 1)),
+    "products_by_sentiment": (
+        "SELECT * FROM product_listing ORDER BY avg_sentiment, product_id LIMIT 50", ()),
+    "sales_page_after": (
+        "SELECT * FROM sales WHERE (transaction_date, transaction_id) > (?, ?) "
+        "ORDER BY transaction_date, transaction_id LIMIT 100", ("2023-01-01", 1)),
+    "sales_by_month": (
+        "SELECT SUM(sale_amount) FROM sales WHERE transaction_date >= ? AND transaction_date < ?",
+        ("2023-01-01", "2023-02-01")),
+}
+
+_TABLE_SCAN = re.compile(r"^SCAN (\w+)\b(?! USING (COVERING )?INDEX)")
+
+# Monthly partitions ANALYZE found smaller than this fit in a few pages, so the planner may scan them
+SMALL_TABLE_ROWS = 1000
+
+
+def _small_partitions(conn):
+    # The first number of every sqlite_stat1 entry is the row count of its table
+    if not _table_exists(conn, "sqlite_stat1") or not _table_exists(conn, "partitions"):
+        return set()
+    rows = {}
+    for table, stat in conn.execute(
+            "SELECT tbl, stat FROM sqlite_stat1 WHERE tbl IN (SELECT name FROM partitions)"):
+        rows[table] = max(rows.get(table, 0), int(stat.split()[0]))
+    return {table for table, count in rows.items() if count < SMALL_TABLE_ROWS}
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Return (query name, plan detail) for every hot query that scans a table.
+
+    Only base tables count; scanning a CTE or a table-valued function such as
+    ``json_each`` over the request's own ids is expected, and so is scanning
+    a monthly partition known to be small.
+    """
+    tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    small = _small_partitions(conn)
+    violations = []
+    for name, (sql, params) in queries.items():
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+            detail = row[3]
+            match = _TABLE_SCAN.match(detail)
+            if match and match.group(1) in tables and match.group(1) not in small:
+                violations.append((name, detail))
+    return violations
+
+
+def verify_query_plans(conn, queries=HOT_QUERIES):
+    """Log a warning for every hot query that scans a table; returns ``check_query_plans``."""
+    violations = check_query_plans(conn, queries)
+    for name, detail in violations:
+        logger.warning("Hot query %s falls back to a table scan: %s", name, detail)
+    return violations
+
+
+if __name__ == "__main__":
+    # Usage: python schema.py path/to/business_data.db
+    conn = sqlite3.connect(sys.argv[1])
+    print(f"Applied migrations: {migrate(conn) or 'none'}; schema version {schema_version(conn)}")
+    violations = check_query_plans(conn)
+    if violations:
+        lines = "\n".join(f"  {name}: {detail}" for name, detail in violations)
+        sys.exit(f"Hot queries fall back to a table scan:\n{lines}")
+    print("Query plans OK")
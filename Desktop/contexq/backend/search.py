@@ -0,0 +1,189 @@
+import json
+import re
+import unicodedata
+
+from db import fetch_all
+from queries import statements
+from schema import SEARCH_INDEXES
+
+# Per searchable table: facet columns and the columns returned for each hit
+SEARCHABLE = {
+    "customers": {
+        "facets": ("industry", "region"),
+        "columns": ("customer_id", "customer_name", "industry", "region", "join_date"),
+    },
+    "products": {
+        "facets": ("category",),
+        "columns": ("product_id", "product_name", "category", "cost_price", "sales_price"),
+    },
+}
+
+# Words of a query beyond this are ignored
+MAX_WORDS = 8
+
+# Indexed terms a misspelled word may expand to
+MAX_EXPANSIONS = 16
+
+_WORD = re.compile(r"\w+")
+
+
+class SearchError(ValueError):
+    """Raised for a search query that cannot be run."""
+
+
+def query_words(query):
+    """Lower-cased words of ``query``, folded like the unicode61 tokenizer folds them."""
+    folded = "".join(ch for ch in unicodedata.normalize("NFKD", query) if not unicodedata.combining(ch))
+    return [word.lower() for word in _WORD.findall(folded)][:MAX_WORDS]
+
+
+def max_distance(word):
+    # Short words tolerate fewer typos, and one or two letters none at all
+    if len(word) < 3:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+
+def edit_distance(a, b, bound):
+    """Levenshtein distance of ``a`` and ``b``, or ``bound + 1`` once it exceeds ``bound``."""
+    if abs(len(a) - len(b)) > bound:
+        return bound + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > bound:
+            return bound + 1
+        previous = current
+    return previous[-1]
+
+
+def _has_prefix(conn, vocab, word):
+    # fts5vocab answers term range constraints from the index, without a scan
+    statement = statements.register(
+        f"{vocab}_prefix", f"SELECT 1 FROM {vocab} WHERE term >= ? AND term < ? LIMIT 1")
+    return statements.execute(conn, statement, (word, word + "\U0010ffff")).fetchone() is not None
+
+
+def expand_word(conn, vocab, word):
+    """Indexed terms within ``max_distance`` edits of ``word`` (or of a prefix of it).
+
+    Candidates are drawn from terms sharing the word's first letter, which
+    keeps the vocabulary read small; a typo in the first letter is not fixed.
+    """
+    bound = max_distance(word)
+    if not bound:
+        return []
+    statement = statements.register(
+        f"{vocab}_candidates", f"SELECT term, doc FROM {vocab} WHERE term >= ? AND term < ? AND length(term) >= ?")
+    candidates = statements.execute(
+        conn, statement, (word[0], word[0] + "\U0010ffff", len(word) - bound)).fetchall()
+    whole, prefixed = [], []
+    for term, docs in candidates:
+        distance = edit_distance(word, term, bound)
+        if distance <= bound:
+            whole.append((distance, -docs, term))
+            continue
+        # Comparing with the term's own prefix lets a half-typed, misspelled word match
+        distance = edit_distance(word, term[:len(word)], bound)
+        if distance <= bound:
+            prefixed.append((distance, -docs, term))
+    # Near misses of whole terms win, prefix matches only stand in when there are
+    # none, and only the closest of them are kept so BM25 cannot favour a rarer,
+    # more distant term
+    scored = sorted(whole or prefixed)
+    return [term for distance, _, term in scored[:MAX_EXPANSIONS] if distance == scored[0][0]]
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_expression(conn, table, words, fuzzy=True):
+    """FTS5 MATCH expression for ``words`` plus the fuzzy expansions used.
+
+    Every word matches as a prefix. With ``fuzzy``, a word that is not the
+    prefix of any indexed term also matches the closest indexed terms, so
+    correctly spelled words are never diluted by near misses.
+    """
+    vocab = f"{table}_fts_vocab"
+    groups, expanded = [], {}
+    for word in words:
+        alternatives = [_quote(word) + "*"]
+        if fuzzy and not _has_prefix(conn, vocab, word):
+            terms = expand_word(conn, vocab, word)
+            if terms:
+                expanded[word] = terms
+                alternatives += [_quote(term) for term in terms]
+        groups.append("(" + " OR ".join(alternatives) + ")")
+    return " AND ".join(groups), expanded
+
+
+def search_sql(table, filters):
+    """One statement returning the page of hits, every facet's counts and the total.
+
+    Each facet is counted over the matches filtered by every *other* facet,
+    so picking a region still shows how many hits the other regions have.
+    """
+    key, _ = SEARCH_INDEXES[table]
+    spec = SEARCHABLE[table]
+    fts = f"{table}_fts"
+
+    def where(skip=None):
+        conditions = [f"{facet} = :{facet}" for facet in spec["facets"]
+                      if filters.get(facet) is not None and facet != skip]
+        return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+    fields = ", ".join(f"'{column}', {column}" for column in spec["columns"])
+    parts = [
+        # A hit's count is its rank, since a compound SELECT keeps no order
+        f"""SELECT 'hit' AS kind, NULL AS facet, json_object({fields}, 'score', round(-score, 4)) AS value,
+                   position AS count
+            FROM (SELECT *, row_number() OVER (ORDER BY score, {key}) AS position
+                  FROM matches{where()} ORDER BY score, {key} LIMIT :limit OFFSET :offset)""",
+        f"SELECT 'total', NULL, NULL, COUNT(*) FROM matches{where()}",
+    ]
+    parts += [f"SELECT 'facet', '{facet}', {facet}, COUNT(*) FROM matches{where(facet)} GROUP BY {facet}"
+              for facet in spec["facets"]]
+    return f"""
+        WITH matches AS MATERIALIZED (
+            SELECT t.*, bm25({fts}) AS score
+            FROM {fts} JOIN {table} t ON t.{key} = {fts}.rowid
+            WHERE {fts} MATCH :match
+        )
+        """ + "\nUNION ALL\n".join(parts)
+
+
+def search(conn, table, query, filters=None, fuzzy=True, limit=20, offset=0):
+    """Ranked name search over ``table`` with facet counts.
+
+    Hits are ordered by BM25 relevance; ``filters`` maps facet columns to
+    the value they must equal (None for no filter).
+    """
+    filters = {facet: value for facet, value in (filters or {}).items() if value is not None}
+    unknown = set(filters) - set(SEARCHABLE[table]["facets"])
+    if unknown:
+        raise SearchError(f"cannot filter {table} on: {', '.join(sorted(unknown))}")
+    words = query_words(query)
+    if not words:
+        raise SearchError("query must contain at least one letter or digit")
+
+    match, expanded = match_expression(conn, table, words, fuzzy)
+    statement = statements.register(f"search_{table}({','.join(sorted(filters))})", search_sql(table, filters))
+    rows = fetch_all(conn, statement,
+                     {"match": match, "limit": limit, "offset": offset, **filters})
+
+    hits, total = [], 0
+    facets = {facet: [] for facet in SEARCHABLE[table]["facets"]}
+    for row in rows:
+        if row["kind"] == "hit":
+            hits.append((row["count"], row["value"]))
+        elif row["kind"] == "total":
+            total = row["count"]
+        else:
+            facets[row["facet"]].append({"value": row["value"], "count": row["count"]})
+    results = [json.loads(value) for _, value in sorted(hits)]
+    for counts in facets.values():
+        counts.sort(key=lambda item: (-item["count"], item["value"] is None, item["value"] or ""))
+    return {"query": words, "expanded": expanded, "total": total, "results": results, "facets": facets}
@@ -0,0 +1,314 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from cache import CacheEntry
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS cache_entries (
+        cache TEXT NOT NULL,
+        key TEXT NOT NULL,
+        body BLOB NOT NULL,
+        etag TEXT NOT NULL,
+        last_modified TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        PRIMARY KEY (cache, key)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_cache_entries_expiry ON cache_entries (cache, expires_at)",
+    # Key "*" holds the generation of the whole cache, bumped by clear()
+    """CREATE TABLE IF NOT EXISTS cache_generations (
+        cache TEXT NOT NULL,
+        key TEXT NOT NULL,
+        generation INTEGER NOT NULL,
+        PRIMARY KEY (cache, key)
+    ) WITHOUT ROWID""",
+    """CREATE TABLE IF NOT EXISTS worker_stats (
+        pid INTEGER PRIMARY KEY,
+        stats TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    )""",
+]
+
+
+class SharedStore:
+    """SQLite file shared by every worker process serving the same database.
+
+    It holds the ``SharedCache`` entries and each worker's cache statistics. Every thread gets its own connection; the
+    file is disposable, so it is opened with ``synchronous=NORMAL``.
+    """
+
+    def __init__(self, path, busy_timeout_ms=5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.caches = {}
+        self._local = threading.local()
+
+    @classmethod
+    def from_env(cls, database_path):
+        # Kept next to the database by default, e.g. business_data.shared.db
+        return cls(os.getenv("SHARED_CACHE_PATH", os.path.splitext(database_path)[0] + ".shared.db"))
+
+    def connection(self):
+        # Forked workers must not reuse their parent's connections
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            for ddl in SCHEMA:
+                conn.execute(ddl)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return _Transaction(conn)
+
+    def report(self):
+        """Publish this worker's cache statistics for the other workers to read."""
+        stats = {name: cache.stats() for name, cache in self.caches.items()}
+        with self.connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO worker_stats (pid, stats, updated_at) VALUES (?, ?, ?)",
+                         (os.getpid(), json.dumps(stats), time.time()))
+
+    def close(self):
+        # Stop listing this worker once it shuts down
+        with self.connection() as conn:
+            conn.execute("DELETE FROM worker_stats WHERE pid = ?", (os.getpid(),))
+
+    def worker_stats(self, max_age=60.0):
+        """Latest statistics of every worker that reported within ``max_age`` seconds."""
+        with self.connection() as conn:
+            conn.execute("DELETE FROM worker_stats WHERE updated_at < ?", (time.time() - max_age,))
+            rows = conn.execute("SELECT pid, stats, updated_at FROM worker_stats ORDER BY pid").fetchall()
+        return {pid: dict(json.loads(stats), updated_at=updated_at) for pid, stats, updated_at in rows}
+
+
+class _Transaction:
+    """``with store.connection() as conn`` runs the block in one write transaction."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type is not None else "COMMIT")
+
+
+class SharedCache:
+    """``ResponseCache`` counterpart whose entries live in a ``SharedStore``.
+
+    Every worker reads and fills the same entries, so a summary computed by
+    one worker is served by all of them and invalidations reach every
+    worker at once. Entries expire after ``ttl`` seconds and, past
+    ``maxsize``, the ones closest to expiry are evicted. Per-key
+    generations are bounded as in ``ResponseCache``. Hit and miss counts
+    are per worker.
+    """
+
+    def __init__(self, store, name, maxsize=10000, ttl=300.0):
+        self.store = store
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sets = 0
+        self._invalidates = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        store.caches[name] = self
+
+    def _count(self, **deltas):
+        with self._lock:
+            for counter, delta in deltas.items():
+                setattr(self, counter, getattr(self, counter) + delta)
+
+    def get(self, key):
+        conn = self.store.connection().conn
+        row = conn.execute(
+            "SELECT body, etag, last_modified, expires_at FROM cache_entries WHERE cache = ? AND key = ?",
+            (self.name, str(key))).fetchone()
+        if row is None or row[3] < time.time():
+            self._count(misses=1)
+            return None
+        self._count(hits=1)
+        return CacheEntry.stored(*row)
+
+    def generation(self, key):
+        conn = self.store.connection().conn
+        return tuple(conn.execute(
+            "SELECT (SELECT generation FROM cache_generations WHERE cache = :cache AND key = '*'), "
+            "(SELECT generation FROM cache_generations WHERE cache = :cache AND key = :key)",
+            {"cache": self.name, "key": str(key)}).fetchone())
+
+    def set(self, key, body, generation=None):
+        entry = CacheEntry(body, self.ttl)
+        with self.store.connection() as conn:
+            if generation is not None and generation != self.generation(key):
+                return entry
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (cache, key, body, etag, last_modified, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self.name, str(key), entry.body, entry.etag, entry.last_modified, entry.expires_at))
+            with self._lock:
+                self._sets += 1
+                trim = self._sets % 100 == 0
+            if trim:
+                self._trim(conn)
+        return entry
+
+    def _trim(self, conn):
+        conn.execute("DELETE FROM cache_entries WHERE cache = ? AND expires_at < ?", (self.name, time.time()))
+        excess = conn.execute("SELECT COUNT(*) FROM cache_entries WHERE cache = ?",
+                              (self.name,)).fetchone()[0] - self.maxsize
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE cache = ? AND key IN ("
+                "SELECT key FROM cache_entries WHERE cache = ? ORDER BY expires_at LIMIT ?)",
+                (self.name, self.name, excess))
+            self._count(evictions=excess)
+
+    def invalidate(self, keys):
+        keys = [(self.name, str(key)) for key in keys]
+        with self.store.connection() as conn:
+            conn.executemany(
+                "INSERT INTO cache_generations (cache, key, generation) VALUES (?, ?, 1) "
+                "ON CONFLICT (cache, key) DO UPDATE SET generation = generation + 1", keys)
+            before = conn.total_changes
+            conn.executemany("DELETE FROM cache_entries WHERE cache = ? AND key = ?", keys)
+            self._count(invalidations=conn.total_changes - before)
+            with self._lock:
+                self._invalidates += 1
+                trim = self._invalidates % 100 == 0
+            if trim and conn.execute("SELECT COUNT(*) FROM cache_generations WHERE cache = ? AND key != '*'",
+                                     (self.name,)).fetchone()[0] > self.maxsize:
+                self._bump_epoch(conn)
+                conn.execute("DELETE FROM cache_generations WHERE cache = ? AND key != '*'", (self.name,))
+
+    def _bump_epoch(self, conn):
+        conn.execute(
+            "INSERT INTO cache_generations (cache, key, generation) VALUES (?, '*', 1) "
+            "ON CONFLICT (cache, key) DO UPDATE SET generation = generation + 1", (self.name,))
+
+    def clear(self):
+        with self.store.connection() as conn:
+            self._bump_epoch(conn)
+            conn.execute("DELETE FROM cache_generations WHERE cache = ? AND key != '*'", (self.name,))
+            conn.execute("DELETE FROM cache_entries WHERE cache = ?", (self.name,))
+
+    def stats(self):
+        size = self.store.connection().conn.execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE cache = ?", (self.name,)).fetchone()[0]
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": size,
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+class ChangeFeed:
+    """Rows committed by other worker processes, replayed into this one.
+
+    Every worker keeps its own in-memory rollups. The batch writer appends
+    what it inserts to ``change_log`` in the same transaction, and each
+    worker feeds the entries written by other processes to ``apply(topic,
+    rows)``: from a background thread every ``interval`` seconds, and on
+    demand through ``poll()`` before serving anything computed from the
+    rollups. ``connect`` is a context manager factory for the database.
+
+    ``mark(conn)`` must be called inside the read transaction the rollups
+    are built from, so every change is counted exactly once. Entries older
+    than ``retention`` seconds are pruned; a worker that fell further
+    behind calls ``resync(conn)`` to rebuild (and ``mark``) instead.
+    """
+
+    def __init__(self, connect, apply, resync, interval=1.0, retention=3600.0, report=None):
+        self.connect = connect
+        self.apply = apply
+        self.resync = resync
+        self.interval = interval
+        self.retention = retention
+        self.report = report
+        self._last_seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.applied = 0
+        self.resyncs = 0
+
+    def mark(self, conn):
+        """Start after the newest entry visible to ``conn``."""
+        self._last_seq = conn.execute("SELECT MAX(seq) FROM change_log").fetchone()[0] or 0
+
+    def poll(self):
+        """Apply every entry other workers committed since the last poll."""
+        with self._lock, self.connect() as conn:
+            oldest = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+            if oldest is not None and oldest > self._last_seq + 1:
+                logger.warning("change feed: entries %d-%d were pruned before this worker read them",
+                               self._last_seq + 1, oldest - 1)
+                self.resyncs += 1
+                self.resync(conn)
+                return
+            rows = conn.execute("SELECT seq, pid, topic, payload FROM change_log WHERE seq > ? ORDER BY seq",
+                                (self._last_seq,)).fetchall()
+            pid = os.getpid()
+            for seq, writer_pid, topic, payload in rows:
+                if writer_pid != pid:
+                    self.apply(topic, json.loads(payload))
+                    self.applied += 1
+                self._last_seq = seq
+
+    def resync_now(self):
+        """Rebuild through ``resync`` straight away, e.g. when a rebuild is requested."""
+        with self._lock, self.connect() as conn:
+            self.resyncs += 1
+            self.resync(conn)
+
+    def prune(self):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM change_log WHERE created_at < ?", (time.time() - self.retention,))
+            conn.commit()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        last_prune = time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+                if self.report is not None:
+                    self.report()
+                if time.monotonic() - last_prune > 60:
+                    self.prune()
+                    last_prune = time.monotonic()
+            except Exception:
+                logger.exception("change feed: poll failed")
+
+    def stats(self):
+        with self._lock:
+            return {"last_seq": self._last_seq, "applied": self.applied, "resyncs": self.resyncs}
@@ -0,0 +1,389 @@
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date
+
+# Sentiment histogram: fixed 0.1 wide bins over [-1, 1], so bins from any cells add up
+SENTIMENT_BIN_WIDTH = 0.1
+SENTIMENT_BINS = 20
+
+
+class LogMapping:
+    """Maps values to logarithmic bucket indexes ``gamma`` apart, ``gamma = (1 + alpha) / (1 - alpha)``.
+
+    Any value in bucket ``i`` lies in ``(gamma**(i-1), gamma**i]``, and
+    ``value(i)`` is within a relative ``alpha`` of all of them.
+    """
+
+    def __init__(self, alpha):
+        if not 0 < alpha < 1:
+            raise ValueError("alpha must be between 0 and 1")
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self._log_gamma = math.log(self.gamma)
+        self._indexes = {}
+
+    def index(self, value):
+        # Ticket values repeat a lot (whole days, two-decimal scores), so indexes are memoized
+        index = self._indexes.get(value)
+        if index is None:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            if len(self._indexes) < 100_000:
+                self._indexes[value] = index
+        return index
+
+    def value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with a relative error bound (DDSketch).
+
+    Values are counted in logarithmic buckets, so ``quantile(q)`` returns a
+    value within ``mapping.alpha`` (relative) of the exact q-quantile, for
+    every q and however many values were added. Zero is counted exactly and
+    negative values in buckets of their own. Merging adds bucket counts, so
+    a merged sketch is the same as one built from all the values.
+
+    Memory is bounded by ``max_bins`` buckets per sign: past that the
+    lowest buckets are folded together, which only affects quantiles that
+    fall in the folded range. With ``alpha=0.01`` the 2048 default covers
+    values spanning 17 orders of magnitude before that happens.
+    """
+
+    __slots__ = ("mapping", "max_bins", "positive", "negative", "zeros", "count", "min", "max")
+
+    def __init__(self, mapping, max_bins=2048):
+        self.mapping = mapping
+        self.max_bins = max_bins
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value, weight=1):
+        if value > 0:
+            bins = self.positive
+            index = self.mapping.index(value)
+        elif value < 0:
+            bins = self.negative
+            index = self.mapping.index(-value)
+        else:
+            bins = None
+        if bins is None:
+            self.zeros += weight
+        else:
+            bins[index] = bins.get(index, 0) + weight
+            if len(bins) > self.max_bins:
+                self._collapse(bins)
+        self.count += weight
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def extend(self, counts):
+        """Add every value of a ``{value: count}`` mapping."""
+        index = self.mapping.index
+        positive, negative = self.positive, self.negative
+        for value, count in counts.items():
+            if value > 0:
+                i = index(value)
+                positive[i] = positive.get(i, 0) + count
+            elif value < 0:
+                i = index(-value)
+                negative[i] = negative.get(i, 0) + count
+            else:
+                self.zeros += count
+        if counts:
+            self.count += sum(counts.values())
+            self.min = min(self.min, min(counts))
+            self.max = max(self.max, max(counts))
+            for bins in (positive, negative):
+                if len(bins) > self.max_bins:
+                    self._collapse(bins)
+
+    def merge(self, other):
+        for bins, other_bins in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in other_bins.items():
+                bins[index] = bins.get(index, 0) + count
+            if len(bins) > self.max_bins:
+                self._collapse(bins)
+        self.zeros += other.zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def _collapse(self, bins):
+        # Fold the smallest magnitudes into one bucket
+        indexes = sorted(bins)
+        excess = indexes[:len(indexes) - self.max_bins + 1]
+        bins[excess[-1]] = sum(bins.pop(index) for index in excess[:-1]) + bins[excess[-1]]
+
+    def quantile(self, q):
+        """Estimate of the value at rank ``q * (count - 1)``; None while empty."""
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return max(-self.mapping.value(index), self.min)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return min(self.mapping.value(index), self.max)
+        return self.max
+
+    def state(self):
+        return (dict(self.positive), dict(self.negative), self.zeros, self.count, self.min, self.max)
+
+    @classmethod
+    def from_state(cls, mapping, state, max_bins=2048):
+        sketch = cls(mapping, max_bins)
+        sketch.positive, sketch.negative, sketch.zeros, sketch.count, sketch.min, sketch.max = state
+        return sketch
+
+
+def _month(value):
+    return value[:7] if value else None
+
+
+def _resolution_days(creation_date, resolution_date):
+    if not creation_date or not resolution_date:
+        return None
+    try:
+        return (date.fromisoformat(resolution_date[:10]) - date.fromisoformat(creation_date[:10])).days
+    except ValueError:
+        return None
+
+
+def _sentiment_bin(score):
+    # Rounded first so that e.g. a score of 0.3 lands in [0.3, 0.4) despite float error
+    return min(max(math.floor(round((score + 1) / SENTIMENT_BIN_WIDTH, 9)), 0), SENTIMENT_BINS - 1)
+
+
+class _Cell:
+    """Sketches of the tickets created in one month for one dimension value."""
+
+    __slots__ = ("tickets", "resolution", "sentiment", "histogram")
+
+    def __init__(self, mapping):
+        self.tickets = 0
+        self.resolution = QuantileSketch(mapping)
+        self.sentiment = QuantileSketch(mapping)
+        self.histogram = {}
+
+    def add(self, resolution_days, sentiment):
+        self.tickets += 1
+        if resolution_days is not None:
+            self.resolution.add(resolution_days)
+        if sentiment is not None:
+            self.sentiment.add(sentiment)
+            b = _sentiment_bin(sentiment)
+            self.histogram[b] = self.histogram.get(b, 0) + 1
+
+    def extend(self, resolution_days, sentiments):
+        """Add many tickets, given as parallel lists of their values."""
+        self.tickets += len(resolution_days)
+        self.resolution.extend(Counter(days for days in resolution_days if days is not None))
+        sentiments = Counter(score for score in sentiments if score is not None)
+        self.sentiment.extend(sentiments)
+        for score, count in sentiments.items():
+            b = _sentiment_bin(score)
+            self.histogram[b] = self.histogram.get(b, 0) + count
+
+    def merge(self, other):
+        self.tickets += other.tickets
+        self.resolution.merge(other.resolution)
+        self.sentiment.merge(other.sentiment)
+        for b, count in other.histogram.items():
+            self.histogram[b] = self.histogram.get(b, 0) + count
+
+
+class TicketSketches:
+    """Resolution time and sentiment distributions behind /analytics/tickets.
+
+    One ``_Cell`` is kept per creation month for every issue type, every
+    product and for all tickets together, and updated as tickets are
+    recorded. A query merges the cells of the months in its range, so its
+    cost depends on the number of months and groups, not of tickets.
+    Resolution time is in days between ``creation_date`` and
+    ``resolution_date`` and only covers tickets that have a resolution date.
+
+    Every quantile is within ``alpha`` (relative) of the exact value, e.g.
+    a p90 of 10 days is exact to within 0.1 day at the default 1%.
+    Sentiment histogram counts are exact.
+    """
+
+    DIMENSIONS = ("issue_type", "product_id")
+
+    def __init__(self, alpha=0.01):
+        self.mapping = LogMapping(alpha)
+        self._lock = threading.Lock()
+        self._reset()
+        self.tickets = 0
+        self.version = 0
+        self.built_at = None
+        self.build_seconds = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(alpha=float(os.getenv("TICKET_SKETCH_ALPHA", 0.01)))
+
+    def _reset(self):
+        # dimension (None for all tickets) -> {(value, month): cell}
+        self._cells = {dimension: {} for dimension in (None, *self.DIMENSIONS)}
+        self.tickets = 0
+
+    def _cell(self, dimension, value, month):
+        cells = self._cells[dimension]
+        cell = cells.get((value, month))
+        if cell is None:
+            cell = cells[(value, month)] = _Cell(self.mapping)
+        return cell
+
+    def rebuild(self, conn):
+        started = time.perf_counter()
+        rows = conn.execute("""
+            SELECT issue_type, product_id, NULLIF(substr(creation_date, 1, 7), ''),
+                   CAST(julianday(substr(resolution_date, 1, 10)) - julianday(substr(creation_date, 1, 10))
+                        AS INTEGER),
+                   sentiment_score
+            FROM tickets
+        """)
+        # A missing creation date gives a NULL month, as _month() does for recorded
+        # tickets, so both end up in the same cell. Values are gathered per cell
+        # first: within a cell they repeat a lot (whole days, two-decimal scores),
+        # so each distinct one is then added once
+        values = defaultdict(lambda: ([], []))
+        for issue_type, product_id, month, resolution_days, sentiment in rows:
+            for key in ((None, None, month), ("issue_type", issue_type, month), ("product_id", product_id, month)):
+                days, sentiments = values[key]
+                days.append(resolution_days)
+                sentiments.append(sentiment)
+        with self._lock:
+            self._reset()
+            for key, (days, sentiments) in values.items():
+                self._cell(*key).extend(days, sentiments)
+            self.tickets = sum(len(days) for (dimension, _, _), (days, _) in values.items() if dimension is None)
+            self.version += 1
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+
+    def record_tickets(self, rows):
+        with self._lock:
+            for row in rows:
+                month = _month(row["creation_date"])
+                resolution_days = _resolution_days(row["creation_date"], row["resolution_date"])
+                for dimension in (None, *self.DIMENSIONS):
+                    value = row[dimension] if dimension else None
+                    self._cell(dimension, value, month).add(resolution_days, row["sentiment_score"])
+                self.tickets += 1
+            self.version += 1
+
+    def state(self):
+        """The cells as plain containers that can be pickled."""
+        with self._lock:
+            return {
+                "alpha": self.mapping.alpha,
+                "built_at": self.built_at,
+                "tickets": self.tickets,
+                "cells": {
+                    dimension: {
+                        key: (cell.tickets, cell.resolution.state(), cell.sentiment.state(), dict(cell.histogram))
+                        for key, cell in cells.items()
+                    }
+                    for dimension, cells in self._cells.items()
+                },
+            }
+
+    def restore(self, state):
+        """Load a ``state()``; returns False if it was built with another ``alpha``."""
+        if state["alpha"] != self.mapping.alpha:
+            return False
+        cells = {dimension: {} for dimension in state["cells"]}
+        for dimension, saved in state["cells"].items():
+            for key, (tickets, resolution, sentiment, histogram) in saved.items():
+                cell = cells[dimension][key] = _Cell(self.mapping)
+                cell.tickets = tickets
+                cell.resolution = QuantileSketch.from_state(self.mapping, resolution)
+                cell.sentiment = QuantileSketch.from_state(self.mapping, sentiment)
+                cell.histogram = histogram
+        with self._lock:
+            self._cells = cells
+            self.tickets = state["tickets"]
+            self.built_at = state["built_at"]
+            self.version += 1
+        return True
+
+    def query(self, group_by=None, issue_type=None, product_id=None, start=None, end=None,
+              quantiles=(0.5, 0.9, 0.99)):
+        """Merged distributions per group for creation months ``start``..``end`` ('YYYY-MM', inclusive).
+
+        ``group_by`` is None, "month", "issue_type" or "product_id". Cells
+        are kept per single dimension, so ``issue_type`` or ``product_id``
+        (at most one) can only filter a query that is not grouped by the
+        other one.
+        """
+        filters = {dim: value for dim, value in (("issue_type", issue_type), ("product_id", product_id))
+                   if value is not None}
+        if len(filters) > 1 or (filters and group_by in self.DIMENSIONS and group_by not in filters):
+            raise ValueError("ticket sketches are kept per single dimension; "
+                             "filter on issue_type or product_id and group by month at most")
+        dimension, value = next(iter(filters.items()), (group_by if group_by in self.DIMENSIONS else None, None))
+
+        groups = defaultdict(lambda: _Cell(self.mapping))
+        with self._lock:
+            for (cell_value, month), cell in self._cells[dimension].items():
+                if filters and cell_value != value:
+                    continue
+                if month is None and (start is not None or end is not None):
+                    continue
+                if (start is not None and month < start) or (end is not None and month > end):
+                    continue
+                key = month if group_by == "month" else cell_value if group_by in self.DIMENSIONS else None
+                groups[key].merge(cell)
+
+            results = []
+            for key in sorted(groups, key=lambda k: (k is None, k)):
+                cell = groups[key]
+                result = {group_by: key} if group_by else {}
+                result.update(
+                    tickets=cell.tickets,
+                    resolved=cell.resolution.count,
+                    resolution_days=_quantiles(cell.resolution, quantiles),
+                    sentiment=_quantiles(cell.sentiment, quantiles),
+                    sentiment_histogram=[
+                        {"from": round(b * SENTIMENT_BIN_WIDTH - 1, 1),
+                         "to": round((b + 1) * SENTIMENT_BIN_WIDTH - 1, 1), "tickets": count}
+                        for b, count in sorted(cell.histogram.items())
+                    ],
+                )
+                results.append(result)
+        return {"relative_error": self.mapping.alpha, "groups": results}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self.version,
+                "built_at": self.built_at,
+                "build_seconds": self.build_seconds,
+                "tickets": self.tickets,
+                "cells": sum(len(cells) for cells in self._cells.values()),
+                "alpha": self.mapping.alpha,
+            }
+
+
+def _quantiles(sketch, quantiles):
+    result = {}
+    for q in quantiles:
+        value = sketch.quantile(q)
+        result[f"p{q * 100:g}"] = round(float(value), 4) if value is not None else None
+    return result
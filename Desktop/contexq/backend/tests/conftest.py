@@ -0,0 +1,49 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA_DIR = os.path.join(BACKEND_DIR, "data")
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    """A migrated, empty database."""
+    from schema import migrate
+
+    conn = sqlite3.connect(tmp_path / "test.db")
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def loaded_conn(conn):
+    """A migrated database loaded with the CSVs shipped in data/."""
+    from ingest import load_directory
+
+    load_directory(conn, DATA_DIR)
+    return conn
+
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """The API over its own copy of the shipped data, started through its lifespan hook.
+
+    main reads its settings at import, so it is imported once per session.
+    """
+    directory = tmp_path_factory.mktemp("api")
+    os.environ.update(
+        DATABASE_PATH=str(directory / "business_data.db"),
+        DATA_DIR=DATA_DIR,
+        REPLICAS_ENABLED="0",
+        WEB_CONCURRENCY="1",
+    )
+    from fastapi.testclient import TestClient
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
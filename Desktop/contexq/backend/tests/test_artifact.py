@@ -0,0 +1,24 @@
+import sqlite3
+
+from artifact import artifact_dir, build, is_prebuilt, read_manifest
+from conftest import DATA_DIR
+from schema import migrate
+
+
+def test_prebuilt_only_while_the_database_matches_its_manifest(tmp_path):
+    database = tmp_path / "artifact" / "business_data.db"
+    build(str(database), DATA_DIR, columnar=False)
+    manifest = read_manifest(artifact_dir(str(database)))
+
+    conn = sqlite3.connect(database)
+    assert is_prebuilt(manifest, conn)
+    conn.execute("INSERT INTO customers (customer_id, customer_name) VALUES (-1, 'New')")
+    assert not is_prebuilt(manifest, conn)
+    conn.close()
+
+    # An empty database swapped in next to the old manifest
+    database.unlink()
+    conn = sqlite3.connect(database)
+    migrate(conn)
+    assert not is_prebuilt(manifest, conn)
+    conn.close()
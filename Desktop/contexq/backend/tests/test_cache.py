@@ -0,0 +1,26 @@
+from cache import ResponseCache
+from shared import SharedCache, SharedStore
+
+
+def _bounded_generations(cache, count_generations):
+    stale = cache.generation("a")
+    for key in range(200):
+        cache.invalidate([key])
+    assert count_generations() <= cache.maxsize
+    # A value computed before the generations were dropped is still refused
+    cache.set("a", b"stale", stale)
+    assert cache.get("a") is None
+    cache.set("a", b"fresh", cache.generation("a"))
+    assert cache.get("a").body == b"fresh"
+
+
+def test_response_cache_bounds_its_generations():
+    cache = ResponseCache(maxsize=10)
+    _bounded_generations(cache, lambda: len(cache._generations))
+
+
+def test_shared_cache_bounds_its_generations(tmp_path):
+    store = SharedStore(str(tmp_path / "shared.db"))
+    cache = SharedCache(store, "test", maxsize=10)
+    _bounded_generations(cache, lambda: store.connection().conn.execute(
+        "SELECT COUNT(*) FROM cache_generations WHERE key != '*'").fetchone()[0])
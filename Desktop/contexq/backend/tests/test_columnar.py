@@ -0,0 +1,75 @@
+import os
+import threading
+
+from columnar import ColumnStore
+
+
+def _total(store):
+    return round(sum(row["total_sales"] for row in store.group("sales", [])), 2)
+
+
+def _sale(transaction_id, amount):
+    return {"transaction_id": transaction_id, "customer_id": 1, "product_id": 1, "quantity": 1,
+            "sale_amount": amount, "transaction_date": "2023-01-01"}
+
+
+def test_stores_sharing_a_directory_compact_without_clobbering(loaded_conn, tmp_path):
+    directory = str(tmp_path / "columnar")
+    first, second = ColumnStore(directory, tail_rows=1), ColumnStore(directory, tail_rows=1)
+    first.rebuild(loaded_conn)
+    second.load_or_build(loaded_conn)
+    total = _total(first)
+    assert second.loaded_from_disk and _total(second) == total
+
+    # Both compact their one-row tails at the same version number
+    first.record_sales([_sale(10_001, 5.0)])
+    second.record_sales([_sale(10_002, 7.0)])
+    first.wait_for_compaction()
+    second.wait_for_compaction()
+    first.record_sales([_sale(10_003, 11.0)])
+    first.wait_for_compaction()
+    assert first.version == 3 and second.version == 2
+    assert _total(first) == round(total + 16.0, 2)
+    assert _total(second) == round(total + 7.0, 2)
+    assert not [entry for entry in os.listdir(directory) if entry.endswith(".tmp")]
+
+
+def test_compaction_writes_without_blocking_records_or_queries(loaded_conn, tmp_path, monkeypatch):
+    store = ColumnStore(str(tmp_path / "columnar"), tail_rows=2)
+    store.rebuild(loaded_conn)
+    total = _total(store)
+    writing, release = threading.Event(), threading.Event()
+    write = store._write
+
+    def slow_write(*args):
+        writing.set()
+        assert release.wait(5)
+        return write(*args)
+
+    monkeypatch.setattr(store, "_write", slow_write)
+    store.record_sales([_sale(10_001, 1.0), _sale(10_002, 2.0)])
+    assert writing.wait(5)
+    # The compaction is stuck writing; recording and querying still go through
+    store.record_sales([_sale(10_003, 4.0)])
+    assert _total(store) == round(total + 7.0, 2)
+    release.set()
+    store.wait_for_compaction()
+    assert store.version == 2
+    assert store.stats()["tail_rows"]["sales"] == 1
+    assert _total(store) == round(total + 7.0, 2)
+
+
+def test_rebuild_keeps_rows_recorded_meanwhile_below_the_newest_id(loaded_conn, tmp_path, monkeypatch):
+    store = ColumnStore(str(tmp_path / "columnar"))
+    store.rebuild(loaded_conn)
+    total = _total(store)
+    fingerprint = store._db_fingerprint
+
+    def record_during_rebuild(conn):
+        # Committed after the rebuild's read, with an id below every id it sees
+        store.record_sales([_sale(0, 3.0)])
+        return fingerprint(conn)
+
+    monkeypatch.setattr(store, "_db_fingerprint", record_during_rebuild)
+    store.rebuild(loaded_conn)
+    assert _total(store) == round(total + 3.0, 2)
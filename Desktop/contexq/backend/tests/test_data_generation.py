@@ -0,0 +1,19 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+GENERATOR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                         "data_generation.py")
+
+
+def test_sqlite_output_counts_product_totals(tmp_path):
+    output = tmp_path / "generated.db"
+    subprocess.run([sys.executable, GENERATOR, "--transactions", "2000", "--tickets", "500", "--customers", "50",
+                    "--products", "20", "--suppliers", "10", "--format", "sqlite", "--output", str(output)],
+                   check=True, capture_output=True)
+    conn = sqlite3.connect(output)
+    expected = dict(conn.execute("SELECT product_id, SUM(sale_amount) FROM sales GROUP BY product_id"))
+    stored = dict(conn.execute("SELECT product_id, total_sales FROM product_stats WHERE total_sales > 0"))
+    assert stored.keys() == expected.keys()
+    assert all(abs(stored[product_id] - total) < 1e-6 for product_id, total in expected.items())
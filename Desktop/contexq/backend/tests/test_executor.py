@@ -0,0 +1,41 @@
+import asyncio
+import threading
+
+import pytest
+
+from db import ConnectionPool
+from executor import ConcurrencyLimitExceeded, DBExecutor, QueryTimeout
+
+
+@pytest.fixture
+def executor(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "executor.db"), max_size=1)
+    executor = DBExecutor(pool, lanes={"analytics": 2}, timeouts={"analytics": 0.2})
+    yield executor
+    executor.shutdown()
+    pool.close()
+
+
+def test_slot_is_held_until_a_timed_out_job_finishes(executor):
+    release = threading.Event()
+
+    async def scenario():
+        with pytest.raises(QueryTimeout):
+            await executor.run("analytics", release.wait, (5,), limit_key="slow", limit=1, connection=False)
+        # The first job is still running, so its slot is still taken
+        with pytest.raises(ConcurrencyLimitExceeded):
+            await executor.run("analytics", lambda: None, limit_key="slow", limit=1)
+        release.set()
+        await asyncio.sleep(0.05)
+        return await executor.run("analytics", lambda: "done", limit_key="slow", limit=1)
+
+    assert asyncio.run(scenario()) == "done"
+
+
+def test_in_memory_jobs_leave_the_pool_alone(executor):
+    async def scenario():
+        # The pool's only connection is checked out meanwhile, so a job that needs one would time out
+        with executor.pool.connection():
+            return await executor.run("analytics", lambda: "from memory", connection=False)
+
+    assert asyncio.run(scenario()) == "from memory"
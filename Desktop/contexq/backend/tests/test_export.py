@@ -0,0 +1,40 @@
+import builtins
+
+import pytest
+
+import export
+from export import ExportError, export_stream
+
+
+def test_missing_zstandard_does_not_open_a_connection(monkeypatch):
+    real_import = builtins.__import__
+
+    def no_zstandard(name, *args, **kwargs):
+        if name == "zstandard":
+            raise ImportError(name)
+        return real_import(name, *args, **kwargs)
+
+    opened = []
+    monkeypatch.setattr(builtins, "__import__", no_zstandard)
+    monkeypatch.setattr(export, "connect_readonly", lambda path: opened.append(path))
+    with pytest.raises(ExportError):
+        export_stream("unused.db", "sales", "ndjson", ["transaction_id"], compression="zstd")
+    assert opened == []
+
+
+def test_export_slots_are_released(client, monkeypatch):
+    import main
+
+    assert client.get("/export/sales?compression=brotli").status_code == 400
+    assert main.active_exports == 0
+    response = client.get("/export/products?format=csv")
+    assert response.status_code == 200 and response.text.startswith("product_id")
+    assert main.active_exports == 0
+
+    monkeypatch.setattr(main, "EXPORT_MAX_CONCURRENT", 1)
+    assert main.reserve_export()
+    try:
+        assert client.get("/export/products").status_code == 503
+    finally:
+        main.release_export()
+    assert main.active_exports == 0
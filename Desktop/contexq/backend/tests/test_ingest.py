@@ -0,0 +1,32 @@
+import pytest
+
+from ingest import ingest_csv
+from conftest import DATA_DIR
+
+
+def _indexes(conn, table):
+    return {name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,))}
+
+
+def test_failed_load_of_empty_table_keeps_its_indexes(conn):
+    ingest_csv(conn, "customers", f"{DATA_DIR}/customers.csv")
+    ingest_csv(conn, "products", f"{DATA_DIR}/products.csv")
+    indexes = _indexes(conn, "sales")
+    assert indexes
+    chunks = []
+
+    def fail_on_third_chunk(rows):
+        chunks.append(rows)
+        if len(chunks) == 3:
+            raise RuntimeError("load interrupted")
+
+    with pytest.raises(RuntimeError):
+        ingest_csv(conn, "sales", f"{DATA_DIR}/sales_transactions.csv", chunk_rows=100, commit_rows=100,
+                   on_chunk=fail_on_third_chunk)
+    assert _indexes(conn, "sales") == indexes
+    assert conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] == 0
+
+    stats = ingest_csv(conn, "sales", f"{DATA_DIR}/sales_transactions.csv", chunk_rows=100, commit_rows=100)
+    assert stats["inserted"] == conn.execute("SELECT COUNT(*) FROM sales").fetchone()[0] > 0
+    assert _indexes(conn, "sales") == indexes
@@ -0,0 +1,59 @@
+import base64
+import json
+
+import pytest
+
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_condition
+
+
+def _cursor(value):
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def test_cursor_round_trip():
+    values = ["2023-01-05", 42]
+    assert decode_cursor(encode_cursor(values), ["transaction_date", "transaction_id"]) == values
+    assert decode_cursor(encode_cursor([None, 7]), ["a", "b"]) == [None, 7]
+
+
+@pytest.mark.parametrize("cursor", ["!!!", _cursor({"a": 1}), _cursor([1, 2, 3]), _cursor([[]]),
+                                    _cursor([{"a": 1}, 2]), "W1tdXQ"])
+def test_invalid_cursors_are_rejected(cursor):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor, ["a", "b"])
+
+
+def test_keyset_condition_directions():
+    assert keyset_condition(["id"], [5]) == ("id > :after_id", {"after_id": 5})
+    assert keyset_condition(["id"], [5], descending=True) == ("id < :after_id", {"after_id": 5})
+    condition, params = keyset_condition(["day", "id"], [None, 3])
+    assert "day IS NOT NULL" in condition and params == {"after_id": 3}
+
+
+def _walk(client, url):
+    ids, cursor = [], None
+    while True:
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        ids.extend(response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return ids
+
+
+def test_cursor_pages_cover_every_row_once(client):
+    rows = _walk(client, "/sales?limit=97")
+    assert len(rows) == len({row["transaction_id"] for row in rows}) == 1000
+    keys = [(row["transaction_date"] or "", row["transaction_id"]) for row in rows]
+    assert keys == sorted(keys)
+
+
+@pytest.mark.parametrize("url", ["/customers?limit=0", "/customers?limit=-1", "/sales?limit=0",
+                                 "/products?offset=-1", "/suppliers?limit=100000"])
+def test_out_of_range_limits_are_rejected(client, url):
+    assert client.get(url).status_code == 422
+
+
+def test_bad_cursor_is_a_400(client):
+    assert client.get("/sales?cursor=W1tdXQ").status_code == 400
+    assert client.get("/sales?cursor=" + _cursor(["2023-01-01", [1]])).status_code == 400
@@ -0,0 +1,29 @@
+import logging
+
+import product_stats
+
+STATS = "SELECT * FROM product_stats ORDER BY product_id"
+ISSUES = "SELECT * FROM product_issue_counts ORDER BY product_id, issue_type"
+
+
+def _rounded(rows):
+    return [tuple(round(value, 6) if isinstance(value, float) else value for value in row) for row in rows]
+
+
+def test_incremental_counts_match_a_full_refresh(loaded_conn):
+    # loaded_conn was filled chunk by chunk through record()
+    counted = _rounded(loaded_conn.execute(STATS).fetchall()), loaded_conn.execute(ISSUES).fetchall()
+    assert any(row[2] for row in counted[0])
+    product_stats.refresh(loaded_conn)
+    assert (_rounded(loaded_conn.execute(STATS).fetchall()), loaded_conn.execute(ISSUES).fetchall()) == counted
+
+
+def test_rows_of_unknown_products_are_logged(conn, caplog):
+    columns = ["transaction_id", "customer_id", "product_id", "quantity", "sale_amount", "transaction_date"]
+    conn.execute("INSERT INTO products (product_id, product_name, cost_price) VALUES (1, 'Widget', 2.0)")
+    product_stats.record(conn, "products", ["product_id"], [(1,)])
+    with caplog.at_level(logging.WARNING, logger="product_stats"):
+        product_stats.record(conn, "sales", columns, [(1, 1, 1, 3, 10.0, "2024-01-01"),
+                                                       (2, 1, 99, 1, 5.0, "2024-01-01")])
+    assert "1 sales product ids" in caplog.text
+    assert conn.execute("SELECT total_sales, profit FROM product_stats").fetchall() == [(10.0, 4.0)]
@@ -0,0 +1,36 @@
+import random
+import sqlite3
+
+import pytest
+
+from recommender import CoPurchaseRecommender
+
+
+def test_limit_is_validated(client):
+    import main
+
+    for limit in (0, -1, main.recommender.top_k + 1):
+        assert client.get(f"/recommendations/1?limit={limit}").status_code == 422
+
+
+def test_limit_caps_the_results(client):
+    response = client.get("/recommendations/1?limit=3")
+    assert response.status_code == 200 and len(response.json()) <= 3
+
+
+@pytest.mark.parametrize("window_days", [0, 7])
+def test_rebuild_matches_recorded_sales(window_days):
+    rng = random.Random(3)
+    dates = ["2024-01-01", "2024-01-09 12:00:00", "2024-02-20", "1969-12-30", "", None]
+    sales = [{"customer_id": rng.randrange(20), "product_id": rng.randrange(15), "transaction_date": rng.choice(dates)}
+             for _ in range(400)]
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE products (product_id, product_name)")
+    conn.execute("CREATE TABLE sales (customer_id, product_id, transaction_date)")
+    conn.executemany("INSERT INTO sales VALUES (:customer_id, :product_id, :transaction_date)", sales)
+    built, recorded = CoPurchaseRecommender(window_days=window_days), CoPurchaseRecommender(window_days=window_days)
+    built.rebuild(conn)
+    recorded.record_sales(sales)
+    built, recorded = built.state(), recorded.state()
+    for key in ("popularity", "counts", "top", "baskets"):
+        assert built[key] == recorded[key], key
@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND_DIR
+
+
+@pytest.mark.parametrize("workers, enabled", [("1", "True"), ("4", "False")])
+def test_replicas_default_off_with_several_workers(tmp_path, workers, enabled):
+    env = {key: value for key, value in os.environ.items() if key != "REPLICAS_ENABLED"}
+    env.update(DATABASE_PATH=str(tmp_path / "business_data.db"), WEB_CONCURRENCY=workers)
+    result = subprocess.run([sys.executable, "-c", "import main; print(main.replicas is not None)"],
+                            cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True)
+    assert result.stdout.strip() == enabled
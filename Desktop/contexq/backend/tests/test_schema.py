@@ -0,0 +1,46 @@
+import logging
+import os
+import sqlite3
+
+import pandas as pd
+
+from conftest import DATA_DIR
+from ingest import SOURCES
+from schema import SCHEMA_VERSION, check_query_plans, migrate, schema_version, verify_query_plans
+
+
+def test_migrates_the_baseline_schema(tmp_path):
+    # The first release created the tables with pandas.to_sql: no keys, no indexes, version 0
+    conn = sqlite3.connect(tmp_path / "baseline.db")
+    counts = {}
+    for table, source in SOURCES.items():
+        frame = pd.read_csv(os.path.join(DATA_DIR, source["file"]))
+        frame.to_sql(table, conn, index=False, if_exists="replace")
+        counts[table] = len(frame)
+    assert schema_version(conn) == 0
+
+    assert migrate(conn) == list(range(1, SCHEMA_VERSION + 1))
+    assert schema_version(conn) == SCHEMA_VERSION
+    for table, count in counts.items():
+        assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == count
+    expected = dict(conn.execute("SELECT product_id, SUM(sale_amount) FROM sales GROUP BY product_id"))
+    stored = dict(conn.execute("SELECT product_id, total_sales FROM product_stats WHERE total_sales > 0"))
+    assert stored.keys() == expected.keys()
+    assert check_query_plans(conn) == []
+    assert migrate(conn) == []
+
+
+def test_scans_are_logged_not_raised(loaded_conn, caplog):
+    queries = {"sales_by_amount": ("SELECT * FROM sales WHERE sale_amount > ?", (100,))}
+    with caplog.at_level(logging.WARNING, logger="schema"):
+        violations = verify_query_plans(loaded_conn, queries)
+    assert [name for name, _ in violations] == ["sales_by_amount"]
+    assert "sales_by_amount" in caplog.text
+
+
+def test_only_partitions_may_be_scanned_when_small(conn):
+    # An analyzed table smaller than SMALL_TABLE_ROWS is still reported unless it is a partition
+    conn.execute("INSERT INTO products (product_id, product_name) VALUES (1, 'Widget')")
+    conn.execute("ANALYZE")
+    queries = {"products_by_name": ("SELECT * FROM products WHERE product_name = ?", ("Widget",))}
+    assert [name for name, _ in check_query_plans(conn, queries)] == ["products_by_name"]
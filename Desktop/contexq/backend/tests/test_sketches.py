@@ -0,0 +1,72 @@
+import math
+import random
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from sketches import LogMapping, QuantileSketch, TicketSketches
+
+QUANTILES = [0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99, 1]
+
+
+def _values(n=20_000, seed=7):
+    rng = random.Random(seed)
+    values = [rng.lognormvariate(0, 2) for _ in range(n)]
+    values += [-rng.lognormvariate(1, 1) for _ in range(n // 4)]
+    values += [0.0] * (n // 20)
+    rng.shuffle(values)
+    return values
+
+
+def _assert_within(sketch, values, alpha):
+    ordered = sorted(values)
+    for q in QUANTILES:
+        exact = ordered[math.floor(q * (len(ordered) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= alpha * abs(exact) + 1e-12, q
+
+
+@pytest.mark.parametrize("alpha", [0.05, 0.01])
+def test_quantiles_stay_within_the_relative_error(alpha):
+    values = _values()
+    added, extended = QuantileSketch(LogMapping(alpha)), QuantileSketch(LogMapping(alpha))
+    for value in values:
+        added.add(value)
+    extended.extend(Counter(values))
+    _assert_within(added, values, alpha)
+    _assert_within(extended, values, alpha)
+
+
+def test_merged_sketch_equals_one_built_from_all_values():
+    mapping, values = LogMapping(0.01), _values()
+    whole, left, right = (QuantileSketch(mapping) for _ in range(3))
+    for value in values:
+        whole.add(value)
+    for value in values[:len(values) // 3]:
+        left.add(value)
+    for value in values[len(values) // 3:]:
+        right.add(value)
+    left.merge(right)
+    assert left.state() == whole.state()
+    _assert_within(left, values, 0.01)
+
+
+def test_empty_sketch_has_no_quantiles():
+    assert QuantileSketch(LogMapping(0.01)).quantile(0.5) is None
+
+
+def test_rebuild_and_recorded_tickets_share_cells():
+    tickets = [
+        {"issue_type": "Billing", "product_id": 1, "creation_date": "2024-01-05",
+         "resolution_date": "2024-01-08", "sentiment_score": 0.4},
+        {"issue_type": "Billing", "product_id": 1, "creation_date": "",
+         "resolution_date": "", "sentiment_score": -0.2},
+    ]
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE tickets (issue_type, product_id, creation_date, resolution_date, sentiment_score)")
+    conn.executemany("INSERT INTO tickets VALUES (:issue_type, :product_id, :creation_date, :resolution_date, "
+                     ":sentiment_score)", tickets)
+    built, recorded = TicketSketches(), TicketSketches()
+    built.rebuild(conn)
+    recorded.record_tickets(tickets)
+    assert built.state()["cells"] == recorded.state()["cells"]
@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+from writer import BatchWriter
+
+
+def _sale(transaction_id, customer_id=1, product_id=1):
+    return {"transaction_id": transaction_id, "customer_id": customer_id, "product_id": product_id,
+            "quantity": 2, "sale_amount": 20.0, "transaction_date": "2024-01-01"}
+
+
+@pytest.fixture
+def writer(loaded_conn):
+    database = loaded_conn.execute("PRAGMA database_list").fetchone()[2]
+    loaded_conn.commit()
+    committed = []
+    writer = BatchWriter(database, max_delay=0.2, on_commit=lambda table, rows: committed.extend(rows))
+    writer.committed = committed
+    yield writer
+    writer.close()
+
+
+def test_duplicates_are_reported_not_overwritten(writer, loaded_conn):
+    existing = loaded_conn.execute("SELECT MIN(transaction_id) FROM sales").fetchone()[0]
+    result = writer.submit("sales", [_sale(10**9), _sale(existing), _sale(10**9)]).result(timeout=5)
+    assert result == {"inserted": 1, "duplicates": [existing, 10**9]}
+    assert [row["transaction_id"] for row in writer.committed] == [10**9]
+
+
+def test_a_bad_request_fails_alone(writer, loaded_conn):
+    # Both land in the same transaction; only the one naming an unknown customer is rolled back
+    good = writer.submit("sales", [_sale(10**9 + 1)])
+    bad = writer.submit("sales", [_sale(10**9 + 2), _sale(10**9 + 3, customer_id=-1)])
+    assert good.result(timeout=5) == {"inserted": 1, "duplicates": []}
+    with pytest.raises(sqlite3.IntegrityError):
+        bad.result(timeout=5)
+    ids = [id_ for (id_,) in loaded_conn.execute("SELECT transaction_id FROM sales WHERE transaction_id > ?",
+                                                 (10**9,))]
+    assert ids == [10**9 + 1]
+    assert writer.stats()["transactions"] == 1 and writer.stats()["failed_requests"] == 1
+
+
+def test_api_rejects_unknown_references(client):
+    response = client.post("/sales", json=[_sale(10**9 + 4, customer_id=10**9)])
+    assert response.status_code == 400
+    assert "FOREIGN KEY" in response.json()["detail"]
+
+
+def test_writer_survives_errors_outside_sqlite(writer, loaded_conn):
+    # sqlite3 cannot bind an int past 64 bits and raises OverflowError instead of sqlite3.Error
+    with pytest.raises(OverflowError):
+        writer.submit("sales", [_sale(2**70)]).result(timeout=5)
+    assert writer.submit("sales", [_sale(10**9 + 5)]).result(timeout=5) == {"inserted": 1, "duplicates": []}
+    assert writer.stats()["running"]
+
+
+def test_api_rejects_oversized_ints_and_keeps_writing(client):
+    assert client.post("/sales", json=[_sale(2**70)]).status_code == 422
+    assert client.post("/sales", json=[_sale(10**9 + 6, customer_id=2**64)]).status_code == 422
+    response = client.post("/sales", json=[_sale(10**9 + 7)])
+    assert response.status_code == 201 and response.json()["inserted"] == 1
+
+
+@pytest.mark.parametrize("value", ["20240115", "2024-W03-1", "2024-1-15", "2024-02-30"])
+def test_api_rejects_dates_not_stored_as_yyyy_mm_dd(client, value):
+    sale = dict(_sale(10**9 + 8), transaction_date=value)
+    assert client.post("/sales", json=[sale]).status_code == 422
+
+
+def test_caches_are_invalidated_when_a_rollup_fails(client, monkeypatch):
+    import main
+
+    client.get("/customers/1")
+    assert main.customer_summaries.get(1) is not None
+
+    def broken(rows):
+        raise RuntimeError("rollup failed")
+
+    monkeypatch.setattr(main.dashboard, "record_sales", broken)
+    assert client.post("/sales", json=[_sale(10**9 + 9)]).status_code == 201
+    assert main.customer_summaries.get(1) is None
@@ -0,0 +1,283 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from partitions import partition_source, route
+from product_stats import record as record_product_stats
+
+logger = logging.getLogger(__name__)
+
+# Insert layout per writable table: key column and column order
+WRITABLE = {
+    "sales": ("transaction_id", ["transaction_id", "customer_id", "product_id", "quantity",
+                                 "sale_amount", "transaction_date"]),
+    "tickets": ("ticket_id", ["ticket_id", "customer_id", "product_id", "issue_type", "status",
+                              "creation_date", "resolution_date", "sentiment_score"]),
+}
+
+
+class WriterBusy(Exception):
+    """Raised when the write queue is full; the client should retry later."""
+
+
+class WriterClosed(Exception):
+    """Raised when rows are submitted after the writer has shut down."""
+
+
+class _Request:
+    __slots__ = ("table", "rows", "future", "queued_at")
+
+    def __init__(self, table, rows):
+        self.table = table
+        self.rows = rows
+        self.future = Future()
+        self.queued_at = time.monotonic()
+
+
+class BatchWriter:
+    """Single writer thread that group-commits queued inserts.
+
+    Requests are queued and the writer drains as many as fit in
+    ``max_batch_rows`` (waiting at most ``max_delay`` seconds for more to
+    arrive) into one transaction, so concurrent clients never contend for the
+    SQLite write lock and each fsync is shared by the whole group. A request's
+    future resolves only after its transaction committed with
+    ``synchronous=FULL``, i.e. once the rows are durable. Each request runs in
+    its own savepoint, so one bad request (e.g. one referencing a customer
+    or product that does not exist) fails alone. ``on_commit(table,
+    rows)`` is called with the rows actually inserted. With ``journal`` the
+    inserted rows are also appended to ``change_log`` in the same
+    transaction, for the other worker processes to pick up.
+    """
+
+    def __init__(self, database_path, max_queue_rows=200_000, max_batch_rows=50_000, max_delay=0.005,
+                 synchronous="FULL", on_commit=None, journal=False):
+        self.database_path = database_path
+        self.max_queue_rows = max_queue_rows
+        self.max_batch_rows = max_batch_rows
+        self.max_delay = max_delay
+        self.synchronous = synchronous
+        self.on_commit = on_commit
+        self.journal = journal
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._queued_rows = 0
+        self._closed = False
+        self._thread = None
+        # (commit time, rows) of recent commits, for the sustained rate
+        self._recent = deque()
+
+        self._stats = {
+            "requests": 0,
+            "rows_submitted": 0,
+            "rows_inserted": 0,
+            "duplicates": 0,
+            "failed_requests": 0,
+            "rejected_requests": 0,
+            "transactions": 0,
+            "commit_time_total": 0.0,
+            "commit_time_max": 0.0,
+            "queue_wait_max": 0.0,
+        }
+
+    @classmethod
+    def from_env(cls, database_path, on_commit=None, journal=False):
+        return cls(
+            database_path,
+            max_queue_rows=int(os.getenv("WRITER_MAX_QUEUE_ROWS", 200_000)),
+            max_batch_rows=int(os.getenv("WRITER_MAX_BATCH_ROWS", 50_000)),
+            max_delay=float(os.getenv("WRITER_MAX_DELAY", 0.005)),
+            synchronous=os.getenv("WRITER_SYNCHRONOUS", "FULL").upper(),
+            on_commit=on_commit,
+            journal=journal,
+        )
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._closed = False
+                self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, table, rows):
+        """Queue ``rows`` (dicts) for ``table``; returns a Future of the insert result."""
+        if table not in WRITABLE:
+            raise ValueError(f"{table} is not writable")
+        with self._lock:
+            if self._closed:
+                raise WriterClosed("writer is shut down")
+            if self._queued_rows and self._queued_rows + len(rows) > self.max_queue_rows:
+                self._stats["rejected_requests"] += 1
+                raise WriterBusy(f"write queue is full ({self._queued_rows} rows pending)")
+            self._queued_rows += len(rows)
+            self._stats["requests"] += 1
+            self._stats["rows_submitted"] += len(rows)
+        if self._thread is None:
+            self.start()
+        request = _Request(table, rows)
+        self._queue.put(request)
+        return request.future
+
+    def close(self, timeout=30.0):
+        """Stop accepting rows, commit everything already queued and stop the thread."""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is not None:
+            self._queue.put(None)
+            thread.join(timeout)
+            with self._lock:
+                self._thread = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database_path, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA busy_timeout=30000")
+        # Rows naming a customer or product that does not exist fail their request
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def _run(self):
+        conn = self._connect()
+        try:
+            stopping = False
+            while not stopping:
+                first = self._queue.get()
+                if first is None:
+                    break
+                batch, rows = [first], len(first.rows)
+                deadline = time.monotonic() + self.max_delay
+                while rows < self.max_batch_rows:
+                    try:
+                        request = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        stopping = True
+                        break
+                    batch.append(request)
+                    rows += len(request.rows)
+                try:
+                    self._commit(conn, batch)
+                except Exception as exc:
+                    # Nothing may stop this thread: every later write would wait on it forever
+                    logger.exception("writer: batch of %d requests failed", len(batch))
+                    self._fail(batch, exc)
+        finally:
+            conn.close()
+
+    def _fail(self, batch, exc):
+        for request in batch:
+            if not request.future.done():
+                request.future.set_exception(exc)
+
+    def _commit(self, conn, batch):
+        started = time.monotonic()
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for request in batch:
+                conn.execute("SAVEPOINT request")
+                try:
+                    results.append((request, self._insert(conn, request.table, request.rows)))
+                    conn.execute("RELEASE request")
+                except Exception as exc:
+                    # e.g. an integer too large for SQLite raises OverflowError, not sqlite3.Error
+                    conn.execute("ROLLBACK TO request")
+                    conn.execute("RELEASE request")
+                    results.append((request, exc))
+            conn.execute("COMMIT")
+        except Exception as exc:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.exception("writer: transaction of %d requests failed", len(batch))
+            results = [(request, exc) for request in batch]
+
+        elapsed = time.monotonic() - started
+        inserted_total = 0
+        with self._lock:
+            self._stats["transactions"] += 1
+            self._stats["commit_time_total"] += elapsed
+            self._stats["commit_time_max"] = max(self._stats["commit_time_max"], elapsed)
+            for request, result in results:
+                self._queued_rows -= len(request.rows)
+                self._stats["queue_wait_max"] = max(self._stats["queue_wait_max"], started - request.queued_at)
+                if isinstance(result, Exception):
+                    self._stats["failed_requests"] += 1
+                else:
+                    inserted_total += len(result["inserted_rows"])
+                    self._stats["rows_inserted"] += len(result["inserted_rows"])
+                    self._stats["duplicates"] += len(result["duplicates"])
+            now = time.monotonic()
+            self._recent.append((now, inserted_total))
+            while self._recent and self._recent[0][0] < now - 60:
+                self._recent.popleft()
+
+        for request, result in results:
+            if isinstance(result, Exception):
+                request.future.set_exception(result)
+                continue
+            if self.on_commit is not None and result["inserted_rows"]:
+                try:
+                    self.on_commit(request.table, result["inserted_rows"])
+                except Exception:
+                    logger.exception("writer: on_commit hook failed for %s", request.table)
+            request.future.set_result({"inserted": len(result["inserted_rows"]),
+                                       "duplicates": result["duplicates"]})
+
+    def _insert(self, conn, table, rows):
+        key, columns = WRITABLE[table]
+        ids = [row[key] for row in rows]
+        where = f"{key} IN (SELECT value FROM json_each(:ids))"
+        source, _ = partition_source(conn, table, where=where)
+        existing = {id_ for (id_,) in conn.execute(
+            f"SELECT {key} FROM {source} WHERE {where}", {"ids": json.dumps(ids)})}
+        new_rows, duplicates = [], []
+        for row in rows:
+            if row[key] in existing:
+                duplicates.append(row[key])
+            else:
+                existing.add(row[key])
+                new_rows.append(row)
+        values = [tuple(row[column] for column in columns) for row in new_rows]
+        # A partitioned table is a view; each month's rows go straight to its partition
+        for target, target_rows in route(conn, table, columns, values).items():
+            conn.executemany(
+                f"INSERT INTO {target} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                target_rows)
+        record_product_stats(conn, table, columns, values)
+        if self.journal and new_rows:
+            conn.execute("INSERT INTO change_log (pid, topic, payload, created_at) VALUES (?, ?, ?, ?)",
+                         (os.getpid(), table, json.dumps(new_rows), time.time()))
+        return {"inserted_rows": new_rows, "duplicates": duplicates}
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            now = time.monotonic()
+            window = [(at, rows) for at, rows in self._recent if at >= now - 60]
+            stats.update(
+                running=self._thread is not None and self._thread.is_alive(),
+                queued_rows=self._queued_rows,
+                max_queue_rows=self.max_queue_rows,
+                queue_utilization=round(self._queued_rows / self.max_queue_rows, 3),
+                max_batch_rows=self.max_batch_rows,
+                synchronous=self.synchronous,
+            )
+        transactions = stats["transactions"]
+        stats["rows_per_transaction"] = round(stats["rows_inserted"] / transactions, 1) if transactions else 0
+        stats["commit_time_avg"] = round(stats["commit_time_total"] / transactions, 6) if transactions else 0
+        if window:
+            span = max(now - window[0][0], 1.0)
+            stats["rows_per_sec_1m"] = round(sum(rows for _, rows in window) / span, 1)
+        else:
+            stats["rows_per_sec_1m"] = 0.0
+        return stats
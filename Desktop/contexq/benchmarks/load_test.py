@@ -0,0 +1,337 @@
+# benchmarks/load_test.py
+# Load-test harness for the API: seeds databases at several scales, drives
+# every endpoint with a weighted concurrency mix (in-process through ASGI
+# and over real HTTP against uvicorn) and reports p50/p95/p99 latency,
+# throughput and peak RSS as JSON that can be compared between runs.
+#
+#   python benchmarks/load_test.py seed --scales 1k,1m
+#   python benchmarks/load_test.py run --scales 1k --modes inprocess,http --out results/today.json
+#   python benchmarks/load_test.py compare results/baseline.json results/today.json --threshold 0.15
+#
+# Requires httpx (and uvicorn for the http mode).
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import sqlite3
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BACKEND_DIR = os.path.join(ROOT_DIR, 'backend')
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.data')
+
+# Sales rows per scale; the other tables grow in the generator's default proportions
+SCALES = {
+    '1k': 1_000,
+    '1m': 1_000_000,
+    '10m': 10_000_000,
+}
+
+ENDPOINTS = {
+    '/customers': '/customers?limit=100',
+    '/products': '/products?limit=50',
+    '/sales': '/sales?limit=100',
+    '/tickets': '/tickets?limit=100',
+    '/suppliers': '/suppliers?limit=50',
+    '/customers/{id}': '/customers/{customer_id}',
+    '/products/{id}': '/products/{product_id}',
+    '/recommendations/{id}': '/recommendations/{product_id}',
+    '/dashboard/stats': '/dashboard/stats',
+}
+
+# Relative request weights per endpoint
+MIXES = {
+    'browse': {
+        '/customers': 10, '/products': 10, '/sales': 10, '/tickets': 5, '/suppliers': 5,
+        '/customers/{id}': 25, '/products/{id}': 15, '/recommendations/{id}': 10, '/dashboard/stats': 10,
+    },
+    'lookups': {'/customers/{id}': 50, '/products/{id}': 30, '/recommendations/{id}': 20},
+    'analytics': {'/dashboard/stats': 40, '/recommendations/{id}': 30, '/products/{id}': 20, '/customers/{id}': 10},
+    'all': {name: 1 for name in ENDPOINTS},
+}
+
+
+def database_path(scale):
+    return os.path.join(DATA_DIR, f'business_{scale}.db')
+
+
+def seed(scales, workers):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    for scale in scales:
+        path = database_path(scale)
+        if os.path.exists(path):
+            print(f"{scale}: {path} already exists")
+            continue
+        factor = SCALES[scale] / 1000
+        print(f"{scale}: generating {SCALES[scale]:,} sales rows into {path}")
+        subprocess.run([
+            sys.executable, os.path.join(ROOT_DIR, 'data_generation.py'),
+            '--scale', str(factor), '--products', str(max(30, int(30 * factor ** 0.5))),
+            '--format', 'sqlite', '--output', path, '--workers', str(workers),
+        ], check=True)
+
+
+def id_ranges(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            'customer_id': conn.execute("SELECT MAX(customer_id) FROM customers").fetchone()[0],
+            'product_id': conn.execute("SELECT MAX(product_id) FROM products").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+async def drive(client, mix, duration, concurrency, ranges, seed_value=0):
+    """Issue requests from ``concurrency`` workers for ``duration`` seconds."""
+    names = list(MIXES[mix])
+    weights = [MIXES[mix][name] for name in names]
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    deadline = time.perf_counter() + duration
+
+    async def worker(index):
+        rng = random.Random(seed_value + index)
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            url = ENDPOINTS[name].format(
+                customer_id=rng.randint(1, ranges['customer_id']),
+                product_id=rng.randint(1, ranges['product_id']),
+            )
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                ok = response.status_code < 500
+            except Exception:
+                ok = False
+            latencies[name].append(time.perf_counter() - started)
+            if not ok:
+                errors[name] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def summarize(latencies, errors, elapsed):
+    def stats(values, failed):
+        values = np.asarray(values) * 1000
+        return {
+            'requests': int(len(values)),
+            'errors': int(failed),
+            'throughput_rps': round(len(values) / elapsed, 1),
+            'p50_ms': round(float(np.percentile(values, 50)), 3) if len(values) else None,
+            'p95_ms': round(float(np.percentile(values, 95)), 3) if len(values) else None,
+            'p99_ms': round(float(np.percentile(values, 99)), 3) if len(values) else None,
+        }
+
+    everything = [value for values in latencies.values() for value in values]
+    return {
+        'overall': stats(everything, sum(errors.values())),
+        'endpoints': {name: stats(values, errors[name]) for name, values in sorted(latencies.items())},
+    }
+
+
+def run_inprocess(path, mix, duration, concurrency, warmup):
+    """Drive the app through ASGI inside this process (called in a fresh interpreter)."""
+    import httpx
+
+    os.environ['DATABASE_PATH'] = path
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+
+    async def go():
+        # ASGITransport sends no lifespan events, so run the app's startup and shutdown here
+        transport = httpx.ASGITransport(app=main.app)
+        async with main.app.router.lifespan_context(main.app), \
+                httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            ranges = id_ranges(path)
+            await drive(client, mix, warmup, concurrency, ranges, seed_value=1000)
+            return await drive(client, mix, duration, concurrency, ranges)
+
+    latencies, errors, elapsed = asyncio.run(go())
+    result = summarize(latencies, errors, elapsed)
+    # ru_maxrss is reported in KiB on Linux
+    result['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return result
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _peak_rss_mb(pid):
+    try:
+        with open(f'/proc/{pid}/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def run_http(path, mix, duration, concurrency, warmup):
+    """Drive a uvicorn server over real HTTP."""
+    import httpx
+
+    port = _free_port()
+    env = dict(os.environ, DATABASE_PATH=path)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env)
+    try:
+        base_url = f'http://127.0.0.1:{port}'
+        for _ in range(600):
+            try:
+                httpx.get(f'{base_url}/health/db', timeout=1.0)
+                break
+            except httpx.HTTPError:
+                if server.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                time.sleep(0.5)
+
+        async def go():
+            limits = httpx.Limits(max_connections=concurrency)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60.0) as client:
+                ranges = id_ranges(path)
+                await drive(client, mix, warmup, concurrency, ranges, seed_value=1000)
+                return await drive(client, mix, duration, concurrency, ranges)
+
+        latencies, errors, elapsed = asyncio.run(go())
+        result = summarize(latencies, errors, elapsed)
+        result['peak_rss_mb'] = _peak_rss_mb(server.pid)
+        return result
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def run(args):
+    results = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'mix': args.mix,
+        'duration': args.duration,
+        'concurrency': args.concurrency,
+        'runs': {},
+    }
+    for scale in args.scales.split(','):
+        path = database_path(scale)
+        if not os.path.exists(path):
+            seed([scale], args.workers)
+        for mode in args.modes.split(','):
+            print(f"{scale} / {mode}: {args.mix} mix, {args.concurrency} concurrent for {args.duration}s")
+            if mode == 'inprocess':
+                # A fresh interpreter per run, so the app binds this scale's database
+                output = subprocess.run([
+                    sys.executable, __file__, '_inprocess', path, args.mix,
+                    str(args.duration), str(args.concurrency), str(args.warmup),
+                ], check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+            else:
+                result = run_http(path, args.mix, args.duration, args.concurrency, args.warmup)
+            overall = result['overall']
+            print(f"  {overall['throughput_rps']} req/s  p50 {overall['p50_ms']} ms  p95 {overall['p95_ms']} ms  "
+                  f"p99 {overall['p99_ms']} ms  peak RSS {result['peak_rss_mb']} MB")
+            results['runs'][f'{scale}/{mode}'] = result
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, 'w') as out:
+            json.dump(results, out, indent=2)
+        print(f"Results written to {args.out}")
+    if args.baseline:
+        return 1 if compare(args.baseline, results, args.threshold) else 0
+    return 0
+
+
+def compare(baseline, current, threshold):
+    """Print runs/endpoints whose p95 rose or throughput fell by more than ``threshold``."""
+    if isinstance(baseline, str):
+        with open(baseline) as f:
+            baseline = json.load(f)
+    if isinstance(current, str):
+        with open(current) as f:
+            current = json.load(f)
+
+    regressions = []
+    for run_name, run_result in current['runs'].items():
+        before_run = baseline['runs'].get(run_name)
+        if before_run is None:
+            continue
+        pairs = [('overall', before_run['overall'], run_result['overall'])]
+        pairs += [(name, before_run['endpoints'].get(name), stats)
+                  for name, stats in run_result['endpoints'].items()]
+        for name, before, after in pairs:
+            if not before or not before['p95_ms'] or not after['p95_ms']:
+                continue
+            p95_change = after['p95_ms'] / before['p95_ms'] - 1
+            rps_change = after['throughput_rps'] / before['throughput_rps'] - 1 if before['throughput_rps'] else 0
+            if p95_change > threshold or (name == 'overall' and rps_change < -threshold):
+                regressions.append((run_name, name, p95_change, rps_change))
+
+    for run_name, name, p95_change, rps_change in regressions:
+        print(f"REGRESSION {run_name} {name}: p95 {p95_change:+.0%}, throughput {rps_change:+.0%}")
+    if not regressions:
+        print(f"No regressions above {threshold:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API load test and benchmark harness")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help="generate the benchmark databases")
+    seed_parser.add_argument('--scales', default='1k,1m')
+    seed_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+
+    run_parser = commands.add_parser('run', help="run the load test")
+    run_parser.add_argument('--scales', default='1k')
+    run_parser.add_argument('--modes', default='inprocess,http')
+    run_parser.add_argument('--mix', choices=sorted(MIXES), default='browse')
+    run_parser.add_argument('--duration', type=float, default=10.0)
+    run_parser.add_argument('--warmup', type=float, default=2.0)
+    run_parser.add_argument('--concurrency', type=int, default=16)
+    run_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    run_parser.add_argument('--out')
+    run_parser.add_argument('--baseline', help="earlier results to compare against")
+    run_parser.add_argument('--threshold', type=float, default=0.15)
+
+    compare_parser = commands.add_parser('compare', help="flag regressions between two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.15)
+
+    inprocess_parser = commands.add_parser('_inprocess')
+    inprocess_parser.add_argument('path')
+    inprocess_parser.add_argument('mix')
+    inprocess_parser.add_argument('duration', type=float)
+    inprocess_parser.add_argument('concurrency', type=int)
+    inprocess_parser.add_argument('warmup', type=float)
+
+    args = parser.parse_args()
+    if args.command == 'seed':
+        seed(args.scales.split(','), args.workers)
+    elif args.command == 'run':
+        sys.exit(run(args))
+    elif args.command == 'compare':
+        sys.exit(1 if compare(args.baseline, args.current, args.threshold) else 0)
+    else:
+        result = run_inprocess(args.path, args.mix, args.duration, args.concurrency, args.warmup)
+        print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/serialization.py
+# Compares the old pandas request path (read_sql -> DataFrame -> dicts ->
+# Pydantic) against the direct row path used by the API now.
+#
+# Usage: python benchmarks/serialization.py [--db backend/data/business_data.db] [--repeat 200]
+import argparse
+import json
+import os
+import sys
+import timeit
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+def pandas_customers(main, conn, limit):
+    import pandas as pd
+
+    df = pd.read_sql("SELECT * FROM customers ORDER BY customer_id LIMIT ?", conn, params=(limit,))
+    return [main.Customer(**record).model_dump() for record in df.to_dict('records')]
+
+
+def pandas_sales(main, conn, limit):
+    import pandas as pd
+
+    df = pd.read_sql(
+        "SELECT * FROM sales ORDER BY transaction_date, transaction_id LIMIT ?", conn, params=(limit,))
+    return [main.Sale(**record).model_dump() for record in df.to_dict('records')]
+
+
+def pandas_customer_summary(main, conn, customer_id):
+    import pandas as pd
+
+    customer = pd.read_sql("SELECT * FROM customers WHERE customer_id = ?", conn, params=(customer_id,))
+    sales = pd.read_sql(
+        "SELECT SUM(sale_amount) as total_spent, COUNT(*) as total_transactions FROM sales WHERE customer_id = ?",
+        conn, params=(customer_id,))
+    tickets = pd.read_sql(
+        "SELECT COUNT(*) as open_tickets, AVG(sentiment_score) as avg_sentiment FROM tickets "
+        "WHERE customer_id = ? AND status IN ('Open', 'In Progress')", conn, params=(customer_id,))
+    category = pd.read_sql(
+        "SELECT p.category, COUNT(*) as count FROM sales s JOIN products p ON s.product_id = p.product_id "
+        "WHERE s.customer_id = ? GROUP BY p.category ORDER BY count DESC LIMIT 1", conn, params=(customer_id,))
+    return main.CustomerSummary(
+        customer=main.Customer(**customer.iloc[0].to_dict()),
+        total_spent=sales.iloc[0]['total_spent'] or 0,
+        total_transactions=sales.iloc[0]['total_transactions'] or 0,
+        open_tickets=tickets.iloc[0]['open_tickets'] or 0,
+        avg_sentiment=round(tickets.iloc[0]['avg_sentiment'] or 0, 2),
+        favorite_category=category.iloc[0]['category'] if not category.empty else "N/A",
+    ).model_dump_json()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pandas and direct row serialization")
+    parser.add_argument('--db', default=os.path.join(BACKEND_DIR, 'data', 'business_data.db'))
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--customer-id', type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_PATH'] = os.path.abspath(args.db)
+    sys.path.insert(0, BACKEND_DIR)
+    import main as api
+    api.init_db()
+
+    cases = {
+        '/customers': (
+            lambda conn: pandas_customers(api, conn, args.limit),
+            lambda conn: api.rows_response(api.fetch_all(
+                conn, "SELECT * FROM customers ORDER BY customer_id LIMIT ?", (args.limit,))),
+        ),
+        '/sales': (
+            lambda conn: pandas_sales(api, conn, args.limit),
+            lambda conn: api.rows_response(api.fetch_all(
+                conn, "SELECT * FROM sales ORDER BY transaction_date, transaction_id LIMIT ?", (args.limit,))),
+        ),
+        '/customers/{id}': (
+            lambda conn: pandas_customer_summary(api, conn, args.customer_id),
+            lambda conn: api.build_customer_summary(args.customer_id).model_dump_json(),
+        ),
+    }
+
+    results = {}
+    with api.get_db_connection() as conn:
+        for name, (pandas_path, row_path) in cases.items():
+            timings = {}
+            for label, fn in (('pandas', pandas_path), ('rows', row_path)):
+                fn(conn)  # warm up
+                total = timeit.timeit(lambda: fn(conn), number=args.repeat)
+                timings[label] = total / args.repeat * 1000
+            timings['speedup'] = timings['pandas'] / timings['rows']
+            results[name] = timings
+            print(f"{name:18} pandas {timings['pandas']:8.3f} ms   rows {timings['rows']:8.3f} ms   "
+                  f"x{timings['speedup']:.1f}")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
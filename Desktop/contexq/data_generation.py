@@ -1,169 +1,311 @@
 # data_generation.py
-import pandas as pd
-from faker import Faker
-import random
-from datetime import datetime, timedelta
+# Vectorized synthetic data generator. Every table is built from NumPy arrays
+# with a fixed seed, sales and tickets are produced in independent chunks
+# (optionally across processes), and products follow a Zipfian popularity
+# curve so benchmarks hit realistic hot spots.
+#
+#   python data_generation.py                                  # sample CSVs in backend/data/
+#   python data_generation.py --scale 1000 --format sqlite --output load.db --workers 8
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+import pandas as pd
 
-fake = Faker()
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, 'backend'))
 
-# Configuration
+# Configuration (multiplied by --scale)
 NUM_CUSTOMERS = 100
 NUM_PRODUCTS = 30
 NUM_TRANSACTIONS = 1000
 NUM_TICKETS = 500
 NUM_SUPPLIERS = 15
 
+INDUSTRIES = np.array(['Technology', 'Finance', 'Healthcare', 'Retail', 'Manufacturing', 'Education'])
+REGIONS = np.array(['North America', 'Europe', 'Asia', 'South America', 'Africa', 'Oceania'])
+CATEGORIES = np.array(['Electronics', 'Clothing', 'Home Goods', 'Software', 'Food', 'Office Supplies'])
+ISSUES = np.array(['Billing', 'Technical', 'Shipping', 'Quality', 'Returns', 'General'])
+
+JOIN_START, JOIN_END = np.datetime64('2018-01-01'), np.datetime64('2022-12-31')
+SALES_END = np.datetime64('2023-06-30')
+TICKET_START = np.datetime64('2020-01-01')
+
+FILES = {
+    'customers': 'customers.csv',
+    'products': 'products.csv',
+    'sales': 'sales_transactions.csv',
+    'tickets': 'support_tickets.csv',
+    'suppliers': 'supplier_data.csv',
+}
+
+
 # Helper functions
-def random_date(start_date, end_date):
-    return start_date + timedelta(
-        seconds=random.randint(0, int((end_date - start_date).total_seconds())))
-    
-def generate_customers(num):
-    customers = []
-    for i in range(num):
-        join_date = random_date(datetime(2018, 1, 1), datetime(2022, 12, 31))
-        customers.append({
-            "customer_id": i + 1,
-            "customer_name": fake.company(),
-            "industry": random.choice(['Technology', 'Finance', 'Healthcare', 'Retail', 'Manufacturing', 'Education']),
-            "region": random.choice(['North America', 'Europe', 'Asia', 'South America', 'Africa', 'Oceania']),
-            "join_date": join_date.strftime('%Y-%m-%d')
-        })
-    return pd.DataFrame(customers)
-
-def generate_products(num):
-    categories = ['Electronics', 'Clothing', 'Home Goods', 'Software', 'Food', 'Office Supplies']
-    products = []
-    for i in range(num):
-        cost = round(random.uniform(10, 500), 2)
-        products.append({
-            "product_id": i + 1,
-            "product_name": fake.catch_phrase(),
-            "category": random.choice(categories),
-            "cost_price": cost,
-            "sales_price": round(cost * random.uniform(1.2, 3.0), 2)
-        })
-    return pd.DataFrame(products)
-
-def generate_sales(customers, products, num):
-    sales = []
-    for i in range(num):
-        customer = random.choice(customers['customer_id'].values)
-        product = random.choice(products['product_id'].values)
-        product_data = products[products['product_id'] == product].iloc[0]
-        quantity = random.randint(1, 10)
-        sale_amount = round(quantity * product_data['sales_price'], 2)
-        
-        # Get customer join date to ensure sale is after join
-        join_date = datetime.strptime(
-            customers[customers['customer_id'] == customer].iloc[0]['join_date'], 
-            '%Y-%m-%d'
-        )
-        transaction_date = random_date(join_date, datetime(2023, 6, 30))
-        
-        sales.append({
-            "transaction_id": i + 1,
-            "customer_id": customer,
-            "product_id": product,
-            "quantity": quantity,
-            "sale_amount": sale_amount,
-            "transaction_date": transaction_date.strftime('%Y-%m-%d')
-        })
-    return pd.DataFrame(sales)
-
-def generate_support_tickets(customers, products, num):
-    issues = ['Billing', 'Technical', 'Shipping', 'Quality', 'Returns', 'General']
-    statuses = ['Open', 'Closed', 'In Progress', 'Resolved']
-    sentiments = [round(random.uniform(0, 1), 2) for _ in range(num)]
-    
-    tickets = []
-    for i in range(num):
-        customer = random.choice(customers['customer_id'].values)
-        product = random.choice(products['product_id'].values)
-        creation_date = random_date(datetime(2020, 1, 1), datetime(2023, 6, 30))
-        
-        # 80% chance ticket is resolved
-        if random.random() < 0.8:
-            resolution_date = random_date(creation_date, creation_date + timedelta(days=30))
-            status = random.choice(['Closed', 'Resolved'])
-        else:
-            resolution_date = None
-            status = random.choice(['Open', 'In Progress'])
-            
-        tickets.append({
-            "ticket_id": i + 1,
-            "customer_id": customer,
-            "product_id": product,
-            "issue_type": random.choice(issues),
-            "status": status,
-            "creation_date": creation_date.strftime('%Y-%m-%d'),
-            "resolution_date": resolution_date.strftime('%Y-%m-%d') if resolution_date else None,
-            "sentiment_score": sentiments[i]
-        })
-    return pd.DataFrame(tickets)
-
-def generate_suppliers(products, num):
-    suppliers = []
-    product_ids = products['product_id'].unique()
-    assigned_products = set()
-    
-    for i in range(num):
-        supplier_id = i + 1
-        supplier_name = fake.company()
-        
-        # Each supplier provides 1-3 products
-        num_provided = random.randint(1, 3)
-        provided_products = random.sample(list(product_ids), min(num_provided, len(product_ids)))
-        
-        for product_id in provided_products:
-            suppliers.append({
-                "supplier_id": supplier_id,
-                "supplier_name": supplier_name,
-                "product_id": product_id,
-                "lead_time_days": random.randint(1, 30),
-                "reliability_score": round(random.uniform(0.7, 1.0), 2)
-            })
-            assigned_products.add(product_id)
-    
+def random_dates(rng, start, end, size=None):
+    """Uniform dates in [start, end]; start/end may be arrays of datetime64[D]."""
+    span = (end - start).astype(np.int64)
+    size = np.shape(span) if size is None else size
+    return start + (rng.random(size) * (span + 1)).astype(np.int64).astype('timedelta64[D]')
+
+
+def date_strings(dates):
+    return np.datetime_as_string(dates, unit='D')
+
+
+def name_pool(kind, size, seed):
+    """Pool of fake names to sample from; Faker is far too slow per row at scale."""
+    from faker import Faker
+    fake = Faker()
+    fake.seed_instance(seed)
+    make = fake.company if kind == 'company' else fake.catch_phrase
+    return np.array([make() for _ in range(size)])
+
+
+def zipf_weights(n, exponent, rng):
+    # Popularity ~ 1 / rank^s, with ranks shuffled so product 1 is not always the best seller
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return rng.permutation(weights / weights.sum())
+
+
+def generate_customers(num, rng, seed):
+    names = name_pool('company', min(num, 5000), seed)
+    return pd.DataFrame({
+        "customer_id": np.arange(1, num + 1),
+        "customer_name": rng.choice(names, num),
+        "industry": rng.choice(INDUSTRIES, num),
+        "region": rng.choice(REGIONS, num),
+        "join_date": date_strings(random_dates(rng, JOIN_START, JOIN_END, num)),
+    })
+
+
+def generate_products(num, rng, seed):
+    names = name_pool('catch_phrase', min(num, 5000), seed + 1)
+    cost = np.round(rng.uniform(10, 500, num), 2)
+    return pd.DataFrame({
+        "product_id": np.arange(1, num + 1),
+        "product_name": rng.choice(names, num),
+        "category": rng.choice(CATEGORIES, num),
+        "cost_price": cost,
+        "sales_price": np.round(cost * rng.uniform(1.2, 3.0, num), 2),
+    })
+
+
+def generate_sales_chunk(args):
+    """One chunk of sales rows, grouped into multi-item baskets.
+
+    A basket is a run of consecutive transactions by one customer on one date
+    with 1 + Poisson(basket_mean - 1) items; the last basket may be cut short
+    at the chunk boundary.
+    """
+    seed, first_id, rows, join_days, prices, weights, basket_mean = args
+    rng = np.random.default_rng(seed)
+    num_baskets = int(rows / basket_mean) + 16
+    sizes = 1 + rng.poisson(basket_mean - 1, num_baskets)
+    while sizes.sum() < rows:
+        sizes = np.concatenate([sizes, 1 + rng.poisson(basket_mean - 1, num_baskets)])
+    num_baskets = np.searchsorted(np.cumsum(sizes), rows) + 1
+    sizes = sizes[:num_baskets]
+
+    customers = rng.integers(0, len(join_days), num_baskets)
+    joined = join_days[customers]
+    dates = random_dates(rng, joined, np.maximum(joined, SALES_END))
+
+    basket = np.repeat(np.arange(num_baskets), sizes)[:rows]
+    products = rng.choice(len(prices), rows, p=weights)
+    quantity = rng.integers(1, 11, rows)
+    return pd.DataFrame({
+        "transaction_id": np.arange(first_id, first_id + rows),
+        "customer_id": customers[basket] + 1,
+        "product_id": products + 1,
+        "quantity": quantity,
+        "sale_amount": np.round(quantity * prices[products], 2),
+        "transaction_date": date_strings(dates[basket]),
+    })
+
+
+def generate_tickets_chunk(args):
+    seed, first_id, rows, num_customers, weights = args
+    rng = np.random.default_rng(seed)
+    creation = random_dates(rng, TICKET_START, SALES_END, rows)
+    # 80% chance ticket is resolved
+    resolved = rng.random(rows) < 0.8
+    resolution = creation + rng.integers(0, 31, rows).astype('timedelta64[D]')
+    status = np.where(resolved, rng.choice(['Closed', 'Resolved'], rows), rng.choice(['Open', 'In Progress'], rows))
+    return pd.DataFrame({
+        "ticket_id": np.arange(first_id, first_id + rows),
+        "customer_id": rng.integers(1, num_customers + 1, rows),
+        "product_id": rng.choice(len(weights), rows, p=weights) + 1,
+        "issue_type": rng.choice(ISSUES, rows),
+        "status": status,
+        "creation_date": date_strings(creation),
+        "resolution_date": np.where(resolved, date_strings(resolution), None),
+        "sentiment_score": np.round(rng.random(rows), 2),
+    })
+
+
+def generate_suppliers(products, num, rng, seed):
+    names = name_pool('company', min(num + 1, 5000), seed + 2)
+    product_ids = products['product_id'].to_numpy()
+
+    # Each supplier provides 1-3 products
+    counts = rng.integers(1, 4, num)
+    supplier_ids = np.repeat(np.arange(1, num + 1), counts)
+    provided = np.concatenate([rng.choice(product_ids, min(k, len(product_ids)), replace=False)
+                               for k in counts]) if num else np.array([], dtype=np.int64)
+    supplier_ids = supplier_ids[:len(provided)]
+
     # Ensure all products have at least one supplier
-    remaining_products = set(product_ids) - assigned_products
-    for product_id in remaining_products:
-        suppliers.append({
-            "supplier_id": num + 1,
-            "supplier_name": fake.company(),
-            "product_id": product_id,
-            "lead_time_days": random.randint(1, 30),
-            "reliability_score": round(random.uniform(0.7, 1.0), 2)
-        })
-    
-    return pd.DataFrame(suppliers)
+    remaining = np.setdiff1d(product_ids, provided)
+    supplier_ids = np.concatenate([supplier_ids, np.full(len(remaining), num + 1)])
+    provided = np.concatenate([provided, remaining])
+
+    total = len(provided)
+    supplier_names = names[(supplier_ids - 1) % len(names)]
+    return pd.DataFrame({
+        "supplier_id": supplier_ids,
+        "supplier_name": supplier_names,
+        "product_id": provided,
+        "lead_time_days": rng.integers(1, 31, total),
+        "reliability_score": np.round(rng.uniform(0.7, 1.0, total), 2),
+    })
+
+
+def chunk_plan(total, chunk_rows, seed_sequence):
+    starts = range(0, total, chunk_rows)
+    seeds = seed_sequence.spawn(len(starts))
+    return [(seed, start + 1, min(chunk_rows, total - start)) for seed, start in zip(seeds, starts)]
+
+
+class Writer:
+    """Writes DataFrame chunks as CSV, Parquet part files or straight into SQLite."""
+
+    def __init__(self, fmt, output):
+        self.fmt = fmt
+        self.output = output
+        self.conn = None
+        self._started = set()
+        if fmt == 'sqlite':
+            import sqlite3
+            from ingest import drop_indexes
+            from product_stats import refresh
+            from schema import migrate
+            self.refresh_product_stats = refresh
+            self.conn = sqlite3.connect(output)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=OFF")
+            migrate(self.conn)
+            # Indexes are rebuilt once after the bulk load
+            self.deferred_indexes = [sql for table in FILES for sql in drop_indexes(self.conn, table)]
+            self.conn.commit()
+        else:
+            os.makedirs(output, exist_ok=True)
+
+    def write(self, table, df, part=0):
+        if self.fmt == 'csv':
+            path = os.path.join(self.output, FILES[table])
+            first = table not in self._started
+            df.to_csv(path, index=False, mode='w' if first else 'a', header=first)
+        elif self.fmt == 'parquet':
+            directory = os.path.join(self.output, table)
+            os.makedirs(directory, exist_ok=True)
+            df.to_parquet(os.path.join(directory, f'part-{part:05d}.parquet'), index=False)
+        else:
+            columns = list(df.columns)
+            values = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in columns]
+            with self.conn:
+                self.conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    zip(*values))
+        self._started.add(table)
+
+    def close(self):
+        if self.conn is not None:
+            for sql in self.deferred_indexes:
+                self.conn.execute(sql)
+            # Rows were inserted directly, so the per-product totals are counted once at the end
+            self.refresh_product_stats(self.conn)
+            self.conn.execute("ANALYZE")
+            self.conn.commit()
+            self.conn.close()
+
+
+def run_chunks(fn, jobs, workers):
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(fn, jobs)
+    else:
+        yield from map(fn, jobs)
+
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic business data")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplier for every table size")
+    parser.add_argument('--customers', type=int)
+    parser.add_argument('--products', type=int)
+    parser.add_argument('--transactions', type=int)
+    parser.add_argument('--tickets', type=int)
+    parser.add_argument('--suppliers', type=int)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--zipf', type=float, default=1.1, help="product popularity skew exponent")
+    parser.add_argument('--basket-mean', type=float, default=2.5, help="mean items per basket")
+    parser.add_argument('--format', choices=['csv', 'sqlite', 'parquet'], default='csv')
+    parser.add_argument('--output', default=os.path.join(BASE_DIR, 'backend', 'data'),
+                        help="directory for csv/parquet, database file for sqlite")
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--chunk-rows', type=int, default=500_000)
+    args = parser.parse_args()
+
+    def size(value, base):
+        return value if value is not None else max(1, int(base * args.scale))
+
+    num_customers = size(args.customers, NUM_CUSTOMERS)
+    num_products = size(args.products, NUM_PRODUCTS)
+    num_transactions = size(args.transactions, NUM_TRANSACTIONS)
+    num_tickets = size(args.tickets, NUM_TICKETS)
+    num_suppliers = size(args.suppliers, NUM_SUPPLIERS)
+
+    seeds = np.random.SeedSequence(args.seed)
+    dims_seed, sales_seed, tickets_seed = seeds.spawn(3)
+    rng = np.random.default_rng(dims_seed)
+    writer = Writer(args.format, args.output)
+    started = time.perf_counter()
+
     print("Generating customers...")
-    customers = generate_customers(NUM_CUSTOMERS)
-    
+    customers = generate_customers(num_customers, rng, args.seed)
+    writer.write('customers', customers)
+
     print("Generating products...")
-    products = generate_products(NUM_PRODUCTS)
-    
+    products = generate_products(num_products, rng, args.seed)
+    writer.write('products', products)
+    weights = zipf_weights(num_products, args.zipf, rng)
+
+    print("Generating suppliers...")
+    writer.write('suppliers', generate_suppliers(products, num_suppliers, rng, args.seed))
+
     print("Generating sales transactions...")
-    sales = generate_sales(customers, products, NUM_TRANSACTIONS)
-    
+    join_days = customers['join_date'].to_numpy().astype('datetime64[D]')
+    prices = products['sales_price'].to_numpy()
+    jobs = [(seed, first_id, rows, join_days, prices, weights, args.basket_mean)
+            for seed, first_id, rows in chunk_plan(num_transactions, args.chunk_rows, sales_seed)]
+    done = 0
+    for part, chunk in enumerate(run_chunks(generate_sales_chunk, jobs, args.workers)):
+        writer.write('sales', chunk, part)
+        done += len(chunk)
+        elapsed = time.perf_counter() - started
+        print(f"  {done:,} / {num_transactions:,} sales ({done / elapsed:,.0f} rows/s)")
+
     print("Generating support tickets...")
-    tickets = generate_support_tickets(customers, products, NUM_TICKETS)
-    
-    print("Generating suppliers...")
-    suppliers = generate_suppliers(products, NUM_SUPPLIERS)
-    
-    # Save to CSV
-    print("Saving data to CSV files...")
-    customers.to_csv('backend/data/customers.csv', index=False)
-    products.to_csv('backend/data/products.csv', index=False)
-    sales.to_csv('backend/data/sales_transactions.csv', index=False)
-    tickets.to_csv('backend/data/support_tickets.csv', index=False)
-    suppliers.to_csv('backend/data/supplier_data.csv', index=False)
-    
-    print("Data generation complete!")
+    jobs = [(seed, first_id, rows, num_customers, weights)
+            for seed, first_id, rows in chunk_plan(num_tickets, args.chunk_rows, tickets_seed)]
+    for part, chunk in enumerate(run_chunks(generate_tickets_chunk, jobs, args.workers)):
+        writer.write('tickets', chunk, part)
+
+    writer.close()
+    print(f"Data generation complete in {time.perf_counter() - started:.1f}s!")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()